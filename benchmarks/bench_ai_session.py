@@ -0,0 +1,176 @@
+"""
+AI 插件请求延迟基准测试
+
+在本机启动一个模拟 OpenAI chat/completions 接口的 aiohttp 服务（固定延迟），前面加一个
+TCP 代理，每个新连接在转发前等待 --connect-ms 毫秒，模拟访问远程 HTTPS 接口时的
+TCP/TLS 握手开销。用 AIPlugin 实际的请求路径并发模拟多个会话，每个会话调用一次模型，
+然后执行一次模拟的同步发送（相当于 Gewe 客户端的 post_text）。对比：
+
+- 每次请求新建 ClientSession 与复用共享连接池会话
+- 同步发送直接在事件循环上执行与通过 asyncio.to_thread 执行
+
+每个场景报告吞吐量、新建连接数，以及模型调用和整个会话（调用+发送）的 p50/p95 延迟。
+
+用法：
+    python benchmarks/bench_ai_session.py --requests 400 --concurrency 20 --latency-ms 50 --connect-ms 100 --send-ms 20
+"""
+import argparse
+import asyncio
+import logging
+import os
+import sys
+import time
+from typing import List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from aiohttp import web  # noqa: E402
+from common.log import logger  # noqa: E402
+from plugins.ai.ai_plugin import AIPlugin  # noqa: E402
+from plugins.ai.config import DEFAULT_CONFIG  # noqa: E402
+
+
+def make_app(latency: float) -> web.Application:
+    async def completions(request: web.Request) -> web.Response:
+        data = await request.json()
+        await asyncio.sleep(latency)
+        return web.json_response({
+            "model": data["model"],
+            "choices": [{"message": {"role": "assistant", "content": "ok"}}],
+            "usage": {"prompt_tokens": 10, "completion_tokens": 2, "total_tokens": 12},
+        })
+
+    app = web.Application()
+    app.router.add_post("/v1/chat/completions", completions)
+    return app
+
+
+class ConnectDelayProxy:
+    """TCP 代理，每个新连接等待 connect_delay 秒后才开始转发，并统计连接数"""
+
+    def __init__(self, target_port: int, connect_delay: float):
+        self.target_port = target_port
+        self.connect_delay = connect_delay
+        self.connections = 0
+        self._server = None
+
+    async def start(self) -> int:
+        self._server = await asyncio.start_server(self._handle, "127.0.0.1", 0)
+        return self._server.sockets[0].getsockname()[1]
+
+    async def close(self) -> None:
+        self._server.close()
+        await self._server.wait_closed()
+
+    @staticmethod
+    async def _pipe(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                data = await reader.read(65536)
+                if not data:
+                    break
+                writer.write(data)
+                await writer.drain()
+        except (ConnectionError, asyncio.CancelledError):
+            pass
+        finally:
+            writer.close()
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        self.connections += 1
+        await asyncio.sleep(self.connect_delay)
+        upstream_reader, upstream_writer = await asyncio.open_connection("127.0.0.1", self.target_port)
+        await asyncio.gather(self._pipe(reader, upstream_writer), self._pipe(upstream_reader, writer))
+
+
+class FakeRobot:
+    def __init__(self, loop):
+        self.loop = loop
+
+
+def percentile(samples: List[float], percent: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(percent / 100.0 * (len(ordered) - 1))))]
+
+
+async def run_case(base_url: str, proxy: ConnectDelayProxy, shared_session: bool, offload_send: bool,
+                   requests: int, concurrency: int, send_latency: float) -> dict:
+    config = dict(DEFAULT_CONFIG)
+    config["scheduler"] = {"default_max_concurrency": concurrency}
+    config["hedge"] = {"enabled": False}
+    config["http"] = {**DEFAULT_CONFIG.get("http", {}), "max_connections": concurrency}
+    plugin = AIPlugin(config)
+    plugin.api_base = base_url
+    # robot.loop 为当前循环时复用共享会话，否则每次请求新建一次性会话
+    plugin.robot = FakeRobot(asyncio.get_running_loop() if shared_session else None)
+
+    def post_text():
+        time.sleep(send_latency)
+
+    semaphore = asyncio.Semaphore(concurrency)
+    call_ms, conversation_ms = [], []
+
+    async def conversation(i: int):
+        async with semaphore:
+            start = time.perf_counter()
+            await plugin._call_openai_api(f"question {i}", "gpt-4o-mini")
+            call_ms.append((time.perf_counter() - start) * 1000)
+            if offload_send:
+                await asyncio.to_thread(post_text)
+            else:
+                post_text()
+            conversation_ms.append((time.perf_counter() - start) * 1000)
+
+    connections_before = proxy.connections
+    start = time.perf_counter()
+    await asyncio.gather(*(conversation(i) for i in range(requests)))
+    elapsed = time.perf_counter() - start
+    await plugin.close()
+    return {
+        "rps": requests / elapsed,
+        "connections": proxy.connections - connections_before,
+        "call_p50": percentile(call_ms, 50),
+        "call_p95": percentile(call_ms, 95),
+        "conv_p50": percentile(conversation_ms, 50),
+        "conv_p95": percentile(conversation_ms, 95),
+    }
+
+
+async def main(args):
+    runner = web.AppRunner(make_app(args.latency_ms / 1000), access_log=None)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    proxy = ConnectDelayProxy(site._server.sockets[0].getsockname()[1], args.connect_ms / 1000)
+    base_url = f"http://127.0.0.1:{await proxy.start()}/v1"
+
+    cases = [
+        ("per-request session, send on loop", False, False),
+        ("shared session, send on loop", True, False),
+        ("per-request session, send in thread", False, True),
+        ("shared session, send in thread", True, True),
+    ]
+    print(f"requests={args.requests} concurrency={args.concurrency} upstream_latency={args.latency_ms}ms "
+          f"connect_delay={args.connect_ms}ms send_latency={args.send_ms}ms")
+    print(f"  {'case':<38} {'req/s':>7} {'conns':>6} {'call p50':>9} {'call p95':>9} {'conv p50':>9} {'conv p95':>9}")
+    try:
+        for name, shared, offload in cases:
+            result = await run_case(base_url, proxy, shared, offload,
+                                    args.requests, args.concurrency, args.send_ms / 1000)
+            print(f"  {name:<38} {result['rps']:7.1f} {result['connections']:6d} "
+                  f"{result['call_p50']:7.0f}ms {result['call_p95']:7.0f}ms "
+                  f"{result['conv_p50']:7.0f}ms {result['conv_p95']:7.0f}ms")
+    finally:
+        await proxy.close()
+        await runner.cleanup()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--latency-ms", type=float, default=50)
+    parser.add_argument("--connect-ms", type=float, default=100, help="每个新连接的握手延迟，0表示本机回环")
+    parser.add_argument("--send-ms", type=float, default=20)
+    logger.setLevel(logging.WARNING)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,73 @@
+"""
+关键词匹配基准测试
+
+随机生成 10 到 100k 个中英文关键词，对比 KeywordMatcher（Aho-Corasick）与逐个关键词
+`keyword in text` 的朴素做法：编译耗时、每条消息的匹配耗时。
+
+用法：
+    python benchmarks/bench_keyword_matcher.py --sizes 10 100 1000 10000 100000 --messages 2000
+"""
+import argparse
+import os
+import random
+import string
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from plugins.keyword_filter.matcher import KeywordMatcher  # noqa: E402
+
+CJK = [chr(code) for code in range(0x4e00, 0x4e00 + 3000)]
+
+
+def random_word(rng: random.Random) -> str:
+    if rng.random() < 0.5:
+        return "".join(rng.choices(CJK, k=rng.randint(2, 4)))
+    return "".join(rng.choices(string.ascii_lowercase, k=rng.randint(4, 8)))
+
+
+def make_messages(rng: random.Random, keywords, count: int):
+    """随机消息，约10%包含一个关键词"""
+    messages = []
+    for _ in range(count):
+        words = [random_word(rng) for _ in range(rng.randint(5, 20))]
+        if rng.random() < 0.1:
+            words.insert(rng.randrange(len(words)), rng.choice(keywords))
+        messages.append(" ".join(words))
+    return messages
+
+
+def per_message_us(func, messages) -> float:
+    start = time.perf_counter()
+    for message in messages:
+        func(message)
+    return (time.perf_counter() - start) / len(messages) * 1e6
+
+
+def main(args):
+    rng = random.Random(42)
+    print(f"messages={args.messages} ignore_case={args.ignore_case}")
+    print(f"  {'keywords':>8} {'build ms':>10} {'matcher us/msg':>15} {'naive us/msg':>13} {'hits':>6}")
+    for size in args.sizes:
+        keywords = list({random_word(rng) for _ in range(size * 2)})[:size]
+        messages = make_messages(rng, keywords, args.messages)
+
+        start = time.perf_counter()
+        matcher = KeywordMatcher.from_config(keywords, ignore_case=args.ignore_case)
+        build_ms = (time.perf_counter() - start) * 1000
+
+        hits = sum(1 for message in messages if matcher.first(message))
+        matcher_us = per_message_us(matcher.find_all, messages)
+        # 朴素做法耗时随关键词数量线性增长，关键词很多时只取部分消息测量
+        naive_messages = messages[:max(20, args.messages * 100 // size)]
+        naive_us = per_message_us(lambda text: [k for k in keywords if k in text], naive_messages)
+        print(f"  {size:>8} {build_ms:>10.1f} {matcher_us:>15.1f} {naive_us:>13.1f} {hits:>6}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 1000, 10000, 100000])
+    parser.add_argument("--messages", type=int, default=2000)
+    parser.add_argument("--ignore-case", action="store_true")
+    main(parser.parse_args())
@@ -0,0 +1,69 @@
+import json
+import time
+from collections import deque
+from typing import Dict, List, Optional, Tuple
+from common.log import logger
+from common.metrics import Histogram
+
+OUTCOME_NONE = "NONE"  # 插件返回None，终止处理链
+OUTCOME_EXCEPTION = "EXCEPTION"
+OUTCOME_TIMEOUT = "TIMEOUT"
+OUTCOME_SKIPPED = "SKIPPED"  # 熔断中，未调用
+
+
+class ChainMetrics:
+    """插件链耗时统计
+
+    按插件记录每次 process 的耗时直方图和结果（CONTINUE / FINISHED_WITH_DEFAULT /
+    FINISHED / NONE / EXCEPTION / TIMEOUT），整条链超过 slow_ms 时记录一条结构化慢日志。
+    """
+
+    def __init__(self, slow_ms: float = 3000, slow_log_size: int = 50):
+        self.slow_ms = slow_ms
+        self._plugins: Dict[str, Histogram] = {}
+        self._outcomes: Dict[str, Dict[str, int]] = {}
+        self._chain = Histogram()
+        self._slow_log = deque(maxlen=slow_log_size)
+        self._slow_count = 0
+
+    def record_plugin(self, plugin_name: str, elapsed_ms: float, outcome: str) -> None:
+        histogram = self._plugins.get(plugin_name)
+        if histogram is None:
+            histogram = self._plugins[plugin_name] = Histogram()
+            self._outcomes[plugin_name] = {}
+        histogram.observe(elapsed_ms)
+        outcomes = self._outcomes[plugin_name]
+        outcomes[outcome] = outcomes.get(outcome, 0) + 1
+
+    def record_chain(self, elapsed_ms: float, steps: List[Tuple[str, float, str]],
+                     context_info: Optional[Dict] = None) -> None:
+        """记录整条链的耗时，超过阈值时写慢日志"""
+        self._chain.observe(elapsed_ms)
+        if elapsed_ms < self.slow_ms:
+            return
+
+        self._slow_count += 1
+        entry = {
+            "time": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "total_ms": round(elapsed_ms, 1),
+            "plugins": [
+                {"plugin": name, "ms": round(ms, 1), "outcome": outcome}
+                for name, ms, outcome in steps
+            ],
+            **(context_info or {}),
+        }
+        self._slow_log.append(entry)
+        logger.warning(f"[Plugin Chain] Slow message: {json.dumps(entry, ensure_ascii=False)}")
+
+    def get_stats(self) -> Dict:
+        """获取各插件的耗时分布、结果计数和最近的慢日志"""
+        return {
+            "chain_ms": self._chain.snapshot(),
+            "plugins": {
+                name: {"ms": histogram.snapshot(), "outcomes": dict(self._outcomes[name])}
+                for name, histogram in list(self._plugins.items())
+            },
+            "slow_threshold_ms": self.slow_ms,
+            "slow_count": self._slow_count,
+            "slow_log": list(self._slow_log),
+        }
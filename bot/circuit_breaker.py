@@ -0,0 +1,68 @@
+import time
+from typing import Dict
+
+STATE_CLOSED = "closed"
+STATE_OPEN = "open"
+STATE_HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    """插件熔断器
+
+    连续失败（异常或超时）达到 failure_threshold 次后断开，断开期间直接跳过插件；
+    经过 recovery_timeout 秒后放行一条消息试探，成功则恢复，失败则重新断开。
+    """
+
+    def __init__(self, failure_threshold: int = 5, recovery_timeout: float = 60):
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.state = STATE_CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probing = False
+        self._stats = {
+            "skipped": 0,
+            "opened": 0,
+            "failures_total": 0,
+            "timeouts_total": 0,
+        }
+
+    def allow(self) -> bool:
+        """是否允许调用插件"""
+        if self.state == STATE_CLOSED:
+            return True
+        if self.state == STATE_OPEN and time.monotonic() - self.opened_at >= self.recovery_timeout:
+            self.state = STATE_HALF_OPEN
+            self._probing = False
+        if self.state == STATE_HALF_OPEN and not self._probing:
+            self._probing = True  # 同一时间只放行一条试探消息
+            return True
+        self._stats["skipped"] += 1
+        return False
+
+    def record_success(self) -> None:
+        self.state = STATE_CLOSED
+        self.failures = 0
+        self._probing = False
+
+    def release(self) -> None:
+        """调用被外部取消，不计成功或失败，只释放试探名额"""
+        self._probing = False
+
+    def record_failure(self, timeout: bool = False) -> None:
+        self.failures += 1
+        self._stats["failures_total"] += 1
+        if timeout:
+            self._stats["timeouts_total"] += 1
+        if self.state == STATE_HALF_OPEN or (self.failure_threshold and self.failures >= self.failure_threshold):
+            if self.state != STATE_OPEN:
+                self._stats["opened"] += 1
+            self.state = STATE_OPEN
+            self.opened_at = time.monotonic()
+            self._probing = False
+
+    def get_stats(self) -> Dict:
+        stats = dict(self._stats)
+        stats["state"] = self.state
+        stats["consecutive_failures"] = self.failures
+        return stats
@@ -1,5 +1,6 @@
 from dataclasses import dataclass, field
-from typing import Dict, Optional, Any
+from types import MappingProxyType
+from typing import Dict, Optional, Any, Mapping
 from enum import Enum
 from .message import Message
 
@@ -37,4 +38,30 @@ class Context:
         self.data[key] = value
 
     def get(self, key, default=None):
-        return self.data.get(key, default)
\ No newline at end of file
+        return self.data.get(key, default)
+
+    def snapshot(self) -> "ContextSnapshot":
+        """生成只读快照，data 复制一份，之后插件对上下文的修改不影响快照"""
+        return ContextSnapshot(
+            type=self.type,
+            content=self.content,
+            msg=self.msg,
+            is_group=self.is_group,
+            receiver=self.receiver,
+            sender=self.sender,
+            data=MappingProxyType(dict(self.data))
+        )
+
+@dataclass(frozen=True)
+class ContextSnapshot:
+    """上下文的只读快照，交给观察者插件使用"""
+    type: ContextType
+    content: Any
+    msg: Optional[Message] = None
+    is_group: bool = False
+    receiver: Optional[str] = None
+    sender: Optional[str] = None
+    data: Mapping = field(default_factory=lambda: MappingProxyType({}))
+
+    def get(self, key, default=None):
+        return self.data.get(key, default)
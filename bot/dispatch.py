@@ -0,0 +1,81 @@
+from typing import Dict, List, Tuple
+from .context import Context, ContextType
+from plugins.base import Plugin, Trigger, SCOPE_ALL, SCOPE_GROUP, SCOPE_PRIVATE
+
+# 掩码的键：(是否群聊, 消息类型)
+_MASK_KEYS = [(is_group, context_type) for is_group in (False, True) for context_type in ContextType]
+
+
+class _TrieNode:
+    __slots__ = ("children", "masks")
+
+    def __init__(self):
+        self.children: Dict[str, "_TrieNode"] = {}
+        self.masks: Dict[Tuple[bool, ContextType], int] = {}
+
+
+class DispatchIndex:
+    """插件分发索引
+
+    启动时把插件声明的触发条件编译成两部分：不限内容的触发条件按 (是否群聊, 消息类型)
+    预先算好插件位掩码；带命令前缀的触发条件放进前缀树，节点上保存同样的掩码。
+    处理消息时沿前缀树走一遍消息开头，把经过的掩码合并，得到可能处理该消息的插件，
+    按原有优先级顺序返回。
+    """
+
+    def __init__(self, plugins: List[Plugin]):
+        self.plugins = list(plugins)
+        self._always: Dict[Tuple[bool, ContextType], int] = dict.fromkeys(_MASK_KEYS, 0)
+        self._root = _TrieNode()
+        self._ordered: Dict[int, List[Plugin]] = {}
+
+        for index, plugin in enumerate(self.plugins):
+            bit = 1 << index
+            triggers = plugin.get_triggers()
+            if triggers is None:
+                triggers = [Trigger()]
+            for trigger in triggers:
+                keys = self._mask_keys(trigger)
+                if not trigger.prefixes:
+                    for key in keys:
+                        self._always[key] |= bit
+                    continue
+                for prefix in trigger.prefixes:
+                    node = self._root
+                    for char in prefix:
+                        node = node.children.setdefault(char, _TrieNode())
+                    for key in keys:
+                        node.masks[key] = node.masks.get(key, 0) | bit
+
+    @staticmethod
+    def _mask_keys(trigger: Trigger) -> List[Tuple[bool, ContextType]]:
+        scopes = {
+            SCOPE_ALL: (False, True),
+            SCOPE_GROUP: (True,),
+            SCOPE_PRIVATE: (False,),
+        }[trigger.scope]
+        types = trigger.types or tuple(ContextType)
+        return [(is_group, context_type) for is_group in scopes for context_type in types]
+
+    def match_mask(self, context: Context) -> int:
+        key = (bool(context.is_group), context.type)
+        mask = self._always.get(key, 0)
+        content = context.content
+        if isinstance(content, str):
+            # 插件匹配命令前会 strip()，前导空白不能让前缀树漏掉插件
+            node = self._root
+            for char in content.lstrip():
+                node = node.children.get(char)
+                if node is None:
+                    break
+                mask |= node.masks.get(key, 0)
+        return mask
+
+    def get_plugins(self, context: Context) -> List[Plugin]:
+        """返回可能处理该消息的插件，保持优先级顺序"""
+        mask = self.match_mask(context)
+        ordered = self._ordered.get(mask)
+        if ordered is None:
+            ordered = [plugin for index, plugin in enumerate(self.plugins) if mask >> index & 1]
+            self._ordered[mask] = ordered
+        return ordered
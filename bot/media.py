@@ -0,0 +1,98 @@
+import os
+import asyncio
+import threading
+from typing import Awaitable, Callable, Dict, Optional
+from common.log import logger
+from common.media_downloader import media_downloader
+from common.media_store import media_store
+from common.metrics import metrics
+
+
+class MediaHandle:
+    """延迟下载的媒体句柄
+
+    保存媒体的来源（CDN地址或消息ID），只有插件第一次调用 `await handle.path()`
+    时才真正下载，之后所有插件共享同一个下载结果。
+    """
+
+    _stats = {
+        "created": 0,
+        "downloads": 0,
+        "avoided": 0,
+    }
+    _stats_lock = threading.Lock()
+
+    def __init__(self, media_type: str, url: Optional[str] = None, msg_id: Optional[str] = None,
+                 file_name: Optional[str] = None, ext: Optional[str] = None,
+                 local_path: Optional[str] = None,
+                 loader: Optional[Callable[[], Awaitable[Optional[str]]]] = None):
+        self.type = media_type  # image / voice / file
+        self.url = url
+        self.msg_id = msg_id
+        self.file_name = file_name
+        self.ext = ext
+        self._path = local_path  # 已经在本地的文件（如回调中直接带的图片数据）
+        self._loader = loader
+        self._task: Optional[asyncio.Future] = None
+        self._released = False
+        self._count("created")
+
+    @classmethod
+    def _count(cls, key: str, delta: int = 1) -> None:
+        with cls._stats_lock:
+            cls._stats[key] += delta
+
+    @property
+    def is_local(self) -> bool:
+        """文件是否已经在本地"""
+        return self._path is not None and os.path.exists(self._path)
+
+    async def _fetch(self) -> Optional[str]:
+        if self._loader:
+            path = await self._loader()
+        elif self.url:
+            downloaded = await media_downloader.download(self.url, media_store.staging_path(self.ext))
+            path = media_store.put_file(downloaded, self.ext) if downloaded else None
+        else:
+            logger.error(f"[MediaHandle] No source to load {self.type} media")
+            return None
+        self._path = path
+        return path
+
+    async def path(self) -> Optional[str]:
+        """获取本地文件路径，首次调用时触发下载，失败返回None"""
+        if self.is_local:
+            media_store.touch(self._path)
+            return self._path
+
+        if self._task is None:
+            self._count("downloads")
+            if self._released:
+                self._count("avoided", -1)
+            self._task = asyncio.ensure_future(self._fetch())
+
+        try:
+            return await asyncio.shield(self._task)
+        except Exception as e:
+            logger.error(f"[MediaHandle] Failed to load {self.type} media: {e}")
+            return None
+
+    def release(self) -> None:
+        """消息处理结束时调用，统计未被使用而避免的下载"""
+        if self._released:
+            return
+        self._released = True
+        if self._task is None and not self.is_local:
+            self._count("avoided")
+
+    @classmethod
+    def get_stats(cls) -> Dict:
+        """获取句柄统计信息"""
+        with cls._stats_lock:
+            return dict(cls._stats)
+
+    def __repr__(self) -> str:
+        source = self.url or self.msg_id or self._path
+        return f"<MediaHandle(type='{self.type}', source='{source}', local={self.is_local})>"
+
+metrics.register("media_handles", MediaHandle.get_stats)
@@ -0,0 +1,91 @@
+import asyncio
+import time
+from typing import Dict, Optional, Set
+from common.log import logger
+from common.metrics import Histogram
+from .context import ContextSnapshot
+
+
+class ObserverRunner:
+    """观察者插件的后台执行器
+
+    处理链到达观察者插件时只提交一个后台任务就继续往下走，观察者的耗时不计入回复路径。
+    同时执行的观察任务不超过 max_concurrency 个，等待中的任务超过 max_pending 时直接丢弃，
+    避免下游变慢时任务无限堆积。
+    """
+
+    def __init__(self, max_concurrency: int = 8, max_pending: int = 1000):
+        self.max_concurrency = max(1, max_concurrency)
+        self.max_pending = max_pending
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._tasks: Set[asyncio.Task] = set()
+        self._running = 0
+        self._plugins: Dict[str, Dict] = {}
+
+    def _get_stats(self, plugin_name: str) -> Dict:
+        stats = self._plugins.get(plugin_name)
+        if stats is None:
+            stats = self._plugins[plugin_name] = {
+                "ms": Histogram(),
+                "submitted": 0,
+                "failed": 0,
+                "timeouts": 0,
+                "dropped": 0,
+            }
+        return stats
+
+    def submit(self, plugin, snapshot: ContextSnapshot, timeout: Optional[float] = None) -> bool:
+        """提交一次观察，队列已满时返回False"""
+        plugin_name = plugin.__class__.__name__
+        stats = self._get_stats(plugin_name)
+        if self.max_pending and len(self._tasks) >= self.max_pending:
+            stats["dropped"] += 1
+            logger.warning(f"[Observer] Too many pending observations, dropped one for {plugin_name}")
+            return False
+
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        stats["submitted"] += 1
+        task = asyncio.get_running_loop().create_task(self._run(plugin, plugin_name, snapshot, timeout))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return True
+
+    async def _run(self, plugin, plugin_name: str, snapshot: ContextSnapshot, timeout: Optional[float]) -> None:
+        stats = self._plugins[plugin_name]
+        async with self._semaphore:
+            self._running += 1
+            start_time = time.perf_counter()
+            try:
+                await asyncio.wait_for(plugin.observe(snapshot), timeout)
+            except asyncio.TimeoutError:
+                stats["timeouts"] += 1
+                logger.error(f"[Observer] {plugin_name} timed out")
+            except Exception as e:
+                stats["failed"] += 1
+                logger.error_with_trace(f"[Observer] Exception in {plugin_name}: {e}")
+            finally:
+                self._running -= 1
+                stats["ms"].observe((time.perf_counter() - start_time) * 1000)
+
+    async def close(self, timeout: float = 10) -> None:
+        """等待未完成的观察任务，超时后取消"""
+        if not self._tasks:
+            return
+        done, pending = await asyncio.wait(set(self._tasks), timeout=timeout)
+        for task in pending:
+            task.cancel()
+        if pending:
+            logger.warning(f"[Observer] Cancelled {len(pending)} pending observations on close")
+
+    def get_stats(self) -> Dict:
+        """获取观察任务的并发、积压和各观察者的耗时"""
+        return {
+            "max_concurrency": self.max_concurrency,
+            "running": self._running,
+            "pending": len(self._tasks) - self._running,
+            "plugins": {
+                name: {**{key: value for key, value in stats.items() if key != "ms"}, "ms": stats["ms"].snapshot()}
+                for name, stats in list(self._plugins.items())
+            },
+        }
@@ -1,11 +1,14 @@
+import hmac
 import json
 import web
 import os
 from typing import Optional
 from common.log import logger
+from common.metrics import metrics
+from common.bindings import generate_bind_keys, parse_bindings, import_bindings
 
 class PushServer:
-    def __init__(self, robot, host="0.0.0.0", port=5001):
+    def __init__(self, robot, host="0.0.0.0", port=5001, admin_token: Optional[str] = None):
         self.robot = robot
         self.host = host
         self.port = port
@@ -35,6 +38,9 @@ class PushServer:
         urls = (
             '/statics/(.*)', StaticHandler,
             '/push', 'PushHandler',
+            '/metrics', 'MetricsHandler',
+            '/bind_keys', 'BindKeysHandler',
+            '/bindings', 'BindingsHandler',
             '/', 'IndexHandler'
         )
         
@@ -45,6 +51,7 @@ class PushServer:
         PushHandler.robot = self.robot
         IndexHandler.render = render
         StaticHandler.static_dir = static_dir
+        AdminHandler.admin_token = admin_token
         
         # 添加调试日志
         logger.info(f"Initialized routes: {urls}")
@@ -98,6 +105,58 @@ class StaticHandler:
             logger.error(f"Error serving static file {path}: {e}", exc_info=True)
             raise web.notfound()
 
+class AdminHandler:
+    """需要管理令牌的接口，未配置 PUSH_ADMIN_TOKEN 时关闭"""
+    admin_token = None
+    max_bind_keys = 10000
+
+    def _check_token(self) -> Optional[str]:
+        web.header('Content-Type', 'application/json; charset=utf-8')
+        if not self.admin_token:
+            raise web.forbidden(self._make_response(False, "Admin API disabled: PUSH_ADMIN_TOKEN not set"))
+        token = web.ctx.env.get('HTTP_X_ADMIN_TOKEN', '')
+        if not hmac.compare_digest(token.encode(), self.admin_token.encode()):
+            raise web.forbidden(self._make_response(False, "Invalid admin token"))
+
+    def _make_response(self, success: bool, message: str, **data) -> str:
+        return json.dumps({"success": success, "message": message, **data}, ensure_ascii=False)
+
+class MetricsHandler(AdminHandler):
+    """返回各组件的统计信息，其中包含消息ID和微信ID，需要管理令牌"""
+
+    def GET(self):
+        self._check_token()
+        return json.dumps(metrics.snapshot(), ensure_ascii=False, default=str)
+
+class BindKeysHandler(AdminHandler):
+    """批量生成绑定密钥"""
+
+    def POST(self):
+        self._check_token()
+        try:
+            data = json.loads(web.data() or b"{}")
+            count = int(data.get('count', 1))
+            if count < 1 or count > self.max_bind_keys:
+                return self._make_response(False, f"count must be between 1 and {self.max_bind_keys}")
+            keys = generate_bind_keys(count, data.get('customer_id'), data.get('customer'))
+            return self._make_response(True, f"Generated {count} bind keys", keys=keys)
+        except Exception as e:
+            logger.error(f"Error generating bind keys: {e}")
+            return self._make_response(False, f"Error: {str(e)}")
+
+class BindingsHandler(AdminHandler):
+    """批量导入已有的群组/用户绑定（JSON 或 CSV）"""
+
+    def POST(self):
+        self._check_token()
+        try:
+            rows = parse_bindings(web.data().decode('utf-8'), web.ctx.env.get('CONTENT_TYPE', ''))
+            result = import_bindings(rows)
+            return self._make_response(True, "Bindings imported", **result)
+        except Exception as e:
+            logger.error(f"Error importing bindings: {e}")
+            return self._make_response(False, f"Error: {str(e)}")
+
 class PushHandler:
     robot = None
 
@@ -4,18 +4,25 @@ import json
 import web
 import asyncio
 import requests
-import base64
+from concurrent.futures import ThreadPoolExecutor
 from typing import List, Dict, Optional
 from urllib.parse import urlparse
 from dotenv import load_dotenv
 from gewechat_client import GewechatClient
 from .context import Context, ContextType, ProcessState
 from .message import Message
+from .media import MediaHandle
+from .dispatch import DispatchIndex
+from .chain_metrics import ChainMetrics, OUTCOME_NONE, OUTCOME_EXCEPTION, OUTCOME_TIMEOUT, OUTCOME_SKIPPED
+from .circuit_breaker import CircuitBreaker
+from .observers import ObserverRunner
 from config.config_manager import config
 from common.log import logger
 from common.redis_manager import redis_manager
 from common.cache_manager import CacheManager
-from plugins.base import Plugin, Message
+from common.media_store import media_store
+from common.metrics import metrics
+from plugins.base import Plugin, ObserverPlugin, Message
 
 # 全局变量存储robot实例和事件循环
 _event_loop = None
@@ -105,6 +112,8 @@ class CallbackHandler:
         # 处理消息类型
         msg_type = data.get('Data', {}).get('MsgType')
         content = data.get('Data', {}).get('Content', {}).get('string', '')
+        media_handle = None  # 媒体句柄，插件需要时才下载
+        msg_id = str(data.get('Data', {}).get('NewMsgId', ''))
         
         # 处理图片消息
         if msg_type == 3:  # 图片消息
@@ -112,87 +121,53 @@ class CallbackHandler:
                 # 检查是否有图片数据
                 img_buf = data.get('Data', {}).get('ImgBuf', {})
                 if img_buf and 'buffer' in img_buf:
-                    # 如果有直接的图片数据
-                    tmp_dir = "tmp"
-                    os.makedirs(tmp_dir, exist_ok=True)
-                    
-                    # 生成文件路径
-                    msg_id = data.get('Data', {}).get('NewMsgId', '')
-                    file_path = os.path.join(tmp_dir, f"{msg_id}.png")
-                    
-                    # 保存图片数据
-                    img_data = base64.b64decode(img_buf['buffer'])
-                    with open(file_path, 'wb') as f:
-                        f.write(img_data)
+                    # 如果有直接的图片数据，分块解码后按内容存入媒体存储
+                    file_path = media_store.put_base64(img_buf['buffer'], ".png")
                     content = file_path
+                    media_handle = MediaHandle('image', msg_id=msg_id, local_path=file_path)
                     logger.info(f"[gewechat] Image saved to {file_path}")
                 else:
-                    logger.debug("[gewechat] No direct image data, will need to download later")
+                    logger.debug("[gewechat] No direct image data, will download on demand")
                     content = "[图片消息]"
+                    if robot_instance and msg_id:
+                        media_handle = MediaHandle(
+                            'image',
+                            msg_id=msg_id,
+                            loader=lambda: robot_instance.download_image(msg_id)
+                        )
             except Exception as e:
                 logger.error_with_trace(f"[gewechat] Error processing image message: {e}")
                 content = "[图片消息处理失败]"
         
         # 处理语音消息
         elif msg_type == 34:  # 语音消息
-            try:
-                voice_data = data.get('Data', {}).get('Voice', {})
-                voice_url = voice_data.get('CDNUrl', '')
-                if voice_url:
-                    # 下载语音文件到临时目录
-                    tmp_dir = "tmp"
-                    os.makedirs(tmp_dir, exist_ok=True)
-                    
-                    # 生成唯一文件名
-                    file_name = f"voice_{int(time.time())}_{hash(voice_url)}.mp3"
-                    file_path = os.path.join(tmp_dir, file_name)
-                    
-                    # 下载语音文件
-                    response = requests.get(voice_url, stream=True)
-                    if response.status_code == 200:
-                        with open(file_path, 'wb') as f:
-                            for chunk in response.iter_content(1024):
-                                f.write(chunk)
-                        content = file_path  # 更新content为文件路径
-                        logger.info(f"[gewechat] Voice saved to {file_path}")
-                    else:
-                        logger.error(f"[gewechat] Failed to download voice: {response.status_code}")
-                else:
-                    logger.error("[gewechat] No voice URL found in message")
-            except Exception as e:
-                logger.error_with_trace(f"[gewechat] Error processing voice message: {e}")
+            voice_data = data.get('Data', {}).get('Voice', {})
+            voice_url = voice_data.get('CDNUrl', '')
+            if voice_url:
+                # 插件第一次访问时才下载
+                media_handle = MediaHandle('voice', url=voice_url, msg_id=msg_id, ext=".mp3")
+                content = "[语音消息]"
+            else:
+                logger.error("[gewechat] No voice URL found in message")
         
         # 处理文件消息
         elif msg_type == 6:  # 文件消息
-            try:
-                file_data = data.get('Data', {}).get('File', {})
-                file_url = file_data.get('CDNUrl', '')
-                file_name = file_data.get('FileName', '')
-                
-                if file_url and file_name:
-                    # 下载文件到临时目录
-                    tmp_dir = "tmp"
-                    os.makedirs(tmp_dir, exist_ok=True)
-                    
-                    # 生成唯一文件名，保留原始扩展名
-                    ext = os.path.splitext(file_name)[1]
-                    safe_file_name = f"file_{int(time.time())}_{hash(file_url)}{ext}"
-                    file_path = os.path.join(tmp_dir, safe_file_name)
-                    
-                    # 下载文件
-                    response = requests.get(file_url, stream=True)
-                    if response.status_code == 200:
-                        with open(file_path, 'wb') as f:
-                            for chunk in response.iter_content(1024):
-                                f.write(chunk)
-                        content = file_path  # 更新content为文件路径
-                        logger.info(f"[gewechat] File saved to {file_path}")
-                    else:
-                        logger.error(f"[gewechat] Failed to download file: {response.status_code}")
-                else:
-                    logger.error("[gewechat] No file URL or name found in message")
-            except Exception as e:
-                logger.error_with_trace(f"[gewechat] Error processing file message: {e}")
+            file_data = data.get('Data', {}).get('File', {})
+            file_url = file_data.get('CDNUrl', '')
+            file_name = file_data.get('FileName', '')
+            
+            if file_url and file_name:
+                # 保留原始扩展名，插件第一次访问时才下载
+                media_handle = MediaHandle(
+                    'file',
+                    url=file_url,
+                    msg_id=msg_id,
+                    file_name=file_name,
+                    ext=os.path.splitext(file_name)[1]
+                )
+                content = f"[文件] {file_name}"
+            else:
+                logger.error("[gewechat] No file URL or name found in message")
 
         # 构造消息对象
         message = Message(
@@ -202,21 +177,22 @@ class CallbackHandler:
             room_id=data.get('Data', {}).get('FromUserName', {}).get('string'),
             raw_data=data,
             create_time=data.get('Data', {}).get('CreateTime', int(time.time())),
-            msg_id=str(data.get('Data', {}).get('NewMsgId', '')),
+            msg_id=msg_id,
             app_id=robot_instance.app_id if robot_instance else None,
             extra_data={
-                'files': []  # 初始化文件列表
+                'files': [media_handle] if media_handle else []  # 媒体句柄列表
             }
         )
 
-        # 如果是媒体文件，添加到extra_data
-        if msg_type in (3, 34, 6):  # 图片、语音、文件
-            if os.path.exists(content):
-                message.extra_data['files'].append({
-                    'type': 'image' if msg_type == 3 else 'voice' if msg_type == 34 else 'file',
-                    'path': content
-                })
-
+        try:
+            return self._dispatch_message(message, data, robot_instance)
+        finally:
+            # 统计未被插件使用而避免的媒体下载
+            for handle in message.extra_data.get('files', []):
+                handle.release()
+
+    def _dispatch_message(self, message: Message, data: Dict, robot_instance) -> str:
+        """补充发送者信息、过滤消息并交给插件链处理"""
         # 获取并设置发送者昵称
         sender_id = message.sender_id
         try:
@@ -287,15 +263,24 @@ class CallbackHandler:
             # logger.debug(
             #     f"[gewechat] {'Group' if message.is_group else 'Private'} message from {message.sender}: {message.content}")
 
-            # 创建新的事件循环来处理消息
-            loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(loop)
-            try:
-                loop.run_until_complete(robot_instance.process_message(message))
-            except Exception as e:
-                logger.error(f"[gewechat] Error processing message: {e}")
-            finally:
-                loop.close()
+            main_loop = robot_instance.loop
+            if main_loop is not None and main_loop.is_running():
+                # 交给机器人主事件循环处理，插件可以复用长连接等共享资源
+                future = asyncio.run_coroutine_threadsafe(robot_instance.process_message(message), main_loop)
+                try:
+                    future.result()
+                except Exception as e:
+                    logger.error(f"[gewechat] Error processing message: {e}")
+            else:
+                # 主事件循环未启动时，创建新的事件循环来处理消息
+                loop = asyncio.new_event_loop()
+                asyncio.set_event_loop(loop)
+                try:
+                    loop.run_until_complete(robot_instance.process_message(message))
+                except Exception as e:
+                    logger.error(f"[gewechat] Error processing message: {e}")
+                finally:
+                    loop.close()
 
         return "success"
 
@@ -356,38 +341,30 @@ class CallbackHandler:
         if not file_path:
             return "gewechat callback server is running"
 
-        # 使用os.path.abspath清理路径
-        clean_path = os.path.abspath(file_path)
-        tmp_dir = os.path.abspath("tmp")
-
-        # 检查文件路径是否在tmp目录下
-        if not clean_path.startswith(tmp_dir):
-            print(
-                f"[gewechat] Forbidden access to file outside tmp directory: file_path={file_path}, clean_path={clean_path}, tmp_dir={tmp_dir}")
-            raise web.forbidden()
-
-        if os.path.exists(clean_path):
-            # 获取文件类型
-            file_type = "application/octet-stream"
-            if clean_path.endswith('.mp3'):
-                file_type = "audio/mpeg"
-            elif clean_path.endswith(('.jpg', '.jpeg')):
-                file_type = "image/jpeg"
-            elif clean_path.endswith('.png'):
-                file_type = "image/png"
-            elif clean_path.endswith('.gif'):
-                file_type = "image/gif"
-
-            # 设置响应头
-            web.header('Content-Type', file_type)
-            web.header('Content-Disposition', f'attachment; filename="{os.path.basename(clean_path)}"')
-
-            with open(clean_path, 'rb') as f:
-                return f.read()
-        else:
-            print(f"[gewechat] File not found: {clean_path}")
+        # 只允许访问媒体存储中的文件
+        clean_path = media_store.resolve(file_path)
+        if not clean_path:
+            logger.warning(f"[gewechat] Forbidden or missing media file: file_path={file_path}")
             raise web.notfound()
 
+        # 获取文件类型
+        file_type = "application/octet-stream"
+        if clean_path.endswith('.mp3'):
+            file_type = "audio/mpeg"
+        elif clean_path.endswith(('.jpg', '.jpeg')):
+            file_type = "image/jpeg"
+        elif clean_path.endswith('.png'):
+            file_type = "image/png"
+        elif clean_path.endswith('.gif'):
+            file_type = "image/gif"
+
+        # 设置响应头
+        web.header('Content-Type', file_type)
+        web.header('Content-Disposition', f'attachment; filename="{os.path.basename(clean_path)}"')
+
+        with open(clean_path, 'rb') as f:
+            return f.read()
+
 
 class WeRobot:
     CREDENTIALS_FILE = "credentials.json"
@@ -416,6 +393,21 @@ class WeRobot:
         self.client = GewechatClient(self.base_url, self.token)
 
         self.plugins = []
+        self._dispatch_index: Optional[DispatchIndex] = None
+        metrics_config = config.get("metrics") or {}
+        self.chain_metrics = ChainMetrics(
+            metrics_config.get("slow_chain_ms", 3000),
+            metrics_config.get("slow_log_size", 50)
+        )
+        metrics.register("plugin_chain", self.chain_metrics.get_stats)
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        metrics.register("plugin_breakers", self.get_breaker_stats)
+        observers_config = config.get("observers") or {}
+        self.observers = ObserverRunner(
+            observers_config.get("max_concurrency", 8),
+            observers_config.get("max_pending", 1000)
+        )
+        metrics.register("observers", self.observers.get_stats)
         self.chatrooms = {}
         self.max_retries = 3
         self.retry_delay = 5
@@ -453,11 +445,68 @@ class WeRobot:
         except Exception as e:
             logger.error_with_trace(f"[gewechat] Failed to save credentials: {e}")
 
+    @property
+    def loop(self) -> Optional[asyncio.AbstractEventLoop]:
+        """机器人主事件循环，start()之前为None"""
+        return _event_loop
+
+    async def close(self):
+        """关闭插件持有的资源"""
+        await self.observers.close()
+        for plugin in self.plugins:
+            try:
+                await plugin.close()
+            except Exception as e:
+                logger.error(f"[gewechat] Error closing plugin {plugin.__class__.__name__}: {e}")
+
     def add_plugin(self, plugin: Plugin):
         if hasattr(plugin, 'set_robot'):
             plugin.set_robot(self)
         """添加插件"""
         self.plugins.append(plugin)
+        self._dispatch_index = None  # 插件变化后重新构建分发索引
+
+    def _get_plugin_timeout(self, plugin: Plugin) -> Optional[float]:
+        """插件超时时间，插件配置中的 timeout 优先于全局配置，0表示不限制"""
+        timeout = plugin.config.get("timeout", (config.get("plugins") or {}).get("timeout", 30))
+        return timeout or None
+
+    @staticmethod
+    def _apply_timeout_message(plugin: Plugin, context: Context) -> Context:
+        """插件超时后回复插件配置的 timeout_message，未配置时消息继续交给后面的插件"""
+        timeout_message = plugin.config.get("timeout_message")
+        if timeout_message and context is not None:
+            context.rtn_content = timeout_message
+            context.process_state = ProcessState.FINISHED_WITH_DEFAULT
+        return context
+
+    @staticmethod
+    def _apply_failure_policy(plugin: Plugin, context: Context) -> Context:
+        """插件超时、异常或熔断时：配置了 fail_closed 的插件（如权限校验）丢弃消息，其他插件继续执行后面的插件"""
+        if plugin.config.get("fail_closed") and context is not None and context.process_state == ProcessState.CONTINUE:
+            context.process_state = ProcessState.FINISHED
+        return context
+
+    def _get_breaker(self, plugin_name: str, plugin: Plugin) -> CircuitBreaker:
+        breaker = self._breakers.get(plugin_name)
+        if breaker is None:
+            plugins_config = config.get("plugins") or {}
+            breaker = CircuitBreaker(
+                plugin.config.get("breaker_failures", plugins_config.get("breaker_failures", 5)),
+                plugin.config.get("breaker_recovery", plugins_config.get("breaker_recovery", 60))
+            )
+            self._breakers[plugin_name] = breaker
+        return breaker
+
+    def get_breaker_stats(self) -> Dict:
+        """获取各插件的熔断状态和跳过次数"""
+        return {name: breaker.get_stats() for name, breaker in list(self._breakers.items())}
+
+    def _get_dispatch_index(self) -> DispatchIndex:
+        if self._dispatch_index is None:
+            self._dispatch_index = DispatchIndex(self.plugins)
+            logger.info(f"[gewechat] Built plugin dispatch index for {len(self.plugins)} plugins")
+        return self._dispatch_index
 
     def _compose_context(self, msg: Message) -> Optional[Context]:
         """根据消息构造上下文"""
@@ -516,8 +565,11 @@ class WeRobot:
                 return
             
             current_context = context
+            chain_start = time.perf_counter()
+            steps = []
 
-            for plugin in self.plugins:
+            # 只调用触发条件与该消息匹配的插件，顺序与优先级一致
+            for plugin in self._get_dispatch_index().get_plugins(context):
                 plugin_name = plugin.__class__.__name__
                 
                 if current_context is None or current_context.process_state != ProcessState.CONTINUE:
@@ -526,16 +578,51 @@ class WeRobot:
                     )
                     break
 
+                # 观察者在后台处理快照，不等待结果
+                if isinstance(plugin, ObserverPlugin) and plugin.should_observe(current_context):
+                    self.observers.submit(plugin, current_context.snapshot(), self._get_plugin_timeout(plugin))
+
+                # 熔断中的插件直接跳过，fail_closed 的插件熔断时丢弃消息
+                breaker = self._get_breaker(plugin_name, plugin)
+                if not breaker.allow():
+                    logger.debug(f"[Plugin Chain] Circuit open, skipping plugin: {plugin_name}")
+                    current_context = self._apply_failure_policy(plugin, current_context)
+                    steps.append((plugin_name, 0.0, OUTCOME_SKIPPED))
+                    continue
+
+                plugin_start = time.perf_counter()
+                previous_context = current_context
                 try:
-                    current_context = await plugin.process(current_context)
+                    current_context = await asyncio.wait_for(
+                        plugin.process(current_context), self._get_plugin_timeout(plugin)
+                    )
+                    outcome = current_context.process_state.name if current_context else OUTCOME_NONE
+                    breaker.record_success()
                     logger.debug(
                         f"[Plugin Chain] Exiting plugin: {plugin_name},New process state: {current_context.process_state if current_context else 'None'}"
                     )
 
+                except asyncio.TimeoutError:
+                    # 超时的插件被取消，回复 timeout_message 或继续执行后面的插件
+                    outcome = OUTCOME_TIMEOUT
+                    current_context = self._apply_failure_policy(
+                        plugin, self._apply_timeout_message(plugin, previous_context))
+                    breaker.record_failure(timeout=True)
+                    logger.error(f"[Plugin Chain] Plugin {plugin_name} timed out")
                 except Exception as e:
+                    outcome = OUTCOME_EXCEPTION
+                    current_context = self._apply_failure_policy(plugin, previous_context)
+                    breaker.record_failure()
                     logger.error_with_trace(
                         f"[Plugin Chain] Exception in plugin {plugin_name}: {e} Current context: {current_context}\n"
                     )
+                except asyncio.CancelledError:
+                    # 消息处理本身被取消（如程序退出），不算插件失败，只释放试探名额
+                    breaker.release()
+                    raise
+                elapsed_ms = (time.perf_counter() - plugin_start) * 1000
+                self.chain_metrics.record_plugin(plugin_name, elapsed_ms, outcome)
+                steps.append((plugin_name, elapsed_ms, outcome))
 
             if current_context and (
                     current_context.process_state == ProcessState.CONTINUE or
@@ -544,11 +631,20 @@ class WeRobot:
                 logger.debug(
                     f"[Plugin Chain] Executing default handler,state: {current_context.process_state}\n"
                 )
+                send_start = time.perf_counter()
                 await self.send_message(current_context)
+                steps.append(("send_message", (time.perf_counter() - send_start) * 1000, "SENT"))
             else:
                 logger.debug(
                     f"[Plugin Chain] Skipping default handler,state: {current_context.process_state if current_context else 'None'}"
                 )
+
+            self.chain_metrics.record_chain((time.perf_counter() - chain_start) * 1000, steps, {
+                "msg_id": message.msg_id,
+                "type": context.type.value,
+                "is_group": context.is_group,
+                "receiver": context.receiver,
+            })
         except Exception as e:
             logger.error_with_trace(f"[gewechat] Error processing message: {e}, Message: {message}")
 
@@ -557,13 +653,15 @@ class WeRobot:
         if context.receiver and context.rtn_content:  # 只有设置了rtn_content才发送
             try:
                 # 构造发送消息的参数
-                if context.is_group and context.msg.actual_user_id:
+                if context.is_group and context.msg.actual_user_id and not context.get("skip_at"):
                     # 如果是群聊且需要@用户
                     ats = context.msg.actual_user_id
                 else:
                     ats = ""
 
-                result = self.client.post_text(
+                # Gewe 客户端是同步HTTP调用，放到线程池中执行，不阻塞其他会话
+                result = await asyncio.to_thread(
+                    self.client.post_text,
                     self.app_id,
                     context.receiver,
                     context.rtn_content,  # 使用rtn_content而不是content
@@ -702,17 +800,17 @@ class WeRobot:
     async def get_user_info(self, user_id: str) -> Optional[Dict]:
         """获取用户信息（优先从缓存获取）"""
         # 先从缓存获取
-        cached_info = CacheManager.get_cached_user_info(user_id)
+        cached_info = await asyncio.to_thread(CacheManager.get_cached_user_info, user_id)
         if cached_info:
             return cached_info
 
         # 缓存未命中，从API获取
         try:
-            info = self.client.get_brief_info(self.app_id, [user_id])
+            info = await asyncio.to_thread(self.client.get_brief_info, self.app_id, [user_id])
             if info.get('ret') == 200 and info.get('data'):
                 user_info = info['data'][0]
                 # 缓存用户信息
-                CacheManager.cache_user_info(user_id, user_info)
+                await asyncio.to_thread(CacheManager.cache_user_info, user_id, user_info)
                 return user_info
         except Exception as e:
             logger.error(f"Error getting user info for {user_id}: {e}")
@@ -722,17 +820,17 @@ class WeRobot:
     async def get_group_info(self, group_id: str) -> Optional[Dict]:
         """获取群组信息（优先从缓存获取）"""
         # 先从缓存获取
-        cached_info = CacheManager.get_cached_group_info(group_id)
+        cached_info = await asyncio.to_thread(CacheManager.get_cached_group_info, group_id)
         if cached_info:
             return cached_info
 
         # 缓存未命中，从API获取
         try:
-            info = self.client.get_brief_info(self.app_id, [group_id])
+            info = await asyncio.to_thread(self.client.get_brief_info, self.app_id, [group_id])
             if info.get('ret') == 200 and info.get('data'):
                 group_info = info['data'][0]
                 # 缓存群组信息
-                CacheManager.cache_group_info(group_id, group_info)
+                await asyncio.to_thread(CacheManager.cache_group_info, group_id, group_info)
                 return group_info
         except Exception as e:
             logger.error(f"Error getting group info for {group_id}: {e}")
@@ -747,7 +845,7 @@ class WeRobot:
     async def get_room_name_by_id(self, room_id: str) -> Optional[str]:
         """根据群ID获取群名"""
         try:
-            info = self.client.get_brief_info(self.app_id, [room_id])
+            info = await asyncio.to_thread(self.client.get_brief_info, self.app_id, [room_id])
             if info.get('ret') == 200 and info.get('data'):
                 room_info = info['data'][0]
                 return room_info.get('nickName')
@@ -930,6 +1028,11 @@ class WeRobot:
             # 设置全局事件循环
             global _event_loop
             _event_loop = asyncio.get_running_loop()
+            # 同步IO（Gewe客户端、Redis、MySQL）通过 asyncio.to_thread 在默认线程池中执行
+            _event_loop.set_default_executor(ThreadPoolExecutor(
+                max_workers=(config.get("plugins") or {}).get("blocking_io_threads", 32),
+                thread_name_prefix="blocking-io"
+            ))
 
             # 初始化检查，增加重试逻辑
             max_retries = 3
@@ -981,18 +1084,12 @@ class WeRobot:
 
         for i in range(retry_count):
             try:
-                response = self.client.get_msg_image(self.app_id, msg_id)
+                response = await asyncio.to_thread(self.client.get_msg_image, self.app_id, msg_id)
                 if response and response.get('ret') == 200:
                     img_data = response.get('data', {}).get('image')
                     if img_data:
-                        # 保存图片
-                        tmp_dir = "tmp"
-                        os.makedirs(tmp_dir, exist_ok=True)
-                        file_path = os.path.join(tmp_dir, f"{msg_id}.png")
-
-                        with open(file_path, 'wb') as f:
-                            f.write(base64.b64decode(img_data))
-                        return file_path
+                        # 保存图片到媒体存储（解码和写文件同样在线程池中执行）
+                        return await asyncio.to_thread(media_store.put_base64, img_data, ".png")
                 logger.warning(f"[gewechat] Failed to download image, attempt {i+1}/{retry_count}")
             except Exception as e:
                 logger.error(f"[gewechat] Error downloading image: {e}")
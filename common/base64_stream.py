@@ -0,0 +1,57 @@
+import base64
+import binascii
+import hashlib
+from typing import BinaryIO, Iterator, Tuple
+
+# 解码时每次处理的base64字符数（4的倍数）
+DECODE_CHUNK_SIZE = 64 * 1024
+# 编码时每次读取的字节数（3的倍数，保证分块编码结果可以直接拼接）
+ENCODE_CHUNK_SIZE = 48 * 1024
+
+_WHITESPACE = str.maketrans("", "", " \t\r\n")
+
+
+def decode_to_file(b64_text: str, output: BinaryIO, chunk_size: int = DECODE_CHUNK_SIZE) -> Tuple[int, str]:
+    """分块解码base64文本并写入文件，返回 (写入字节数, sha256)
+
+    不会一次性生成完整的二进制数据，适合回调里较大的图片数据。
+    """
+    digest = hashlib.sha256()
+    written = 0
+    remainder = ""
+
+    for start in range(0, len(b64_text), chunk_size):
+        piece = remainder + b64_text[start:start + chunk_size].translate(_WHITESPACE)
+        usable = len(piece) - len(piece) % 4
+        remainder = piece[usable:]
+        if not usable:
+            continue
+        data = binascii.a2b_base64(piece[:usable])
+        output.write(data)
+        digest.update(data)
+        written += len(data)
+
+    if remainder:
+        # 补齐缺失的填充字符
+        data = binascii.a2b_base64(remainder + "=" * (-len(remainder) % 4))
+        output.write(data)
+        digest.update(data)
+        written += len(data)
+
+    return written, digest.hexdigest()
+
+
+def iter_encode_file(file_path: str, chunk_size: int = ENCODE_CHUNK_SIZE) -> Iterator[str]:
+    """分块读取文件并逐块输出base64文本"""
+    chunk_size -= chunk_size % 3
+    with open(file_path, 'rb') as f:
+        while True:
+            data = f.read(chunk_size)
+            if not data:
+                break
+            yield base64.b64encode(data).decode('ascii')
+
+
+def encode_file(file_path: str, chunk_size: int = ENCODE_CHUNK_SIZE) -> str:
+    """使用固定大小的缓冲区把文件编码为base64文本"""
+    return "".join(iter_encode_file(file_path, chunk_size))
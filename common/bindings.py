@@ -0,0 +1,103 @@
+import csv
+import io
+import json
+import uuid
+from datetime import datetime
+from typing import Dict, List, Tuple
+from sqlalchemy import insert as sql_insert
+from sqlalchemy.dialects.mysql import insert
+from common.log import logger
+from common.database_manager import db_manager
+from common.models import CustomBindKey, WxGroup, WxUser
+from common.cache_manager import CacheManager
+from common.event_bus import EventBus
+
+BIND_TYPE_USER = 1
+BIND_TYPE_GROUP = 2
+
+# 导入文件中 type 列可用的写法
+_BIND_TYPES = {
+    "user": BIND_TYPE_USER, "1": BIND_TYPE_USER, "用户": BIND_TYPE_USER,
+    "group": BIND_TYPE_GROUP, "2": BIND_TYPE_GROUP, "群组": BIND_TYPE_GROUP,
+}
+
+
+def generate_bind_keys(count: int, customer_id: str = None, customer: str = None) -> List[str]:
+    """批量生成绑定密钥，一条 executemany 插入、一次提交"""
+    now = datetime.now()
+    keys = [str(uuid.uuid4()) for _ in range(count)]
+    session = db_manager.get_session()
+    try:
+        session.execute(sql_insert(CustomBindKey), [
+            {"bind_key": key, "customer_id": customer_id, "customer": customer, "created_time": now, "status": 0}
+            for key in keys
+        ])
+        session.commit()
+    except Exception:
+        session.rollback()
+        raise
+    finally:
+        db_manager.close_session(session)
+    logger.info(f"Generated {count} bind keys for customer {customer_id}")
+    return keys
+
+
+def parse_bindings(body: str, content_type: str = "") -> List[Dict]:
+    """解析批量导入的绑定，支持 JSON 数组（或 {"bindings": [...]}）和带表头的 CSV
+
+    每条绑定包含 type（user/group）、id、customer_id，可选 name。
+    """
+    body = body.lstrip("\ufeff").strip()
+    if "json" in content_type or body.startswith(("[", "{")):
+        data = json.loads(body)
+        return data.get("bindings", []) if isinstance(data, dict) else data
+    return list(csv.DictReader(io.StringIO(body)))
+
+
+def _normalize(rows: List[Dict]) -> Tuple[Dict[str, Dict], Dict[str, Dict], int]:
+    groups, users, skipped = {}, {}, 0
+    for row in rows:
+        bind_type = _BIND_TYPES.get(str(row.get("type", "")).strip().lower())
+        chat_id = str(row.get("id") or "").strip()
+        customer_id = str(row.get("customer_id") or "").strip()
+        if not bind_type or not chat_id or not customer_id:
+            skipped += 1
+            continue
+        name = (row.get("name") or "").strip() or None
+        if bind_type == BIND_TYPE_GROUP:
+            groups[chat_id] = {"wx_group_id": chat_id, "wx_group_name": name, "customer_id": customer_id}
+        else:
+            users[chat_id] = {"wx_user_id": chat_id, "wx_username": name, "customer_id": customer_id}
+    return groups, users, skipped
+
+
+def import_bindings(rows: List[Dict]) -> Dict[str, int]:
+    """批量导入已有的群组/用户绑定
+
+    每张表一条 INSERT ... ON DUPLICATE KEY UPDATE，已存在的绑定更新名称和客户ID。
+    提交后用一个 pipeline 预热权限缓存，并发布 bindings_imported 事件。
+    """
+    groups, users, skipped = _normalize(rows)
+    session = db_manager.get_session()
+    try:
+        for model, values in ((WxGroup, groups), (WxUser, users)):
+            if not values:
+                continue
+            name_field = "wx_group_name" if model is WxGroup else "wx_username"
+            stmt = insert(model).values(list(values.values()))
+            stmt = stmt.on_duplicate_key_update(
+                customer_id=stmt.inserted.customer_id,
+                **{name_field: stmt.inserted[name_field]}
+            )
+            session.execute(stmt)
+        session.commit()
+    except Exception:
+        session.rollback()
+        raise
+    finally:
+        db_manager.close_session(session)
+
+    CacheManager.warm_auth_cache(list(groups), list(users))
+    EventBus.publish("bindings_imported", group_ids=list(groups), user_ids=list(users))
+    logger.info(f"Imported {len(groups)} group and {len(users)} user bindings, skipped {skipped}")
+    return {"groups": len(groups), "users": len(users), "skipped": skipped}
@@ -1,13 +1,19 @@
-from typing import Dict, Optional
+import asyncio
+from typing import Dict, List, Optional
 from common.redis_manager import redis_manager
+from common.redis_pubsub import redis_pubsub
 from common.log import logger
 
+CACHE_CLEARED_CHANNEL = "cache_cleared"  # clear_all_cache 后广播，订阅方重新加载内存缓存
+
 class CacheManager:
     """缓存管理类"""
     
     # 缓存key前缀
     USER_INFO_PREFIX = "user_info:"
     GROUP_INFO_PREFIX = "group_info:"
+    AUTH_GROUP_PREFIX = "gewe-auth:group:"  # 与 UserGroupValidatorPlugin 的权限缓存一致
+    AUTH_USER_PREFIX = "gewe-auth:user:"
     CACHE_EXPIRE = 1800  # 30分钟过期时间
 
     _robot = None  # 类变量存储robot实例
@@ -34,6 +40,21 @@ class CacheManager:
             if keys:
                 redis_client.delete(*keys)
                 logger.info(f"Cleared {len(keys)} cache keys for pattern: {pattern}")
+        # 通知所有进程重新加载依赖这些键的内存缓存（如监听中的用户）
+        redis_pubsub.publish(CACHE_CLEARED_CHANNEL, {"cleared": True})
+
+    @classmethod
+    def warm_auth_cache(cls, group_ids: List[str], user_ids: List[str]) -> None:
+        """批量把群组/用户的权限缓存设为已授权，一个 pipeline 写入"""
+        if not group_ids and not user_ids:
+            return
+        redis_client = redis_manager.get_client()
+        pipe = redis_client.pipeline(transaction=False)
+        for prefix, ids in ((cls.AUTH_GROUP_PREFIX, group_ids), (cls.AUTH_USER_PREFIX, user_ids)):
+            for chat_id in ids:
+                pipe.setex(redis_manager.get_prefixed_key(f"{prefix}{chat_id}"), cls.CACHE_EXPIRE, "1")
+        pipe.execute()
+        logger.info(f"Warmed auth cache for {len(group_ids)} groups and {len(user_ids)} users")
 
     @classmethod
     def cache_user_info(cls, user_id: str, user_info: Dict) -> None:
@@ -88,8 +109,10 @@ class CacheManager:
     async def get_group_name(cls, group_id: str) -> Optional[str]:
         """获取群组名称，优先从缓存获取，没有则从API获取并缓存"""
         redis_client = redis_manager.get_client()
-        room_name = redis_client.hget(redis_manager.get_prefixed_key("chatroom_ids"), group_id)
-        
+        room_name = await asyncio.to_thread(
+            redis_client.hget, redis_manager.get_prefixed_key("chatroom_ids"), group_id
+        )
+
         if room_name:
             return room_name
         
@@ -103,7 +126,7 @@ class CacheManager:
                 pipe.hset(redis_manager.get_prefixed_key("chatroom_ids"), group_id, room_name)
                 pipe.expire(redis_manager.get_prefixed_key("chatroom_names"), cls.CACHE_EXPIRE)
                 pipe.expire(redis_manager.get_prefixed_key("chatroom_ids"), cls.CACHE_EXPIRE)
-                pipe.execute()
+                await asyncio.to_thread(pipe.execute)
 
                 logger.debug(f"Updated cache for group {group_id}: {room_name}")
                 return room_name
@@ -5,7 +5,7 @@ from common.db_base import Base
 from common.log import logger
 
 # 导入models以确保表被创建
-from common.models import WxUser, WxGroup
+from common.models import WxUser, WxGroup, AIUsage, KeywordRuleSet, KeywordRule
 
 class DatabaseManager:
     _instance = None
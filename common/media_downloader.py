@@ -0,0 +1,217 @@
+import os
+import time
+import asyncio
+import threading
+from concurrent.futures import Future
+from typing import Callable, Dict, Optional
+from urllib.parse import urlparse
+import aiohttp
+from config.config_manager import config
+from common.log import logger
+from common.metrics import metrics
+
+# 进度回调: (已下载字节数, 总字节数或None)
+ProgressCallback = Callable[[int, Optional[int]], None]
+
+
+class DownloadError(Exception):
+    """下载失败，retryable 表示是否值得重试（5xx可以，4xx和超过大小上限不重试）"""
+
+    def __init__(self, message: str, retryable: bool = False):
+        super().__init__(message)
+        self.retryable = retryable
+
+
+class MediaDownloader:
+    """媒体文件异步下载服务
+
+    在独立的后台事件循环中运行，所有下载共享一个带连接池的 aiohttp 会话，
+    按主机限制并发，流式写入磁盘。可以从任意线程或事件循环中调用。
+    """
+
+    PROGRESS_LOG_STEP = 0.25  # 每下载25%记录一次进度
+    RETRY_BACKOFF = 0.5  # 第一次重试前等待的秒数，之后每次翻倍
+
+    def __init__(self):
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._host_semaphores: Dict[str, asyncio.Semaphore] = {}
+        self._lock = threading.Lock()
+
+        media_config = config.get("media", {})
+        self.total_timeout = media_config.get("download_timeout", 120)
+        self.connect_timeout = media_config.get("connect_timeout", 10)
+        self.read_timeout = media_config.get("read_timeout", 30)
+        self.retries = media_config.get("download_retries", 2)
+        self.max_bytes = media_config.get("max_download_bytes", 200 * 1024 * 1024)
+        self.max_connections = media_config.get("max_connections", 32)
+        self.max_per_host = media_config.get("max_per_host", 4)
+        self.chunk_size = media_config.get("chunk_size", 256 * 1024)
+        self.write_buffer_size = media_config.get("write_buffer_size", 1024 * 1024)
+
+        self._stats = {
+            "started": 0,
+            "completed": 0,
+            "failed": 0,
+            "retries": 0,
+            "in_flight": 0,
+            "bytes": 0,
+            "seconds": 0.0,
+        }
+        metrics.register("media_downloader", self.get_stats)
+
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        """启动后台事件循环线程"""
+        with self._lock:
+            if self._loop is None or self._loop.is_closed():
+                self._loop = asyncio.new_event_loop()
+                self._thread = threading.Thread(
+                    target=self._loop.run_forever,
+                    name="MediaDownloader",
+                    daemon=True
+                )
+                self._thread.start()
+                logger.info("[MediaDownloader] Background loop started")
+            return self._loop
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        """获取共享会话（只在后台事件循环中调用）"""
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.max_connections,
+                limit_per_host=self.max_per_host,
+                ttl_dns_cache=300,
+                keepalive_timeout=60
+            )
+            timeout = aiohttp.ClientTimeout(
+                total=self.total_timeout,
+                connect=self.connect_timeout,
+                sock_read=self.read_timeout
+            )
+            self._session = aiohttp.ClientSession(connector=connector, timeout=timeout)
+        return self._session
+
+    def _get_host_semaphore(self, url: str) -> asyncio.Semaphore:
+        host = urlparse(url).netloc
+        if host not in self._host_semaphores:
+            self._host_semaphores[host] = asyncio.Semaphore(self.max_per_host)
+        return self._host_semaphores[host]
+
+    async def _fetch(self, session: aiohttp.ClientSession, url: str, tmp_path: str, file_path: str,
+                     progress_callback: Optional[ProgressCallback] = None) -> int:
+        """下载一次到临时文件，返回下载的字节数"""
+        downloaded = 0
+        async with session.get(url) as response:
+            if response.status != 200:
+                raise DownloadError(f"status {response.status}", retryable=response.status >= 500)
+
+            total = response.content_length
+            if self.max_bytes and total and total > self.max_bytes:
+                raise DownloadError(f"size {total} exceeds limit {self.max_bytes}")
+            next_log = self.PROGRESS_LOG_STEP
+            os.makedirs(os.path.dirname(file_path) or ".", exist_ok=True)
+            with open(tmp_path, 'wb', buffering=self.write_buffer_size) as f:
+                async for chunk in response.content.iter_chunked(self.chunk_size):
+                    downloaded += len(chunk)
+                    # 没有 Content-Length 或长度不实时，按实际读取的字节数限制
+                    if self.max_bytes and downloaded > self.max_bytes:
+                        raise DownloadError(f"size exceeds limit {self.max_bytes}")
+                    f.write(chunk)
+                    if progress_callback:
+                        progress_callback(downloaded, total)
+                    if total and downloaded / total >= next_log:
+                        logger.debug(f"[MediaDownloader] {file_path}: {downloaded}/{total} bytes")
+                        next_log += self.PROGRESS_LOG_STEP
+        return downloaded
+
+    async def _download(self, url: str, file_path: str,
+                        progress_callback: Optional[ProgressCallback] = None) -> Optional[str]:
+        """在后台事件循环中执行下载，连接错误、超时和5xx按指数退避重试"""
+        session = self._get_session()
+        tmp_path = f"{file_path}.part"
+        self._stats["started"] += 1
+        self._stats["in_flight"] += 1
+        start_time = time.monotonic()
+
+        try:
+            async with self._get_host_semaphore(url):
+                for attempt in range(self.retries + 1):
+                    try:
+                        downloaded = await self._fetch(session, url, tmp_path, file_path, progress_callback)
+                        break
+                    except (DownloadError, aiohttp.ClientError, asyncio.TimeoutError) as e:
+                        if not getattr(e, "retryable", True) or attempt >= self.retries:
+                            raise
+                        delay = self.RETRY_BACKOFF * 2 ** attempt
+                        self._stats["retries"] += 1
+                        logger.warning(f"[MediaDownloader] Error downloading {url}: {e!r}, retrying in {delay:.1f}s")
+                        await asyncio.sleep(delay)
+
+            os.replace(tmp_path, file_path)
+            elapsed = time.monotonic() - start_time
+            self._stats["completed"] += 1
+            self._stats["bytes"] += downloaded
+            self._stats["seconds"] += elapsed
+            logger.info(f"[MediaDownloader] Saved {file_path} ({downloaded} bytes in {elapsed:.2f}s)")
+            return file_path
+
+        except Exception as e:
+            self._stats["failed"] += 1
+            logger.error(f"[MediaDownloader] Error downloading {url}: {e!r}")
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return None
+        finally:
+            self._stats["in_flight"] -= 1
+
+    def submit(self, url: str, file_path: str,
+               progress_callback: Optional[ProgressCallback] = None) -> Future:
+        """提交下载任务，立即返回 concurrent.futures.Future"""
+        loop = self._ensure_loop()
+        return asyncio.run_coroutine_threadsafe(
+            self._download(url, file_path, progress_callback), loop
+        )
+
+    async def download(self, url: str, file_path: str,
+                       progress_callback: Optional[ProgressCallback] = None) -> Optional[str]:
+        """在任意事件循环中等待下载完成，返回文件路径，失败返回None"""
+        return await asyncio.wrap_future(self.submit(url, file_path, progress_callback))
+
+    def download_sync(self, url: str, file_path: str, timeout: Optional[float] = None) -> Optional[str]:
+        """在同步代码中下载文件"""
+        return self.submit(url, file_path).result(timeout or self.total_timeout)
+
+    def get_stats(self) -> Dict:
+        """获取下载统计信息"""
+        stats = dict(self._stats)
+        seconds = stats["seconds"]
+        stats["throughput_bytes_per_sec"] = round(stats["bytes"] / seconds, 2) if seconds > 0 else 0.0
+        stats["avg_seconds"] = round(seconds / stats["completed"], 3) if stats["completed"] else 0.0
+        return stats
+
+    async def _close_session(self):
+        if self._session and not self._session.closed:
+            await self._session.close()
+
+    def close(self) -> None:
+        """关闭共享会话并停止后台事件循环"""
+        with self._lock:
+            loop = self._loop
+            self._loop = None
+        if loop is None or loop.is_closed():
+            return
+        try:
+            asyncio.run_coroutine_threadsafe(self._close_session(), loop).result(5)
+        except Exception as e:
+            logger.warning(f"[MediaDownloader] Error closing session: {e}")
+        loop.call_soon_threadsafe(loop.stop)
+        if self._thread:
+            self._thread.join(timeout=5)
+        loop.close()
+        self._session = None
+        self._host_semaphores.clear()
+        logger.info("[MediaDownloader] Closed")
+
+# 创建全局实例
+media_downloader = MediaDownloader()
@@ -0,0 +1,292 @@
+import os
+import time
+import uuid
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional
+from config.config_manager import config
+from common.log import logger
+from common.metrics import metrics
+from common.base64_stream import decode_to_file, encode_file
+
+
+class MediaStore:
+    """按内容哈希存储的媒体目录
+
+    文件以 `{sha256}{ext}` 命名，相同内容只保存一份。按最近访问顺序维护索引，
+    超过磁盘配额时由后台清理线程按 LRU 删除最久未使用的文件。
+    """
+
+    HASH_BUFFER_SIZE = 1024 * 1024
+    STAGING_DIR = ".staging"
+    STAGING_MAX_AGE = 3600  # 残留的临时文件1小时后删除
+
+    def __init__(self):
+        media_config = config.get("media", {})
+        self.base_dir = os.path.abspath(media_config.get("dir", "tmp"))
+        self.max_bytes = media_config.get("store_max_bytes", 1024 * 1024 * 1024)
+        self.janitor_interval = media_config.get("janitor_interval", 300)
+        self.min_age = media_config.get("evict_min_age", 60)  # 刚访问过的文件不删除，避免删掉正在使用的文件
+        self.b64_cache_max_bytes = media_config.get("b64_cache_max_bytes", 64 * 1024 * 1024)
+
+        self._entries: "OrderedDict[str, Dict]" = OrderedDict()  # 文件名 -> {size, atime}，按访问顺序排列
+        self._total_bytes = 0
+        self._b64_cache: "OrderedDict[str, str]" = OrderedDict()  # sha256 -> base64文本
+        self._b64_cache_bytes = 0
+        self._lock = threading.RLock()
+        self._wakeup = threading.Event()
+        self._janitor: Optional[threading.Thread] = None
+        self._stats = {
+            "stored": 0,
+            "dedup_hits": 0,
+            "evictions": 0,
+            "evicted_bytes": 0,
+            "b64_hits": 0,
+            "b64_misses": 0,
+        }
+
+        os.makedirs(os.path.join(self.base_dir, self.STAGING_DIR), exist_ok=True)
+        self._scan()
+        metrics.register("media_store", self.get_stats)
+
+    def _scan(self) -> None:
+        """启动时扫描已有文件，按修改时间重建LRU索引"""
+        files = []
+        for name in os.listdir(self.base_dir):
+            path = os.path.join(self.base_dir, name)
+            if os.path.isfile(path):
+                stat = os.stat(path)
+                files.append((stat.st_mtime, name, stat.st_size))
+
+        with self._lock:
+            for mtime, name, size in sorted(files):
+                self._entries[name] = {"size": size, "atime": mtime}
+                self._total_bytes += size
+        logger.info(f"[MediaStore] Indexed {len(files)} files ({self._total_bytes} bytes) in {self.base_dir}")
+
+    @staticmethod
+    def _normalize_ext(ext: Optional[str]) -> str:
+        if not ext:
+            return ""
+        return ext if ext.startswith(".") else f".{ext}"
+
+    def staging_path(self, ext: Optional[str] = None) -> str:
+        """获取一个临时文件路径，写完后通过 put_file 存入"""
+        return os.path.join(self.base_dir, self.STAGING_DIR, f"{uuid.uuid4().hex}{self._normalize_ext(ext)}")
+
+    @classmethod
+    def hash_file(cls, file_path: str) -> str:
+        """计算文件内容的sha256"""
+        digest = hashlib.sha256()
+        with open(file_path, 'rb') as f:
+            while True:
+                chunk = f.read(cls.HASH_BUFFER_SIZE)
+                if not chunk:
+                    break
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    def digest_of(self, file_path: str) -> str:
+        """文件内容的sha256，存储内的文件直接取文件名，不再重新计算"""
+        name = os.path.basename(file_path)
+        digest = os.path.splitext(name)[0]
+        if len(digest) == 64 and os.path.dirname(os.path.abspath(file_path)) == self.base_dir:
+            with self._lock:
+                if name in self._entries:
+                    return digest
+        return self.hash_file(file_path)
+
+    def _add_entry_locked(self, name: str, size: int) -> bool:
+        """记录新存入的文件，返回是否超出配额；同名的旧记录（文件已被外部删除）先扣除大小"""
+        self._drop_locked(name)
+        self._entries[name] = {"size": size, "atime": time.time()}
+        self._total_bytes += size
+        self._stats["stored"] += 1
+        return self._total_bytes > self.max_bytes
+
+    def put_file(self, src_path: str, ext: Optional[str] = None, digest: Optional[str] = None) -> str:
+        """把已写好的文件移入存储，返回按内容命名的路径；内容重复时删除源文件"""
+        if ext is None:
+            ext = os.path.splitext(src_path)[1]
+        digest = digest or self.hash_file(src_path)
+        name = f"{digest}{self._normalize_ext(ext)}"
+        dest_path = os.path.join(self.base_dir, name)
+
+        with self._lock:
+            if name in self._entries and os.path.exists(dest_path):
+                self._stats["dedup_hits"] += 1
+                self._touch_locked(name)
+                if os.path.abspath(src_path) != dest_path:
+                    os.remove(src_path)
+                return dest_path
+
+            # 检查、移动和记账在同一个锁内完成，并发存入相同内容时只记一次
+            size = os.path.getsize(src_path)
+            os.replace(src_path, dest_path)
+            over_quota = self._add_entry_locked(name, size)
+        if over_quota:
+            self._wakeup.set()
+        return dest_path
+
+    def put_bytes(self, data: bytes, ext: Optional[str] = None) -> str:
+        """保存一段内存中的数据，返回按内容命名的路径"""
+        digest = hashlib.sha256(data).hexdigest()
+        name = f"{digest}{self._normalize_ext(ext)}"
+        dest_path = os.path.join(self.base_dir, name)
+
+        with self._lock:
+            if name in self._entries and os.path.exists(dest_path):
+                self._stats["dedup_hits"] += 1
+                self._touch_locked(name)
+                return dest_path
+
+        tmp_path = self.staging_path(ext)
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        return self.put_file(tmp_path, ext, digest)
+
+    def put_base64(self, b64_text: str, ext: Optional[str] = None) -> str:
+        """分块解码base64文本并存入，返回按内容命名的路径"""
+        tmp_path = self.staging_path(ext)
+        with open(tmp_path, 'wb', buffering=self.HASH_BUFFER_SIZE) as f:
+            _, digest = decode_to_file(b64_text, f)
+        return self.put_file(tmp_path, ext, digest)
+
+    def get_base64(self, file_path: str) -> str:
+        """获取文件的base64文本，按内容哈希缓存，同一张图片只编码一次"""
+        name = os.path.basename(file_path)
+        digest = os.path.splitext(name)[0]
+        with self._lock:
+            if name not in self._entries:
+                digest = None  # 不是存储内的文件，无法按内容缓存
+            elif digest in self._b64_cache:
+                self._stats["b64_hits"] += 1
+                self._b64_cache.move_to_end(digest)
+                self._touch_locked(name)
+                return self._b64_cache[digest]
+            self._stats["b64_misses"] += 1
+
+        encoded = encode_file(file_path)
+        if digest is None or len(encoded) > self.b64_cache_max_bytes:
+            return encoded
+
+        with self._lock:
+            if digest not in self._b64_cache:
+                self._b64_cache[digest] = encoded
+                self._b64_cache_bytes += len(encoded)
+                while self._b64_cache_bytes > self.b64_cache_max_bytes:
+                    _, evicted = self._b64_cache.popitem(last=False)
+                    self._b64_cache_bytes -= len(evicted)
+        return encoded
+
+    def _touch_locked(self, name: str) -> None:
+        entry = self._entries.get(name)
+        if entry:
+            entry["atime"] = time.time()
+            self._entries.move_to_end(name)
+
+    def resolve(self, file_ref: str) -> Optional[str]:
+        """把文件名或路径解析为存储内的绝对路径并更新访问时间，不在存储内返回None"""
+        if not file_ref:
+            return None
+        if os.path.basename(file_ref) == file_ref:
+            path = os.path.join(self.base_dir, file_ref)  # 只传了文件名
+        else:
+            path = os.path.abspath(file_ref)
+        if os.path.dirname(path) != self.base_dir:
+            return None
+
+        name = os.path.basename(path)
+        with self._lock:
+            if name not in self._entries:
+                return None
+            if not os.path.exists(path):
+                self._drop_locked(name)
+                return None
+            self._touch_locked(name)
+        return path
+
+    def touch(self, file_path: str) -> None:
+        """标记文件被访问"""
+        with self._lock:
+            self._touch_locked(os.path.basename(file_path))
+
+    def _drop_locked(self, name: str) -> int:
+        entry = self._entries.pop(name, None)
+        if not entry:
+            return 0
+        self._total_bytes -= entry["size"]
+        cached = self._b64_cache.pop(os.path.splitext(name)[0], None)
+        if cached is not None:
+            self._b64_cache_bytes -= len(cached)
+        return entry["size"]
+
+    def evict(self) -> int:
+        """按LRU删除文件直到低于配额，返回删除的字节数"""
+        freed = 0
+        now = time.time()
+        with self._lock:
+            while self._total_bytes > self.max_bytes and self._entries:
+                name, entry = next(iter(self._entries.items()))
+                if now - entry["atime"] < self.min_age:
+                    break  # 剩下的都是最近访问过的文件
+                path = os.path.join(self.base_dir, name)
+                try:
+                    if os.path.exists(path):
+                        os.remove(path)
+                except OSError as e:
+                    logger.warning(f"[MediaStore] Failed to remove {path}: {e}")
+                    break
+                size = self._drop_locked(name)
+                freed += size
+                self._stats["evictions"] += 1
+                self._stats["evicted_bytes"] += size
+
+        if freed:
+            logger.info(f"[MediaStore] Evicted {freed} bytes, now {self._total_bytes}/{self.max_bytes} bytes")
+        return freed
+
+    def _clean_staging(self) -> None:
+        """删除异常残留的临时文件"""
+        staging_dir = os.path.join(self.base_dir, self.STAGING_DIR)
+        now = time.time()
+        for name in os.listdir(staging_dir):
+            path = os.path.join(staging_dir, name)
+            try:
+                if now - os.path.getmtime(path) > self.STAGING_MAX_AGE:
+                    os.remove(path)
+            except OSError:
+                pass
+
+    def _janitor_loop(self) -> None:
+        while True:
+            self._wakeup.wait(self.janitor_interval)
+            self._wakeup.clear()
+            try:
+                self.evict()
+                self._clean_staging()
+            except Exception as e:
+                logger.error_with_trace(f"[MediaStore] Janitor error: {e}")
+
+    def start_janitor(self) -> None:
+        """启动后台清理线程"""
+        if self._janitor and self._janitor.is_alive():
+            return
+        self._janitor = threading.Thread(target=self._janitor_loop, name="MediaStoreJanitor", daemon=True)
+        self._janitor.start()
+        logger.info(f"[MediaStore] Janitor started, quota {self.max_bytes} bytes")
+
+    def get_stats(self) -> Dict:
+        """获取存储统计信息"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["files"] = len(self._entries)
+            stats["bytes"] = self._total_bytes
+            stats["max_bytes"] = self.max_bytes
+            stats["b64_cache_entries"] = len(self._b64_cache)
+            stats["b64_cache_bytes"] = self._b64_cache_bytes
+        return stats
+
+# 创建全局实例
+media_store = MediaStore()
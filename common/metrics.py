@@ -0,0 +1,93 @@
+import bisect
+import threading
+from typing import Callable, Dict, Sequence
+from common.log import logger
+
+# 默认的耗时分桶上界（毫秒）
+DEFAULT_LATENCY_BUCKETS_MS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000, 60000)
+
+
+class Histogram:
+    """固定分桶的直方图
+
+    observe 只做一次二分查找和几次加法，适合在每条消息的处理路径上常开。
+    只在事件循环线程中写入，读取时复制一份，不加锁。
+    """
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_LATENCY_BUCKETS_MS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # 最后一个桶是超出最大上界的部分
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        if value > self.max:
+            self.max = value
+
+    def percentile(self, percent: float) -> float:
+        """按分桶估算分位数，返回所在桶的上界（不超过最大值）"""
+        if not self.count:
+            return 0.0
+        target = self.count * percent / 100.0
+        seen = 0
+        for index, bucket_count in enumerate(self.counts):
+            seen += bucket_count
+            if seen >= target:
+                return min(self.buckets[index], self.max) if index < len(self.buckets) else self.max
+        return self.max
+
+    def snapshot(self) -> Dict:
+        counts = list(self.counts)
+        return {
+            "count": self.count,
+            "sum": round(self.sum, 3),
+            "avg": round(self.sum / self.count, 3) if self.count else 0.0,
+            "max": round(self.max, 3),
+            "p50": self.percentile(50),
+            "p95": self.percentile(95),
+            "p99": self.percentile(99),
+            "buckets": {
+                **{f"le_{bound}": count for bound, count in zip(self.buckets, counts)},
+                "inf": counts[-1],
+            },
+        }
+
+
+class MetricsRegistry:
+    """统计信息注册中心，各组件注册自己的统计函数"""
+
+    def __init__(self):
+        self._providers: Dict[str, Callable[[], Dict]] = {}
+        self._lock = threading.Lock()
+
+    def register(self, name: str, provider: Callable[[], Dict]) -> None:
+        """注册统计信息提供者"""
+        with self._lock:
+            self._providers[name] = provider
+        logger.debug(f"[Metrics] Registered provider: {name}")
+
+    def unregister(self, name: str) -> None:
+        """注销统计信息提供者"""
+        with self._lock:
+            self._providers.pop(name, None)
+
+    def snapshot(self) -> Dict[str, Dict]:
+        """获取所有组件的统计信息"""
+        with self._lock:
+            providers = dict(self._providers)
+
+        result = {}
+        for name, provider in providers.items():
+            try:
+                result[name] = provider()
+            except Exception as e:
+                logger.error(f"[Metrics] Error collecting stats from {name}: {e}")
+                result[name] = {"error": str(e)}
+        return result
+
+# 创建全局实例
+metrics = MetricsRegistry()
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, Boolean
+from sqlalchemy import Column, Integer, BigInteger, String, Date, DateTime, Boolean, UniqueConstraint, Index
 from common.db_base import Base
 from datetime import datetime
 
@@ -6,7 +6,7 @@ class WxUser(Base):
     __tablename__ = 'wxuser'
 
     id = Column(Integer, primary_key=True, autoincrement=True)
-    wx_user_id = Column(String(20), comment='wx_user_id')
+    wx_user_id = Column(String(20), unique=True, nullable=False, comment='wx_user_id')
     wx_username = Column(String(50), comment='wx_username')
     wx_user_comment = Column(String(255))
     customer_id = Column(String(50))
@@ -20,7 +20,7 @@ class WxGroup(Base):
     __tablename__ = 'wxgroup'
 
     id = Column(Integer, primary_key=True, autoincrement=True)
-    wx_group_id = Column(String(20), comment='wx_group_id')
+    wx_group_id = Column(String(20), unique=True, nullable=False, comment='wx_group_id')
     wx_group_name = Column(String(50), comment='wx_group_name')
     wx_group_comment = Column(String(255))
     customer_id = Column(String(50))
@@ -36,7 +36,7 @@ class CustomBindKey(Base):
     id = Column(Integer, primary_key=True)
     customer_id = Column(String(50))
     customer = Column(String(50), comment='客户名称')
-    bind_key = Column(String(255), comment='绑定key')
+    bind_key = Column(String(255), unique=True, nullable=False, comment='绑定key')
     created_time = Column(DateTime, comment='创建时间')
     bind_time = Column(DateTime, comment='绑定时间')
     status = Column(Integer, default=0, comment='绑定状态 0:未绑定 1:已绑定')
@@ -59,3 +59,60 @@ class AdminUser(Base):
 
     def __repr__(self):
         return f"<AdminUser(id={self.id}, wx_user_id='{self.wx_user_id}', is_super_admin={self.is_super_admin})>"
+
+
+class AIUsage(Base):
+    __tablename__ = 'ai_usage'
+    __table_args__ = (
+        UniqueConstraint('customer_id', 'model', 'usage_date', name='uk_customer_model_date'),
+    )
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    customer_id = Column(String(50), nullable=False, comment='客户ID')
+    model = Column(String(50), nullable=False, comment='模型名称')
+    usage_date = Column(Date, nullable=False, comment='日期')
+    requests = Column(Integer, default=0, comment='请求次数')
+    prompt_tokens = Column(BigInteger, default=0, comment='输入token数')
+    completion_tokens = Column(BigInteger, default=0, comment='输出token数')
+    total_tokens = Column(BigInteger, default=0, comment='总token数')
+    update_time = Column(DateTime, default=datetime.now, onupdate=datetime.now, comment='更新时间')
+
+    def __repr__(self):
+        return f"<AIUsage(customer_id='{self.customer_id}', model='{self.model}', usage_date={self.usage_date}, total_tokens={self.total_tokens})>"
+
+
+class KeywordRuleSet(Base):
+    __tablename__ = 'keyword_rule_set'
+    __table_args__ = (
+        Index('idx_scope', 'scope_type', 'scope_id'),
+    )
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    name = Column(String(100), comment='规则集名称')
+    scope_type = Column(Integer, nullable=False, comment='作用范围 1:群组 2:客户')
+    scope_id = Column(String(50), nullable=False, comment='wx_group_id或customer_id')
+    version = Column(Integer, default=1, comment='版本号，修改规则后加1')
+    status = Column(Integer, default=1, comment='状态 0:停用 1:启用')
+    update_time = Column(DateTime, default=datetime.now, onupdate=datetime.now, comment='更新时间')
+
+    def __repr__(self):
+        return f"<KeywordRuleSet(id={self.id}, scope_type={self.scope_type}, scope_id='{self.scope_id}', version={self.version})>"
+
+
+class KeywordRule(Base):
+    __tablename__ = 'keyword_rule'
+    __table_args__ = (
+        Index('idx_rule_set_id', 'rule_set_id'),
+    )
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    rule_set_id = Column(Integer, nullable=False, comment='规则集ID')
+    keyword = Column(String(255), nullable=False, comment='关键词或正则')
+    reply = Column(String(2000), comment='回复模板，为空时使用插件默认模板')
+    priority = Column(Integer, default=100, comment='优先级，数字越小越优先')
+    is_regex = Column(Boolean, default=False, comment='是否正则')
+    whole_word = Column(Boolean, default=False, comment='是否整词匹配')
+    status = Column(Integer, default=1, comment='状态 0:停用 1:启用')
+
+    def __repr__(self):
+        return f"<KeywordRule(id={self.id}, rule_set_id={self.rule_set_id}, keyword='{self.keyword}')>"
@@ -0,0 +1,92 @@
+import json
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+from common.log import logger
+from common.redis_manager import redis_manager
+
+
+class RedisPubSub:
+    """基于 Redis pub/sub 的进程间广播
+
+    多个副本共享同一个 Redis 时，用来把内存缓存的变更通知到其他进程。
+    所有频道共用一个订阅连接和一个后台线程，回调在该线程中执行，应只做内存更新。
+    连接断开后自动重连，并调用 on_reconnect 回调，订阅方应在其中重新全量加载，
+    补上断开期间错过的消息。
+    """
+
+    def __init__(self, retry_interval: float = 5):
+        self.retry_interval = retry_interval
+        self._handlers: Dict[str, List[Callable[[Dict], None]]] = {}
+        self._reconnect_handlers: List[Callable[[], None]] = []
+        self._lock = threading.Lock()
+        self._pubsub = None
+        self._worker: Optional[threading.Thread] = None
+
+    def _channel(self, channel: str) -> str:
+        return redis_manager.get_prefixed_key(f"gewe-auth:channel:{channel}")
+
+    def subscribe(self, channel: str, callback: Callable[[Dict], None],
+                  on_reconnect: Optional[Callable[[], None]] = None) -> None:
+        """订阅频道，收到消息时以解码后的字典调用 callback"""
+        with self._lock:
+            full_channel = self._channel(channel)
+            self._handlers.setdefault(full_channel, []).append(callback)
+            if on_reconnect:
+                self._reconnect_handlers.append(on_reconnect)
+            if self._pubsub is not None:
+                self._pubsub.subscribe(full_channel)
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._run, name="redis-pubsub", daemon=True)
+                self._worker.start()
+
+    def publish(self, channel: str, message: Dict) -> None:
+        """向所有进程（包括本进程）广播一条消息"""
+        try:
+            redis_manager.get_client().publish(self._channel(channel), json.dumps(message, ensure_ascii=False))
+        except Exception as e:
+            logger.error(f"[RedisPubSub] Error publishing to {channel}: {e}")
+
+    def _connect(self):
+        with self._lock:
+            pubsub = redis_manager.get_client().pubsub(ignore_subscribe_messages=True)
+            pubsub.subscribe(*self._handlers.keys())
+            self._pubsub = pubsub
+            return pubsub
+
+    def _run(self) -> None:
+        reconnecting = False
+        while True:
+            try:
+                pubsub = self._connect()
+                if reconnecting:
+                    logger.info("[RedisPubSub] Reconnected, reloading subscribers")
+                    reconnecting = False
+                    for handler in list(self._reconnect_handlers):
+                        handler()
+                for message in pubsub.listen():
+                    if message.get("type") != "message":
+                        continue
+                    self._dispatch(message["channel"], message["data"])
+            except Exception as e:
+                logger.error(f"[RedisPubSub] Subscriber connection lost: {e}")
+                reconnecting = True
+                with self._lock:
+                    self._pubsub = None
+                time.sleep(self.retry_interval)
+
+    def _dispatch(self, channel: str, data: str) -> None:
+        try:
+            payload = json.loads(data)
+        except ValueError:
+            logger.warning(f"[RedisPubSub] Ignored malformed message on {channel}: {data}")
+            return
+        for handler in list(self._handlers.get(channel, [])):
+            try:
+                handler(payload)
+            except Exception as e:
+                logger.error_with_trace(f"[RedisPubSub] Error in handler for {channel}: {e}")
+
+
+# 创建全局实例
+redis_pubsub = RedisPubSub()
@@ -30,7 +30,8 @@ class ConfigManager:
         # Push Server Configuration
         self._config["push_server"] = {
             "host": os.getenv("PUSH_SERVER_HOST", "0.0.0.0"),
-            "port": int(os.getenv("PUSH_SERVER_PORT", 5001))
+            "port": int(os.getenv("PUSH_SERVER_PORT", 5001)),
+            "admin_token": os.getenv("PUSH_ADMIN_TOKEN")  # /metrics、/bind_keys、/bindings 接口的令牌，未设置时接口关闭
         }
 
         # Database Configuration
@@ -52,6 +53,44 @@ class ConfigManager:
             "key_prefix": os.getenv("REDIS_KEY_PREFIX", "")  # 新增这行
         }
 
+        # Media Configuration
+        self._config["media"] = {
+            "dir": os.getenv("MEDIA_DIR", "tmp"),
+            "store_max_bytes": int(os.getenv("MEDIA_STORE_MAX_BYTES", 1024 * 1024 * 1024)),
+            "janitor_interval": int(os.getenv("MEDIA_JANITOR_INTERVAL", 300)),
+            "b64_cache_max_bytes": int(os.getenv("MEDIA_B64_CACHE_BYTES", 64 * 1024 * 1024)),
+            "download_timeout": float(os.getenv("MEDIA_DOWNLOAD_TIMEOUT", 120)),
+            "connect_timeout": float(os.getenv("MEDIA_CONNECT_TIMEOUT", 10)),
+            "read_timeout": float(os.getenv("MEDIA_READ_TIMEOUT", 30)),
+            "download_retries": int(os.getenv("MEDIA_DOWNLOAD_RETRIES", 2)),
+            "max_download_bytes": int(os.getenv("MEDIA_MAX_DOWNLOAD_BYTES", 200 * 1024 * 1024)),
+            "max_connections": int(os.getenv("MEDIA_MAX_CONNECTIONS", 32)),
+            "max_per_host": int(os.getenv("MEDIA_MAX_PER_HOST", 4)),
+            "chunk_size": int(os.getenv("MEDIA_CHUNK_SIZE", 256 * 1024)),
+            "write_buffer_size": int(os.getenv("MEDIA_WRITE_BUFFER_SIZE", 1024 * 1024))
+        }
+
+        # Metrics Configuration
+        self._config["metrics"] = {
+            "slow_chain_ms": float(os.getenv("SLOW_CHAIN_MS", 3000)),
+            "slow_log_size": int(os.getenv("SLOW_LOG_SIZE", 50))
+        }
+
+        # 插件超时和熔断配置，可在插件配置中用 timeout / breaker_failures / breaker_recovery 覆盖
+        self._config["plugins"] = {
+            "timeout": float(os.getenv("PLUGIN_TIMEOUT", 30)),
+            "breaker_failures": int(os.getenv("PLUGIN_BREAKER_FAILURES", 5)),
+            "breaker_recovery": float(os.getenv("PLUGIN_BREAKER_RECOVERY", 60)),
+            # 同步的 Gewe/Redis/MySQL 调用通过 asyncio.to_thread 执行，该值为默认线程池大小
+            "blocking_io_threads": int(os.getenv("BLOCKING_IO_THREADS", 32))
+        }
+
+        # 观察者插件的后台并发和积压上限
+        self._config["observers"] = {
+            "max_concurrency": int(os.getenv("OBSERVER_MAX_CONCURRENCY", 8)),
+            "max_pending": int(os.getenv("OBSERVER_MAX_PENDING", 1000))
+        }
+
     def _setup_logging(self):
         """Setup logging configuration"""
         log_level_str = self._config["logging"]["level"]
@@ -8,14 +8,18 @@ from plugins.plugin_manager import plugin_manager
 from common.database_manager import db_manager
 from common.redis_manager import redis_manager
 from common.cache_manager import CacheManager
+from common.media_downloader import media_downloader
+from common.media_store import media_store
 
 async def main():
+    robot = None
     try:
         logger.info("Starting application with log level: %s", config.get("logging.level"))
 
         # Initialize database and redis connections
         db_manager.init_db()
         redis_manager.init_redis()
+        media_store.start_janitor()
         
         robot = WeRobot()
         logger.info("Initializing WeRobot...")
@@ -32,7 +36,8 @@ async def main():
         push_server = PushServer(
             robot,
             host=push_server_config["host"],
-            port=push_server_config["port"]
+            port=push_server_config["port"],
+            admin_token=push_server_config.get("admin_token")
         )
         push_thread = threading.Thread(target=push_server.start, daemon=True)
         push_thread.start()
@@ -43,6 +48,10 @@ async def main():
         
     except Exception as e:
         logger.error(f"Error in main: {str(e)}", exc_info=True)
+    finally:
+        if robot:
+            await robot.close()
+        media_downloader.close()
 
 if __name__ == "__main__":
     asyncio.run(main())
\ No newline at end of file
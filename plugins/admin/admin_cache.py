@@ -0,0 +1,105 @@
+import json
+import threading
+import time
+from typing import Dict, FrozenSet, Iterable, Optional
+from common.log import logger
+from common.database_manager import db_manager
+from common.models import AdminUser
+from common.redis_manager import redis_manager
+from common.redis_pubsub import redis_pubsub
+
+ADMIN_USERS_KEY = "gewe-auth:admin_users"
+ADMIN_CHANNEL = "admin_users"
+
+
+class AdminCache:
+    """管理员列表缓存
+
+    所有进程共享 Redis 中的一份管理员ID列表（带 TTL），过期后由第一个发现的进程从 MySQL 重建。
+    每个进程在内存中保存一份只读集合，后台线程每 refresh_interval 秒从 Redis 刷新，
+    判断管理员时只做集合查找。管理员变化后调用 reload，重建 Redis 中的列表并通过 pub/sub
+    通知所有进程立即刷新。
+    """
+
+    def __init__(self, config_admins: Iterable[str] = (), ttl: int = 300,
+                 refresh_interval: int = 60, max_size: int = 10000):
+        self.config_admins = frozenset(config_admins)
+        self.ttl = ttl
+        self.refresh_interval = refresh_interval
+        self.max_size = max_size
+        self._admins: FrozenSet[str] = self.config_admins
+        self._loaded_at = 0.0
+        self._wakeup = threading.Event()
+        self._worker: Optional[threading.Thread] = None
+        self._stats = {
+            "redis_loads": 0,
+            "mysql_loads": 0,
+            "load_errors": 0,
+        }
+
+    def is_admin(self, user_id: str) -> bool:
+        return user_id in self._admins
+
+    def _key(self) -> str:
+        return redis_manager.get_prefixed_key(ADMIN_USERS_KEY)
+
+    def _load_from_db(self) -> list:
+        session = db_manager.get_session()
+        try:
+            rows = session.query(AdminUser.wx_user_id).limit(self.max_size + 1).all()
+        finally:
+            db_manager.close_session(session)
+        admins = [row[0] for row in rows]
+        if len(admins) > self.max_size:
+            logger.warning(f"[Admin Plugin] More than {self.max_size} admin users, extra entries ignored")
+            admins = admins[:self.max_size]
+        self._stats["mysql_loads"] += 1
+        return admins
+
+    def load(self, force: bool = False) -> None:
+        """刷新内存中的管理员集合，Redis 中的列表过期或 force 时从 MySQL 重建"""
+        try:
+            redis_client = redis_manager.get_client()
+            raw = None if force else redis_client.get(self._key())
+            if raw is None:
+                admins = self._load_from_db()
+                redis_client.setex(self._key(), self.ttl, json.dumps(admins))
+            else:
+                admins = json.loads(raw)
+                self._stats["redis_loads"] += 1
+            self._admins = self.config_admins | frozenset(admins)
+            self._loaded_at = time.time()
+        except Exception as e:
+            self._stats["load_errors"] += 1
+            logger.error(f"[Admin Plugin] Error loading admin users: {e}")
+
+    def reload(self) -> None:
+        """管理员变化后调用：从 MySQL 重建共享列表并通知其他进程"""
+        self.load(force=True)
+        redis_pubsub.publish(ADMIN_CHANNEL, {"reload": True})
+
+    def request_refresh(self, *args, **kwargs) -> None:
+        """通知后台线程立即从 Redis 刷新"""
+        self._wakeup.set()
+
+    def _refresh_loop(self) -> None:
+        while True:
+            self._wakeup.wait(self.refresh_interval)
+            self._wakeup.clear()
+            self.load()
+
+    def start(self) -> None:
+        """加载管理员列表并启动后台刷新"""
+        if self._worker and self._worker.is_alive():
+            return
+        self.load()
+        redis_pubsub.subscribe(ADMIN_CHANNEL, self.request_refresh, on_reconnect=self.request_refresh)
+        self._worker = threading.Thread(target=self._refresh_loop, name="AdminCacheRefresher", daemon=True)
+        self._worker.start()
+
+    def get_stats(self) -> Dict:
+        return {
+            "admins": len(self._admins),
+            "age_seconds": round(time.time() - self._loaded_at, 1) if self._loaded_at else None,
+            **self._stats,
+        }
@@ -1,18 +1,18 @@
 import os
 import re
-import uuid
+import asyncio
 import dotenv
-from datetime import datetime
 from typing import Optional, List, Dict, Tuple
 from bot.context import Context, ProcessState
-from plugins.base import Plugin
+from plugins.base import Plugin, Trigger, SCOPE_PRIVATE
 from common.log import logger
-from common.database_manager import db_manager
-from common.models import AdminUser, CustomBindKey
+from common.bindings import generate_bind_keys
+from common.metrics import metrics
 from sqlalchemy import or_
 from common.event_bus import EventBus
 from common.redis_manager import redis_manager
 from common.cache_manager import CacheManager
+from plugins.admin.admin_cache import AdminCache
 
 class AdminPlugin(Plugin):
     """管理员功能插件"""
@@ -20,7 +20,6 @@ class AdminPlugin(Plugin):
     def __init__(self, config: Dict = None, plugin_manager=None):
         super().__init__(config)
         self.plugin_manager = plugin_manager
-        self.admin_users_cache = {}  # 缓存已验证的管理员
         self.env_path = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), '.env')
         
         # 确保配置存在
@@ -33,7 +32,7 @@ class AdminPlugin(Plugin):
                 "add_bind": {
                     "command": "/add_bind",
                     "description": "创建新的绑定密钥",
-                    "help_message": "格式: /add_bind <客户ID> <客户名称>"
+                    "help_message": "格式: /add_bind [-n 数量] <客户ID> [客户名称]"
                 },
                 "model": {
                     "command": "/model",
@@ -44,14 +43,52 @@ class AdminPlugin(Plugin):
                     "command": "/clear_cache",
                     "description": "清除Redis缓存",
                     "help_message": "格式: /clear_cache"
+                },
+                "faq_reindex": {
+                    "command": "/faq_reindex",
+                    "description": "重建FAQ向量索引",
+                    "help_message": "格式: /faq_reindex"
+                },
+                "reload_keywords": {
+                    "command": "/reload_keywords",
+                    "description": "重新加载数据库中的关键词规则集",
+                    "help_message": "格式: /reload_keywords"
+                },
+                "reload_admins": {
+                    "command": "/reload_admins",
+                    "description": "重新加载管理员列表",
+                    "help_message": "格式: /reload_admins"
                 }
             }
+
+        # 配置中的管理员加上数据库中的管理员，所有进程共享
+        cache_config = self.config.get("admin_cache", {})
+        self.admin_cache = AdminCache(
+            self.config.get("admin_users", []),
+            cache_config.get("ttl", 300),
+            cache_config.get("refresh_interval", 60),
+            cache_config.get("max_size", 10000)
+        )
+        metrics.register("admin_cache", self.admin_cache.get_stats)
         
         logger.info("[Admin Plugin] Initialized")
 
+    def set_robot(self, robot):
+        super().set_robot(robot)
+        # 此时数据库和Redis已经初始化，加载管理员列表
+        self.admin_cache.start()
+
+    def get_triggers(self) -> Optional[List[Trigger]]:
+        """只处理私聊中的管理员命令"""
+        commands = tuple(
+            cmd_config.get("command", f"/{cmd_key}")
+            for cmd_key, cmd_config in self.config.get("admin_commands", {}).items()
+        )
+        return [Trigger(prefixes=commands, scope=SCOPE_PRIVATE)]
+
     async def clear_auth_cache(self) -> None:
         """清除Redis中的认证缓存"""
-        CacheManager.clear_all_cache()
+        await asyncio.to_thread(CacheManager.clear_all_cache)
         logger.info("[Admin Plugin] Cleared auth cache")
 
     async def process(self, context: Context) -> Optional[Context]:
@@ -97,6 +134,12 @@ class AdminPlugin(Plugin):
                 return await self._handle_model(context, args)
             elif cmd_key == "clear_cache":
                 return await self._handle_clear_cache(context, args)
+            elif cmd_key == "faq_reindex":
+                return await self._handle_faq_reindex(context, args)
+            elif cmd_key == "reload_keywords":
+                return await self._handle_reload_keywords(context, args)
+            elif cmd_key == "reload_admins":
+                return await self._handle_reload_admins(context, args)
             else:
                 # 未知命令
                 context.rtn_content = f"未知的管理员命令: {cmd}"
@@ -111,7 +154,7 @@ class AdminPlugin(Plugin):
     async def _handle_clear_cache(self, context: Context, args: str) -> Context:
         """处理清除缓存命令"""
         try:
-            CacheManager.clear_all_cache()
+            await asyncio.to_thread(CacheManager.clear_all_cache)
             context.rtn_content = "所有缓存已清除"
             context.process_state = ProcessState.FINISHED_WITH_DEFAULT
             return context
@@ -121,63 +164,89 @@ class AdminPlugin(Plugin):
             context.process_state = ProcessState.FINISHED_WITH_DEFAULT
             return context
 
+    def _get_faq_plugin(self):
+        """从插件管理器中找到已加载的FAQ插件"""
+        if not self.plugin_manager:
+            return None
+        from plugins.faq.faq_plugin import FAQPlugin
+        for plugin in self.plugin_manager.get_plugins():
+            if isinstance(plugin, FAQPlugin):
+                return plugin
+        return None
+
+    async def _handle_faq_reindex(self, context: Context, args: str) -> Context:
+        """处理重建FAQ索引命令，直接调用FAQ插件重建并回复结果"""
+        faq_plugin = self._get_faq_plugin()
+        if faq_plugin is None:
+            context.rtn_content = "FAQ插件未启用"
+        else:
+            try:
+                count = await asyncio.to_thread(faq_plugin.reindex)
+                context.rtn_content = f"FAQ索引已重建，共 {count} 个问题"
+            except Exception as e:
+                logger.error(f"[Admin Plugin] Error rebuilding FAQ index: {str(e)}")
+                context.rtn_content = f"重建FAQ索引时出错: {str(e)}"
+        context.process_state = ProcessState.FINISHED_WITH_DEFAULT
+        return context
+
+    async def _handle_reload_keywords(self, context: Context, args: str) -> Context:
+        """处理重新加载关键词规则集命令"""
+        EventBus.publish("keyword_rules_updated")
+        context.rtn_content = "关键词规则集正在重新加载"
+        context.process_state = ProcessState.FINISHED_WITH_DEFAULT
+        return context
+
+    async def _handle_reload_admins(self, context: Context, args: str) -> Context:
+        """处理重新加载管理员列表命令，所有进程都会刷新"""
+        await asyncio.to_thread(self.admin_cache.reload)
+        context.rtn_content = "管理员列表已重新加载"
+        context.process_state = ProcessState.FINISHED_WITH_DEFAULT
+        return context
+
     async def _is_admin(self, user_id: str) -> bool:
-        """检查用户是否是管理员"""
-        # 检查缓存
-        if user_id in self.admin_users_cache:
-            return self.admin_users_cache[user_id]
-        
-        # 检查配置中的管理员列表
-        config_admins = self.config.get("admin_users", [])
-        if user_id in config_admins:
-            self.admin_users_cache[user_id] = True
-            return True
-        
-        # 检查数据库中的管理员
-        session = db_manager.get_session()
-        try:
-            admin = session.query(AdminUser).filter_by(wx_user_id=user_id).first()
-            is_admin = admin is not None
-            self.admin_users_cache[user_id] = is_admin
-            return is_admin
-        except Exception as e:
-            logger.error(f"[Admin Plugin] Error checking admin status: {str(e)}")
-            return False
-        finally:
-            db_manager.close_session(session)
+        """检查用户是否是管理员（内存查找，不访问数据库）"""
+        return self.admin_cache.is_admin(user_id)
     
     async def _handle_add_bind(self, context: Context, args: str) -> Context:
         """处理添加绑定密钥命令
-        格式: /add_bind
+        格式: /add_bind [-n 数量] <客户ID> [客户名称]
+
+        数量必须用 -n 指定，纯数字的客户ID不会被当成数量。
         """
-        # 生成绑定密钥
-        bind_key = str(uuid.uuid4())
-        
-        # 保存到数据库
-        session = db_manager.get_session()
-        try:
-            # 创建新的绑定密钥记录
-            new_key = CustomBindKey(
-                bind_key=bind_key,
-                created_time=datetime.now(),
-                status=0  # 未绑定状态
-            )
-            session.add(new_key)
-            session.commit()
-            
-            # 返回绑定密钥
-            context.rtn_content = f"新的绑定密钥: {bind_key}"
+        parts = args.split()
+        count = 1
+        if parts and parts[0] in ("-n", "--count"):
+            if len(parts) < 2 or not parts[1].isdigit():
+                context.rtn_content = self.config.get("admin_commands", {}).get("add_bind", {}).get(
+                    "help_message", "格式: /add_bind [-n 数量] <客户ID> [客户名称]")
+                context.process_state = ProcessState.FINISHED_WITH_DEFAULT
+                return context
+            count = int(parts[1])
+            parts = parts[2:]
+        max_keys = self.config.get("max_bind_keys", 200)
+        if count < 1 or count > max_keys:
+            context.rtn_content = f"数量应在 1 到 {max_keys} 之间"
             context.process_state = ProcessState.FINISHED_WITH_DEFAULT
             return context
-            
+        customer_id = parts[0] if parts else None
+        customer = " ".join(parts[1:]) or None
+
+        try:
+            # 一次插入全部密钥
+            keys = await asyncio.to_thread(generate_bind_keys, count, customer_id, customer)
         except Exception as e:
-            session.rollback()
-            logger.error(f"[Admin Plugin] Error creating bind key: {str(e)}")
+            logger.error(f"[Admin Plugin] Error creating bind keys: {str(e)}")
             context.rtn_content = f"创建绑定密钥时出错: {str(e)}"
             context.process_state = ProcessState.FINISHED_WITH_DEFAULT
             return context
-        finally:
-            db_manager.close_session(session)
+
+        # 返回绑定密钥
+        if count == 1:
+            context.rtn_content = f"新的绑定密钥: {keys[0]}"
+        else:
+            context.rtn_content = f"已生成 {count} 个绑定密钥" + (f"（客户ID: {customer_id}）" if customer_id else "") + ":\n" + "\n".join(keys)
+        context.process_state = ProcessState.FINISHED_WITH_DEFAULT
+        return context
     
     async def _handle_model(self, context: Context, args: str) -> Context:
         """处理修改默认模型命令"""
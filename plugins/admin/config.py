@@ -9,16 +9,37 @@ DEFAULT_CONFIG = {
         "add_bind": {
             "command": "/add_bind",
             "description": "创建新的绑定密钥",
-            "help_message": "格式: /add_bind <客户ID> <客户名称>"
+            "help_message": "格式: /add_bind [-n 数量] <客户ID> [客户名称]"
         },
         "model": {
             "command": "/model",
             "description": "修改默认的OpenAI模型",
             "help_message": "格式: /model <模型名称>"
+        },
+        "faq_reindex": {
+            "command": "/faq_reindex",
+            "description": "重建FAQ向量索引",
+            "help_message": "格式: /faq_reindex"
+        },
+        "reload_keywords": {
+            "command": "/reload_keywords",
+            "description": "重新加载数据库中的关键词规则集",
+            "help_message": "格式: /reload_keywords"
+        },
+        "reload_admins": {
+            "command": "/reload_admins",
+            "description": "重新加载管理员列表",
+            "help_message": "格式: /reload_admins"
         }
     },
+    "max_bind_keys": 200,  # /add_bind 一次最多生成的密钥数
+    "admin_cache": {
+        "ttl": 300,  # Redis 中共享管理员列表的过期时间（秒），过期后从MySQL重建
+        "refresh_interval": 60,  # 每个进程从Redis刷新内存集合的间隔（秒）
+        "max_size": 10000  # 管理员数量上限
+    },
     "admin_users": [
         # 在这里添加默认管理员的微信ID
     ],
-    "help_message": "管理员命令:\n/add_bind <客户ID> <客户名称> - 创建新的绑定密钥\n/model <模型名称> - 修改默认的OpenAI模型"
+    "help_message": "管理员命令:\n/add_bind [-n 数量] <客户ID> [客户名称] - 批量创建绑定密钥\n/model <模型名称> - 修改默认的OpenAI模型\n/faq_reindex - 重建FAQ向量索引\n/reload_keywords - 重新加载关键词规则集\n/reload_admins - 重新加载管理员列表"
 }
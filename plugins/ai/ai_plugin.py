@@ -1,32 +1,135 @@
 import os
 import re
-import base64
-from typing import Optional, List, Dict, Any
+import time
+import functools
+from typing import Optional, List, Dict, Any, Awaitable, Callable, Tuple
 import aiohttp
 import json
+import asyncio
+from contextlib import asynccontextmanager
 from bot.context import Context, ContextType, ProcessState
-from plugins.base import Plugin
+from plugins.base import Plugin, Trigger
 from common.log import logger
 from dotenv import load_dotenv
 from common.event_bus import EventBus
+from common.media_store import media_store
+from common.metrics import metrics
+from plugins.ai.image_preprocessor import ImagePreprocessor
+from plugins.ai.stream_segmenter import StreamSegmenter
+from plugins.ai.response_cache import AIResult, ResponseCache
+from plugins.ai.single_flight import SingleFlight
+from plugins.ai.scheduler import AIScheduler, PRIORITY_HIGH, PRIORITY_NORMAL
+from plugins.ai.latency_tracker import LatencyTracker
+from plugins.ai.conversation_memory import ConversationMemory
+from plugins.ai.usage_tracker import UsageTracker
 
 # Load environment variables
 load_dotenv()
 
 class AIPlugin(Plugin):
     """AI 插件 - 使用 OpenAI API 处理消息"""
+
+    ACTIVATION_PREFIXES = ("ai!", "小福")
     
     def __init__(self, config: Dict = None):
         super().__init__(config)
         self.api_key = os.getenv("OPENAI_API_KEY", "")
         self.api_base = os.getenv("OPENAI_API_BASE", "https://api.openai.com/v1")
         self._default_model = os.getenv("OPENAI_DEFAULT_MODEL", "gpt-4o")
+        self.image_preprocessor = ImagePreprocessor(self.config.get("image_preprocess", {}))
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._session_loop: Optional[asyncio.AbstractEventLoop] = None
+        self._stream_stats = {
+            "first_message_seconds_total": 0.0,
+            "first_message_seconds_count": 0,
+            "first_message_seconds_last": 0.0,
+            "full_answer_seconds_total": 0.0,
+            "full_answer_seconds_count": 0,
+            "full_answer_seconds_last": 0.0,
+        }
+        metrics.register("ai_stream", self.get_stream_stats)
+        self.response_cache = ResponseCache(self.config.get("cache", {}), self.config.get("models", {}))
+        metrics.register("ai_response_cache", self.response_cache.get_stats)
+        self.single_flight = SingleFlight()
+        metrics.register("ai_single_flight", self.single_flight.get_stats)
+        self.scheduler = AIScheduler(self.config.get("scheduler", {}), self.config.get("models", {}))
+        metrics.register("ai_scheduler", self.scheduler.get_stats)
+        hedge_config = self.config.get("hedge", {})
+        self.latency_tracker = LatencyTracker(hedge_config.get("window", 200), hedge_config.get("min_samples", 20))
+        metrics.register("ai_latency", self.latency_tracker.get_stats)
+        self._hedge_stats = {
+            "hedged": 0,  # 超过p95后向备用模型发起的请求数
+            "fallback_wins": 0,  # 备用模型先返回的次数
+            "primary_wins": 0,  # 发起备用请求后主模型仍先返回的次数
+            "cancelled_samples": 0,  # 被取消的请求按已耗时记入延迟统计的次数（实际耗时的下限）
+        }
+        metrics.register("ai_hedge", lambda: dict(self._hedge_stats))
+        self.memory = ConversationMemory(self.config.get("memory", {}), self.config.get("models", {}))
+        metrics.register("ai_memory", self.memory.get_stats)
+        self.usage_tracker = UsageTracker(self.config.get("usage", {}))
+        metrics.register("ai_usage", self.usage_tracker.get_stats)
         
         # 订阅模型更新事件
         EventBus.subscribe("model_updated", self._on_model_updated)
+        EventBus.subscribe("binding_created", self._on_binding_created)
+        EventBus.subscribe("bindings_imported", self._on_bindings_imported)
         
         logger.info(f"[AI Plugin] Initialized with default model: {self._default_model}")
     
+    def get_triggers(self) -> Optional[List[Trigger]]:
+        """只处理以激活词开头的文本和图片消息"""
+        return [Trigger(prefixes=self.ACTIVATION_PREFIXES, types=(ContextType.TEXT, ContextType.IMAGE))]
+
+    def _create_session(self) -> aiohttp.ClientSession:
+        """按配置创建带连接池的会话"""
+        http_config = self.config.get("http", {})
+        connector = aiohttp.TCPConnector(
+            limit=http_config.get("max_connections", 20),
+            limit_per_host=http_config.get("max_connections_per_host", 0),
+            keepalive_timeout=http_config.get("keepalive_timeout", 60),
+            ttl_dns_cache=http_config.get("dns_cache_ttl", 300)
+        )
+        timeout = aiohttp.ClientTimeout(
+            total=http_config.get("total_timeout", 300),
+            connect=http_config.get("connect_timeout", 10),
+            sock_read=http_config.get("read_timeout", 120)
+        )
+        return aiohttp.ClientSession(connector=connector, timeout=timeout)
+
+    @asynccontextmanager
+    async def _session_scope(self):
+        """获取HTTP会话
+
+        在机器人主事件循环中复用同一个长连接会话；在其他临时事件循环中
+        （例如主循环尚未启动时）使用一次性会话，避免会话跨循环使用。
+        """
+        loop = asyncio.get_running_loop()
+        main_loop = self.robot.loop if self.robot else None
+        if loop is not main_loop:
+            async with self._create_session() as session:
+                yield session
+            return
+
+        if self._session is None or self._session.closed or self._session_loop is not loop:
+            self._session = self._create_session()
+            self._session_loop = loop
+            logger.info("[AI Plugin] Created shared HTTP session")
+        yield self._session
+
+    def set_robot(self, robot):
+        super().set_robot(robot)
+        # 此时数据库和Redis已经初始化，开始定期写入用量
+        self.usage_tracker.start()
+
+    async def close(self):
+        """关闭共享会话和图片处理进程池，写入剩余的用量统计"""
+        if self._session and not self._session.closed:
+            await self._session.close()
+            logger.info("[AI Plugin] Closed shared HTTP session")
+        self._session = None
+        self.image_preprocessor.shutdown()
+        self.usage_tracker.close()
+
     @property
     def default_model(self) -> str:
         return self._default_model
@@ -35,6 +138,17 @@ class AIPlugin(Plugin):
         """处理模型更新事件"""
         logger.info(f"[AI Plugin] Updating default model from {self._default_model} to {new_model}")
         self._default_model = new_model
+
+    def _on_binding_created(self, is_group: bool, chat_id: str, **kwargs):
+        """新绑定的会话重新解析所属客户"""
+        self.usage_tracker.invalidate_customer(is_group, chat_id)
+
+    def _on_bindings_imported(self, group_ids: List[str], user_ids: List[str], **kwargs):
+        """批量导入的绑定可能改变了所属客户"""
+        for group_id in group_ids:
+            self.usage_tracker.invalidate_customer(True, group_id)
+        for user_id in user_ids:
+            self.usage_tracker.invalidate_customer(False, user_id)
     
     async def process(self, context: Context) -> Optional[Context]:
         """处理上下文"""
@@ -51,11 +165,10 @@ class AIPlugin(Plugin):
             return context
         
         # 检查激活词
-        activation_prefixes = ["ai!", "小福"]
         is_activated = False
         prefix_used = None
         
-        for prefix in activation_prefixes:
+        for prefix in self.ACTIVATION_PREFIXES:
             if context.content.startswith(prefix):
                 is_activated = True
                 prefix_used = prefix
@@ -79,6 +192,17 @@ class AIPlugin(Plugin):
             context.process_state = ProcessState.FINISHED_WITH_DEFAULT
             return context
         
+        # 清除对话记忆
+        chat_id = self.memory.chat_id(context)
+        if query in ("/reset", "清除记忆"):
+            await asyncio.to_thread(self.memory.clear, chat_id)
+            context.rtn_content = "已清除对话记忆"
+            context.process_state = ProcessState.FINISHED_WITH_DEFAULT
+            return context
+
+        # 检查是否要求跳过缓存
+        query, bypass_cache = self.response_cache.extract_bypass_flag(query)
+
         # 检查是否有模型切换命令
         model = self.default_model
         model_match = re.match(r'^model:(\S+)\s+(.+)$', query)
@@ -89,29 +213,86 @@ class AIPlugin(Plugin):
         
         # 处理消息
         try:
-            # 准备文件列表
+            # 准备文件列表，媒体句柄在这里才真正下载
             files = []
+            if hasattr(context, 'msg') and context.msg and hasattr(context.msg, 'extra_data'):
+                for handle in context.msg.extra_data.get('files', []):
+                    if handle.type != "image":
+                        continue
+                    image_path = await handle.path()
+                    if image_path:
+                        files.append({"type": "image", "path": image_path})
+                        logger.info(f"[AI Plugin] Added image from message: {image_path}")
             
-            # 如果是图片消息，添加图片到文件列表
-            if is_image and hasattr(context, 'msg') and context.msg:
-                image_path = context.msg.content if hasattr(context.msg, 'content') else None
-                if image_path and os.path.exists(image_path):
-                    files.append({"type": "image", "path": image_path})
-                    logger.info(f"[AI Plugin] Added image from context: {image_path}")
-            
-            # 检查是否有额外的图片或文件
-            if hasattr(context, 'msg') and context.msg and hasattr(context.msg, 'extra_data') and 'files' in context.msg.extra_data:
-                extra_files = context.msg.extra_data['files']
-                if extra_files:
-                    files.extend(extra_files)
-                    logger.info(f"[AI Plugin] Added {len(extra_files)} files from extra_data")
-            
-            # 调用 OpenAI API
-            response = await self._call_openai_api(query, model, files)
-            
-            # 设置回复内容
-            context.rtn_content = response
-            context.process_state = ProcessState.FINISHED_WITH_DEFAULT
+            # 本次请求的用量（包括对冲落败的请求和对话摘要）都计入这个客户
+            customer_id = self.usage_tracker.cached_customer(context.is_group, context.receiver)
+            if customer_id is None:
+                customer_id = await asyncio.to_thread(
+                    self.usage_tracker.resolve_customer, context.is_group, context.receiver)
+
+            # 只有开启了记忆的会话才读写历史
+            use_memory = self.memory.is_enabled_for(context, customer_id)
+            history = await asyncio.to_thread(self.memory.load, chat_id, model) if use_memory else []
+            memory_question = f"{query} [图片]" if files else query
+
+            # 带历史的请求key中包含历史的哈希，回答不会串到上下文不同的会话
+            request_key = await asyncio.to_thread(self.response_cache.make_key, model, query, files, history)
+            use_cache = False
+            if bypass_cache:
+                self.response_cache.record_bypass()
+            elif self.response_cache.is_cacheable(model):
+                use_cache = True
+                cached = await asyncio.to_thread(self.response_cache.get, request_key, model)
+                if cached:
+                    if use_memory:
+                        await self._remember(chat_id, cached.model, memory_question, cached.content, customer_id)
+                    context.rtn_content = cached.content
+                    context.process_state = ProcessState.FINISHED_WITH_DEFAULT
+                    return context
+
+            # 检查客户当天的token配额，只读内存计数
+            if not self.usage_tracker.check_quota(customer_id):
+                logger.info(f"[AI Plugin] Daily token quota exceeded for customer {customer_id}")
+                context.rtn_content = self.config.get("usage", {}).get(
+                    "quota_exceeded_message", "今日AI使用额度已用完，请明天再试")
+                context.process_state = ProcessState.FINISHED_WITH_DEFAULT
+                return context
+
+            stream = self._stream_enabled()
+            # 私聊和@机器人的消息优先于普通群消息
+            priority = PRIORITY_HIGH if not context.is_group or (context.msg and context.msg.is_at) else PRIORITY_NORMAL
+
+            def record_extra_usage(extra_model: str, usage: Dict) -> None:
+                self.usage_tracker.record(customer_id, extra_model, usage)
+
+            async def call_upstream() -> AIResult:
+                if stream:
+                    # 流式模式：分段直接发送，不再执行默认回复
+                    return await self._process_streaming(context, query, model, files, priority, history)
+                # 调用 OpenAI API，主模型过慢时向备用模型发起对冲请求
+                return await self._call_with_hedge(query, model, files, priority, history, record_extra_usage)
+
+            # 相同的请求正在进行时，等待并共享它的结果
+            result, shared = await self.single_flight.do(request_key, call_upstream)
+            if shared:
+                logger.info(f"[AI Plugin] Reused in-flight response for model {model}")
+
+            if shared or not stream:
+                # 设置回复内容
+                context.rtn_content = result.content
+                context.process_state = ProcessState.FINISHED_WITH_DEFAULT
+
+            if not shared:
+                # 只统计实际发起的调用，复用的结果不产生费用
+                self.usage_tracker.record(customer_id, result.model, result.usage)
+            if use_cache and not shared:
+                # 对冲时备用模型的回答存在备用模型的key下，不冒充主模型的回答
+                cache_key = request_key
+                if result.model != model:
+                    cache_key = self.response_cache.key_for_model(request_key, result.model)
+                await asyncio.to_thread(self.response_cache.set, cache_key, result)
+            if use_memory:
+                await self._remember(chat_id, result.model, memory_question, result.content, customer_id)
             
             logger.info(f"[AI Plugin] Successfully processed query with model {model}")
             
@@ -122,18 +303,164 @@ class AIPlugin(Plugin):
         
         return context
     
-    async def _call_openai_api(self, query: str, model: str, files: List[Dict] = None) -> str:
-        """调用 OpenAI API"""
+    async def _remember(self, chat_id: str, model: str, question: str, answer: str, customer_id: str) -> None:
+        """保存一轮问答，历史过长时在后台压缩成摘要，摘要的用量计入 customer_id"""
+        message_count = await asyncio.to_thread(self.memory.append, chat_id, model, question, answer)
+        self.memory.maybe_compact(chat_id, model, message_count, functools.partial(self._summarize, customer_id=customer_id))
+
+    async def _summarize(self, text: str, customer_id: str) -> str:
+        """把较早的对话压缩成摘要"""
+        memory_config = self.config.get("memory", {})
+        prompt = (
+            f"请把下面的对话压缩成不超过{self.memory.summary_max_tokens}字的摘要，"
+            f"保留用户的身份、偏好、已确认的事实和尚未解决的问题，只输出摘要：\n\n{text}"
+        )
+        result = await self._call_openai_api(
+            prompt, memory_config.get("summary_model") or self.default_model,
+            max_tokens=self.memory.summary_max_tokens * 2
+        )
+        self.usage_tracker.record(customer_id, result.model, result.usage)
+        return result.content.strip()
+
+    def _stream_enabled(self) -> bool:
+        return bool(self.config.get("stream", {}).get("enabled", False)) and self.robot is not None
+
+    async def _process_streaming(self, context: Context, query: str, model: str, files: List[Dict],
+                                 priority: int = PRIORITY_NORMAL, history: Optional[List[Dict]] = None) -> AIResult:
+        """流式调用模型，按句子或段落切分后逐段发送"""
+        stream_config = self.config.get("stream", {})
+        start_time = time.monotonic()
+        sent_segments = 0
+
+        async def send_segment(segment: str):
+            nonlocal sent_segments
+            if sent_segments == 0:
+                self._record_stream_metric("first_message_seconds", time.monotonic() - start_time)
+            await self.robot.send_message(Context(
+                type=ContextType.TEXT,
+                content=context.content,
+                rtn_content=segment,
+                msg=context.msg,
+                is_group=context.is_group,
+                receiver=context.receiver,
+                sender=context.sender,
+                data={"skip_at": sent_segments > 0}  # 只在第一段@提问的人
+            ))
+            sent_segments += 1
+
+        result = await self._call_openai_api(
+            query, model, files,
+            on_segment=send_segment,
+            segmenter=StreamSegmenter(
+                stream_config.get("min_chars", 40),
+                stream_config.get("max_chars", 600)
+            ),
+            priority=priority,
+            history=history
+        )
+        self._record_stream_metric("full_answer_seconds", time.monotonic() - start_time)
+
+        if sent_segments:
+            context.rtn_content = None
+            context.process_state = ProcessState.FINISHED
+        else:
+            context.rtn_content = result.content
+            context.process_state = ProcessState.FINISHED_WITH_DEFAULT
+        return result
+
+    def _record_stream_metric(self, name: str, seconds: float) -> None:
+        self._stream_stats[f"{name}_total"] += seconds
+        self._stream_stats[f"{name}_count"] += 1
+        self._stream_stats[f"{name}_last"] = round(seconds, 3)
+
+    def get_stream_stats(self) -> Dict:
+        """获取流式回复统计：首条消息耗时和完整回答耗时"""
+        stats = {}
+        for name in ("first_message_seconds", "full_answer_seconds"):
+            count = self._stream_stats[f"{name}_count"]
+            stats[f"avg_{name}"] = round(self._stream_stats[f"{name}_total"] / count, 3) if count else 0.0
+            stats[f"last_{name}"] = self._stream_stats[f"{name}_last"]
+            stats[f"{name}_count"] = count
+        return stats
+
+    def _get_hedge_delay(self, model: str) -> Optional[float]:
+        """主模型在多少秒内没有返回就向备用模型发起请求，不对冲时返回None"""
+        hedge_config = self.config.get("hedge", {})
+        fallback = self.config.get("models", {}).get(model, {}).get("fallback")
+        if not hedge_config.get("enabled", True) or not fallback or fallback == model:
+            return None
+        p95 = self.latency_tracker.percentile(model, hedge_config.get("percentile", 95))
+        if p95 is None:
+            return None
+        return max(p95, hedge_config.get("min_delay", 2))
+
+    async def _call_with_hedge(self, query: str, model: str, files: List[Dict],
+                               priority: int = PRIORITY_NORMAL, history: Optional[List[Dict]] = None,
+                               on_extra_usage: Optional[Callable[[str, Dict], None]] = None) -> AIResult:
+        """调用模型，耗时超过该模型的p95后同时请求备用模型，先返回的结果胜出，另一个请求被取消
+
+        落败请求的用量（已完成的取实际用量，被取消的取估算的prompt token）通过 on_extra_usage 上报。
+        """
+        primary = asyncio.ensure_future(self._call_openai_api(
+            query, model, files, priority=priority, history=history, on_cancel=on_extra_usage))
+        hedge_delay = self._get_hedge_delay(model)
+        if hedge_delay is None:
+            return await primary
+
+        pending = {primary}
+        try:
+            done, pending = await asyncio.wait(pending, timeout=hedge_delay)
+            if done:
+                return primary.result()
+
+            fallback = self.config["models"][model]["fallback"]
+            logger.info(f"[AI Plugin] {model} slower than {hedge_delay:.2f}s, hedging with {fallback}")
+            self._hedge_stats["hedged"] += 1
+            backup = asyncio.ensure_future(self._call_openai_api(
+                query, fallback, files, priority=priority, history=history, on_cancel=on_extra_usage))
+            pending.add(backup)
+
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        self._hedge_stats["fallback_wins" if task is backup else "primary_wins"] += 1
+                        loser = primary if task is backup else backup
+                        # 两个请求同时完成时，落败一方的实际用量也要计入
+                        if on_extra_usage and loser.done() and not loser.cancelled() and loser.exception() is None:
+                            on_extra_usage(loser.result().model, loser.result().usage)
+                        return task.result()
+                    logger.error(f"[AI Plugin] Hedged request failed: {task.exception()}")
+            # 两个请求都失败，抛出主模型的错误
+            return primary.result()
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def _call_openai_api(self, query: str, model: str, files: List[Dict] = None,
+                               on_segment: Optional[Callable[[str], Awaitable[None]]] = None,
+                               segmenter: Optional[StreamSegmenter] = None,
+                               priority: int = PRIORITY_NORMAL,
+                               history: Optional[List[Dict]] = None,
+                               max_tokens: Optional[int] = None,
+                               on_cancel: Optional[Callable[[str, Dict], None]] = None) -> AIResult:
+        """调用 OpenAI API
+
+        传入 on_segment 时使用流式接口，每凑够一段就回调一次，最终返回完整回答和token用量。
+        history 为放在本次问题之前的对话历史。请求发出后被取消时，用估算的prompt token
+        调用 on_cancel(模型, 用量)。
+        """
         headers = {
             "Authorization": f"Bearer {self.api_key}",
             "Content-Type": "application/json"
         }
         
         # 构建消息
-        messages = [{"role": "user", "content": []}]
+        user_message = {"role": "user", "content": []}
+        messages = list(history or []) + [user_message]
         
         # 添加文本内容
-        messages[0]["content"].append({
+        user_message["content"].append({
             "type": "text",
             "text": query
         })
@@ -145,19 +472,19 @@ class AIPlugin(Plugin):
                     # 处理图片
                     image_path = file.get("path")
                     if image_path and os.path.exists(image_path):
-                        with open(image_path, "rb") as img_file:
-                            base64_image = base64.b64encode(img_file.read()).decode('utf-8')
-                            
-                            messages[0]["content"].append({
-                                "type": "image_url",
-                                "image_url": {
-                                    "url": f"data:image/jpeg;base64,{base64_image}"
-                                }
-                            })
+                        # 缩放压缩后再编码，base64文本按内容哈希缓存
+                        image_path, mime_type = await self.image_preprocessor.prepare(image_path)
+                        base64_image = await asyncio.to_thread(media_store.get_base64, image_path)
+                        user_message["content"].append({
+                            "type": "image_url",
+                            "image_url": {
+                                "url": f"data:{mime_type};base64,{base64_image}"
+                            }
+                        })
         
         # 获取模型配置
         model_config = self.config.get("models", {}).get(model, {"max_tokens": 4000})
-        max_tokens = model_config.get("max_tokens", 4000)
+        max_tokens = max_tokens or model_config.get("max_tokens", 4000)
         
         # 构建请求数据
         data = {
@@ -173,34 +500,116 @@ class AIPlugin(Plugin):
         logger.info(f"  - Query: {query}")
         logger.info(f"  - Max Tokens: {max_tokens}")
         logger.info(f"  - Files: {len(files) if files else 0} files attached")
+        logger.info(f"  - History: {len(history) if history else 0} messages")
         logger.info(f"  - Temperature: {data['temperature']}")
 
-        # 发送请求
-        async with aiohttp.ClientSession() as session:
+        if on_segment is not None:
+            data["stream"] = True
+            data["stream_options"] = {"include_usage": True}
+
+        # 按模型排队，受并发数和请求/token速率限制
+        estimated_tokens = self._estimate_tokens(query, files, history)
+        async with self.scheduler.slot(model, priority, estimated_tokens) as record_usage:
+            start_time = time.monotonic()
+            try:
+                result = await self._post_completion(headers, data, on_segment, segmenter)
+            except asyncio.CancelledError:
+                if on_segment is None:
+                    # 被取消时的耗时是实际耗时的下限，也要计入，否则慢请求被对冲后p95会越来越低
+                    self.latency_tracker.record(model, time.monotonic() - start_time)
+                    self._hedge_stats["cancelled_samples"] += 1
+                if on_cancel:
+                    # 上游已经收到请求，至少会按prompt计费
+                    on_cancel(model, {"prompt_tokens": estimated_tokens, "total_tokens": estimated_tokens})
+                raise
+            record_usage(result.usage.get("total_tokens") or estimated_tokens)
+        if on_segment is None:
+            # 流式回答的耗时取决于回答长度，不计入延迟统计
+            self.latency_tracker.record(model, time.monotonic() - start_time)
+        return result
+
+    @staticmethod
+    def _estimate_tokens(query: str, files: Optional[List[Dict]] = None,
+                         history: Optional[List[Dict]] = None) -> int:
+        """粗略估算一次请求的token数，用于令牌桶预扣，请求完成后按实际用量修正"""
+        image_count = sum(1 for file in (files or []) if file.get("type") == "image")
+        history_chars = sum(len(message["content"]) for message in (history or []))
+        return len(query) + history_chars + image_count * 800 + 500
+
+    async def _post_completion(self, headers: Dict, data: Dict,
+                               on_segment: Optional[Callable[[str], Awaitable[None]]] = None,
+                               segmenter: Optional[StreamSegmenter] = None) -> AIResult:
+        """发送 chat/completions 请求并解析结果"""
+        model = data["model"]
+        async with self._session_scope() as session:
             async with session.post(f"{self.api_base}/chat/completions", headers=headers, json=data) as response:
                 if response.status != 200:
                     error_text = await response.text()
                     logger.error(f"[AI Plugin] API Error: Status {response.status}")
                     logger.error(f"[AI Plugin] Error Details: {error_text}")
                     raise Exception(f"API request failed with status {response.status}: {error_text}")
+
+                if on_segment is not None:
+                    content, usage = await self._read_stream(response, on_segment, segmenter or StreamSegmenter())
+                    return AIResult(content=content, model=model, usage=usage)
                 
                 result = await response.json()
                 
                 # 记录响应信息
-                if "usage" in result:
-                    usage = result["usage"]
-                    logger.info(f"[AI Plugin] API Response Usage:")
-                    logger.info(f"  - Prompt Tokens: {usage.get('prompt_tokens', 'N/A')}")
-                    logger.info(f"  - Completion Tokens: {usage.get('completion_tokens', 'N/A')}")
-                    logger.info(f"  - Total Tokens: {usage.get('total_tokens', 'N/A')}")
+                usage = result.get("usage") or {}
+                if usage:
+                    self._log_usage(usage)
 
                 if "choices" in result and len(result["choices"]) > 0:
                     response_content = result["choices"][0]["message"]["content"]
                     logger.info(f"[AI Plugin] Response Content Length: {len(response_content)} chars")
-                    return response_content
+                    return AIResult(content=response_content, model=model, usage=usage)
                 else:
                     logger.error(f"[AI Plugin] Invalid API Response: {result}")
                     raise Exception("Invalid response from API")
+
+    async def _read_stream(self, response: aiohttp.ClientResponse,
+                           on_segment: Callable[[str], Awaitable[None]],
+                           segmenter: StreamSegmenter) -> Tuple[str, Dict]:
+        """读取SSE流，按段回调，返回完整回答和token用量"""
+        parts = []
+        usage = {}
+        async for raw_line in response.content:
+            line = raw_line.decode('utf-8').strip()
+            if not line.startswith("data:"):
+                continue
+            payload = line[len("data:"):].strip()
+            if payload == "[DONE]":
+                break
+
+            chunk = json.loads(payload)
+            if chunk.get("usage"):
+                usage = chunk["usage"]
+                self._log_usage(usage)
+            for choice in chunk.get("choices") or []:
+                text = (choice.get("delta") or {}).get("content")
+                if not text:
+                    continue
+                parts.append(text)
+                for segment in segmenter.feed(text):
+                    await on_segment(segment)
+
+        remaining = segmenter.flush()
+        if remaining:
+            await on_segment(remaining)
+
+        response_content = "".join(parts)
+        if not response_content:
+            raise Exception("Empty streaming response from API")
+        logger.info(f"[AI Plugin] Streamed Response Content Length: {len(response_content)} chars")
+        return response_content, usage
+
+    def _log_usage(self, usage: Dict) -> None:
+        """记录token用量"""
+        logger.info(f"[AI Plugin] API Response Usage:")
+        logger.info(f"  - Prompt Tokens: {usage.get('prompt_tokens', 'N/A')}")
+        logger.info(f"  - Completion Tokens: {usage.get('completion_tokens', 'N/A')}")
+        logger.info(f"  - Total Tokens: {usage.get('total_tokens', 'N/A')}")
     
     def _get_help_text(self) -> str:
         """获取帮助文本"""
@@ -211,7 +620,9 @@ class AIPlugin(Plugin):
         help_text += "2. 切换模型: \n"
         help_text += "   - ai! model:模型名称 你的问题\n"
         help_text += "   - 小福 model:模型名称 你的问题\n"
-        help_text += "   例如: ai! model:gpt-4o-mini 帮我写一首诗\n\n"
+        help_text += "   例如: ai! model:gpt-4o-mini 帮我写一首诗\n"
+        help_text += "3. 清除对话记忆: \n"
+        help_text += "   - ai! 清除记忆\n\n"
         help_text += f"当前默认模型: {self.default_model}\n"
         help_text += "支持发送图片进行分析\n"
         
@@ -5,6 +5,8 @@ AI Plugin 默认配置
 DEFAULT_CONFIG = {
     "enabled": True,
     "priority": 50,  # 优先级，数字越小优先级越高
+    "timeout": 120,  # 插件链中单条消息的处理超时（秒），覆盖全局 PLUGIN_TIMEOUT
+    "timeout_message": "AI响应超时，请稍后再试",  # 超时后回复的内容，为空则不回复
     "models": {
         "gpt-4o": {
             "description": "GPT-4o - 最新的多模态模型，支持图像和文本",
@@ -14,5 +16,63 @@ DEFAULT_CONFIG = {
             "description": "GPT-4o-mini - 强大的语言模型",
             "max_tokens": 8192
         }
+    },
+    "scheduler": {
+        "default_max_concurrency": 4,  # 每个模型的默认并发上限，可在models中用max_concurrency覆盖
+        "default_rpm": 0,  # 每分钟请求数上限，可在models中用rpm覆盖，0表示不限制
+        "default_tpm": 0  # 每分钟token数上限，可在models中用tpm覆盖，0表示不限制
+    },
+    "hedge": {
+        "enabled": True,  # 在models中为模型配置fallback后生效
+        "percentile": 95,  # 主模型耗时超过该分位数后请求备用模型
+        "min_delay": 2,  # 对冲等待时间下限（秒）
+        "window": 200,  # 每个模型保留的最近耗时样本数
+        "min_samples": 20  # 样本数不足时不对冲
+    },
+    "memory": {
+        "enabled": True,
+        "private_chats": True,  # 私聊保存对话历史
+        "groups": [],  # 保存对话历史的群组ID，"*" 表示所有群组；群聊默认不保存，以便使用回答缓存和请求合并
+        "customers": [],  # 保存对话历史的客户ID，该客户绑定的群组和用户都保存
+        "history_tokens": 2000,  # 每次请求带上的历史token上限，可在models中按模型设置history_tokens
+        "max_messages": 40,  # 每个会话在Redis中最多保留的消息条数
+        "summarize_after": 20,  # 消息条数超过该值后把较早的消息压缩成摘要，0表示不压缩
+        "keep_recent": 6,  # 压缩时保留的最近消息条数
+        "summary_max_tokens": 300,  # 摘要长度上限
+        "summary_model": None,  # 生成摘要的模型，默认使用当前默认模型
+        "ttl": 86400  # 会话闲置多久后过期（秒）
+    },
+    "usage": {
+        "enabled": True,
+        "redis_flush_interval": 5,  # 增量写入Redis的间隔（秒）
+        "db_flush_interval": 60,  # 增量写入MySQL的间隔（秒）
+        "redis_expire_days": 3,  # Redis中每日用量的保留天数
+        "daily_token_quota": 0,  # 每个客户每天的token配额，0表示不限制
+        "customer_quotas": {},  # 按客户ID单独设置配额
+        "quota_exceeded_message": "今日AI使用额度已用完，请明天再试"
+    },
+    "cache": {
+        "enabled": True,
+        "default_ttl": 3600,  # 回答缓存时间（秒），可在models中按模型设置cache_ttl，0表示不缓存
+        "bypass_flag": "#nocache"  # 消息中包含此标记时跳过缓存
+    },
+    "stream": {
+        "enabled": False,  # 开启后按句子/段落分段发送回答
+        "min_chars": 40,  # 每段最少字数
+        "max_chars": 600  # 每段最多字数
+    },
+    "http": {
+        "max_connections": 20,  # 连接池最大连接数
+        "keepalive_timeout": 60,  # 空闲连接保持时间（秒）
+        "dns_cache_ttl": 300,  # DNS缓存时间（秒）
+        "connect_timeout": 10,  # 建立连接超时（秒）
+        "read_timeout": 60,  # 读取响应超时（秒）
+        "total_timeout": 90  # 单次请求总超时（秒），应小于插件的 timeout
+    },
+    "image_preprocess": {
+        "enabled": True,
+        "max_side": 1536,  # 长边最大像素，超过则等比缩放
+        "jpeg_quality": 85,
+        "workers": 2  # 图片处理进程数，0表示在线程池中处理
     }
 }
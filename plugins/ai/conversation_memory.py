@@ -0,0 +1,251 @@
+import re
+import json
+import uuid
+import asyncio
+from functools import lru_cache
+from typing import Awaitable, Callable, Dict, List
+from common.log import logger
+from common.redis_manager import redis_manager
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+CJK_CHAR = re.compile(r'[\u3000-\u303f\u3400-\u4dbf\u4e00-\u9fff\uff00-\uffef]')
+
+# 原子地写入摘要并删除已压缩的消息
+# 压缩期间列表头部可能被 append 的 LTRIM 截掉，会话也可能被 /reset 清除，
+# 所以不按条数删除：摘要与开始压缩时不同（被清除或被其他进程更新）时放弃；
+# 否则在列表头部查找最后一条已压缩的消息（每条消息带唯一id），删除它及之前的消息，
+# 找不到说明已压缩的消息都已不在列表中，同样放弃。
+# KEYS: 消息列表, 摘要
+# ARGV: 新摘要, 摘要TTL, 开始压缩时的摘要（没有为空串）, 已压缩的消息条数, 最后一条已压缩的消息
+# 返回: 删除的消息条数，放弃时为0
+COMPACT_LUA = """
+local current = redis.call('GET', KEYS[2])
+if (current or '') ~= ARGV[3] then
+    return 0
+end
+local head = redis.call('LRANGE', KEYS[1], 0, tonumber(ARGV[4]) - 1)
+for i = #head, 1, -1 do
+    if head[i] == ARGV[5] then
+        redis.call('LTRIM', KEYS[1], i, -1)
+        redis.call('SET', KEYS[2], ARGV[1], 'EX', ARGV[2])
+        return i
+    end
+end
+return 0
+"""
+
+
+@lru_cache(maxsize=16)
+def _get_encoding(model: str):
+    """获取模型的tiktoken编码器，加载一次后缓存"""
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        return tiktoken.get_encoding("cl100k_base")
+
+
+def count_tokens(text: str, model: str = "gpt-4o") -> int:
+    """计算文本的token数
+
+    安装了 tiktoken 时精确计算，否则按中日韩字符每字1个、其余每4个字符1个估算。
+    """
+    if not text:
+        return 0
+    if tiktoken is not None:
+        return len(_get_encoding(model).encode(text))
+    cjk = len(CJK_CHAR.findall(text))
+    return cjk + (len(text) - cjk + 3) // 4
+
+
+class ConversationMemory:
+    """按会话保存对话历史
+
+    每个会话的消息存储在有长度上限的Redis列表中，组装请求时从最新的消息往前取，
+    直到达到模型的token预算；消息条数超过 summarize_after 后，较早的消息被
+    后台压缩进一段滚动摘要，请求大小不会随对话变长而增长。
+    """
+
+    MEMORY_KEY_PREFIX = "ai_memory:"
+    SUMMARY_KEY_PREFIX = "ai_memory_summary:"
+
+    def __init__(self, config: Dict = None, models_config: Dict = None):
+        config = config or {}
+        self.enabled = config.get("enabled", True)
+        # 哪些会话保存历史：私聊，以及列出的群组和客户（"*" 表示全部群组）
+        self.private_chats = config.get("private_chats", True)
+        self.groups = set(config.get("groups") or [])
+        self.customers = set(config.get("customers") or [])
+        self.max_messages = config.get("max_messages", 40)
+        self.ttl = config.get("ttl", 86400)
+        self.default_history_tokens = config.get("history_tokens", 2000)
+        self.summarize_after = config.get("summarize_after", 20)
+        self.keep_recent = config.get("keep_recent", 6)
+        self.summary_max_tokens = config.get("summary_max_tokens", 300)
+        self.models_config = models_config or {}
+        self._compacting = set()
+        self._compact_script = None
+        self._stats = {
+            "loads": 0,
+            "history_tokens_total": 0,
+            "trimmed_messages": 0,  # 超出预算未放入请求的消息数
+            "summaries": 0,
+            "summary_errors": 0,
+            "summary_conflicts": 0,  # 压缩期间会话被清除或截断，放弃写入的摘要数
+        }
+
+    @staticmethod
+    def chat_id(context) -> str:
+        """会话标识：私聊按对方，群聊按群和发言人"""
+        if context.is_group:
+            return f"{context.receiver}:{context.sender}"
+        return context.sender or context.receiver
+
+    def is_enabled_for(self, context, customer_id: str = None) -> bool:
+        """该会话是否保存对话历史
+
+        群聊默认不保存：没有历史的问题可以使用回答缓存，也能与其他会话的相同问题合并。
+        """
+        if not self.enabled:
+            return False
+        if not context.is_group:
+            return self.private_chats or customer_id in self.customers
+        return "*" in self.groups or context.receiver in self.groups or customer_id in self.customers
+
+    def _memory_key(self, chat_id: str) -> str:
+        return redis_manager.get_prefixed_key(f"{self.MEMORY_KEY_PREFIX}{chat_id}")
+
+    def _summary_key(self, chat_id: str) -> str:
+        return redis_manager.get_prefixed_key(f"{self.SUMMARY_KEY_PREFIX}{chat_id}")
+
+    def get_budget(self, model: str) -> int:
+        return self.models_config.get(model, {}).get("history_tokens", self.default_history_tokens)
+
+    def load(self, chat_id: str, model: str) -> List[Dict]:
+        """读取会话历史，返回可以直接放在本次问题前面的消息列表"""
+        if not self.enabled:
+            return []
+        try:
+            client = redis_manager.get_client()
+            pipe = client.pipeline()
+            pipe.get(self._summary_key(chat_id))
+            pipe.lrange(self._memory_key(chat_id), 0, -1)
+            summary_raw, items = pipe.execute()
+        except Exception as e:
+            logger.error(f"[AI Plugin] Error loading conversation memory: {e}")
+            return []
+
+        budget = self.get_budget(model)
+        history = []
+        used = 0
+        if summary_raw:
+            summary = json.loads(summary_raw)
+            if summary["tokens"] <= budget:
+                used += summary["tokens"]
+                history.append({"role": "system", "content": f"之前对话的摘要：{summary['content']}"})
+
+        # 从最新的消息往前取，直到用完预算
+        recent = []
+        for raw in reversed(items):
+            item = json.loads(raw)
+            if used + item["tokens"] > budget:
+                break
+            used += item["tokens"]
+            recent.append({"role": item["role"], "content": item["content"]})
+        recent.reverse()
+        history.extend(recent)
+
+        self._stats["loads"] += 1
+        self._stats["history_tokens_total"] += used
+        self._stats["trimmed_messages"] += len(items) - len(recent)
+        return history
+
+    def append(self, chat_id: str, model: str, question: str, answer: str) -> int:
+        """追加一轮问答，返回会话当前的消息条数"""
+        if not self.enabled or not answer:
+            return 0
+        key = self._memory_key(chat_id)
+        try:
+            pipe = redis_manager.get_client().pipeline()
+            for role, content in (("user", question), ("assistant", answer)):
+                pipe.rpush(key, json.dumps({
+                    "id": uuid.uuid4().hex,  # 压缩时据此定位已压缩的消息
+                    "role": role,
+                    "content": content,
+                    "tokens": count_tokens(content, model)  # 写入时计算一次，读取时不再重复计算
+                }, ensure_ascii=False))
+            pipe.ltrim(key, -self.max_messages, -1)
+            pipe.expire(key, self.ttl)
+            pipe.expire(self._summary_key(chat_id), self.ttl)
+            pipe.llen(key)
+            return pipe.execute()[-1]
+        except Exception as e:
+            logger.error(f"[AI Plugin] Error saving conversation memory: {e}")
+            return 0
+
+    def clear(self, chat_id: str) -> None:
+        """清除会话历史和摘要"""
+        try:
+            redis_manager.get_client().delete(self._memory_key(chat_id), self._summary_key(chat_id))
+        except Exception as e:
+            logger.error(f"[AI Plugin] Error clearing conversation memory: {e}")
+
+    def maybe_compact(self, chat_id: str, model: str, message_count: int,
+                      summarize: Callable[[str], Awaitable[str]]) -> None:
+        """消息条数超过阈值时在后台把较早的消息压缩进摘要"""
+        if not self.summarize_after or message_count <= self.summarize_after or chat_id in self._compacting:
+            return
+        self._compacting.add(chat_id)
+        asyncio.ensure_future(self._compact(chat_id, model, summarize))
+
+    async def _compact(self, chat_id: str, model: str, summarize: Callable[[str], Awaitable[str]]) -> None:
+        key = self._memory_key(chat_id)
+        summary_key = self._summary_key(chat_id)
+        try:
+            client = redis_manager.get_client()
+            items = await asyncio.to_thread(client.lrange, key, 0, -1)
+            if len(items) <= self.summarize_after:
+                return
+
+            old_items = items[:len(items) - self.keep_recent]
+            summary_raw = await asyncio.to_thread(client.get, summary_key)
+            lines = []
+            if summary_raw:
+                lines.append(f"已有摘要：{json.loads(summary_raw)['content']}")
+            for raw in old_items:
+                item = json.loads(raw)
+                speaker = "用户" if item["role"] == "user" else "助手"
+                lines.append(f"{speaker}：{item['content']}")
+
+            summary = await summarize("\n".join(lines))
+            if not summary:
+                return
+
+            if self._compact_script is None:
+                self._compact_script = client.register_script(COMPACT_LUA)
+            removed = await asyncio.to_thread(self._compact_script, keys=[key, summary_key], args=[
+                json.dumps({"content": summary, "tokens": count_tokens(summary, model)}, ensure_ascii=False),
+                self.ttl, summary_raw or "", len(old_items), old_items[-1]
+            ])
+            if not removed:
+                self._stats["summary_conflicts"] += 1
+                logger.info(f"[AI Plugin] Conversation {chat_id} changed during compaction, summary discarded")
+                return
+            self._stats["summaries"] += 1
+            logger.info(f"[AI Plugin] Compacted {removed} messages into summary for {chat_id}")
+        except Exception as e:
+            self._stats["summary_errors"] += 1
+            logger.error(f"[AI Plugin] Error compacting conversation memory: {e}")
+        finally:
+            self._compacting.discard(chat_id)
+
+    def get_stats(self) -> Dict:
+        """获取会话记忆统计：平均每次请求带上的历史token数"""
+        stats = dict(self._stats)
+        loads = stats["loads"]
+        stats["avg_history_tokens"] = round(stats["history_tokens_total"] / loads, 1) if loads else 0.0
+        stats["compacting"] = len(self._compacting)
+        return stats
@@ -0,0 +1,194 @@
+import os
+import time
+import asyncio
+import mimetypes
+import threading
+import multiprocessing
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, Optional, Tuple
+from PIL import Image, ImageOps
+from common.log import logger
+from common.media_store import media_store
+from common.metrics import metrics
+
+FORMAT_MIME_TYPES = {
+    "JPEG": "image/jpeg",
+    "PNG": "image/png",
+    "GIF": "image/gif",
+    "WEBP": "image/webp",
+}
+
+
+def _process_image(src_path: str, dst_path: str, max_side: int, jpeg_quality: int) -> Tuple[str, str]:
+    """在子进程中缩放并重新压缩图片，返回 (输出路径, MIME类型)
+
+    带透明通道的图片保存为PNG，其他图片保存为JPEG（PNG原图压缩成JPEG反而更大时仍保存为PNG）；
+    如果没有缩放且处理后反而更大，使用原图。
+    """
+    with Image.open(src_path) as img:
+        src_format = img.format
+        img = ImageOps.exif_transpose(img)
+        resized = max(img.size) > max_side
+        if resized:
+            img.thumbnail((max_side, max_side), Image.LANCZOS)
+
+        has_alpha = img.mode in ("RGBA", "LA") or (img.mode == "P" and "transparency" in img.info)
+        if has_alpha:
+            img.save(dst_path, format="PNG", optimize=True)
+            mime = "image/png"
+        else:
+            if img.mode != "RGB":
+                img = img.convert("RGB")
+            img.save(dst_path, format="JPEG", quality=jpeg_quality, optimize=True, progressive=True)
+            mime = "image/jpeg"
+            if src_format == "PNG" and os.path.getsize(dst_path) >= os.path.getsize(src_path):
+                # 截图之类的大面积纯色图片，PNG 比 JPEG 小得多
+                img.save(dst_path, format="PNG", optimize=True)
+                mime = "image/png"
+
+    if not resized and src_format in FORMAT_MIME_TYPES and \
+            os.path.getsize(dst_path) >= os.path.getsize(src_path):
+        os.remove(dst_path)
+        return src_path, FORMAT_MIME_TYPES[src_format]
+    return dst_path, mime
+
+
+class ImagePreprocessor:
+    """发送给AI模型前的图片预处理
+
+    在进程池中把图片缩放到模型有效分辨率并重新压缩，设置正确的MIME类型，
+    结果按原图内容哈希缓存。
+    进程池在插件加载时创建并立即 fork 出全部子进程，此时进程中还没有其他线程；
+    之后不再创建子进程（多线程进程中 fork 可能复制其他线程持有的锁）。
+    不支持 fork 或进程池异常后改在线程池中处理。
+    """
+
+    CACHE_SIZE = 1024
+
+    def __init__(self, config: Dict = None):
+        config = config or {}
+        self.enabled = config.get("enabled", True)
+        self.max_side = config.get("max_side", 1536)
+        self.jpeg_quality = config.get("jpeg_quality", 85)
+        self.workers = config.get("workers", 2)
+
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._cache: "OrderedDict[str, Tuple[str, str]]" = OrderedDict()  # 原图sha256 -> (路径, MIME)
+        self._lock = threading.Lock()
+        self._stats = {
+            "processed": 0,
+            "cache_hits": 0,
+            "failed": 0,
+            "bytes_in": 0,
+            "bytes_out": 0,
+            "seconds": 0.0,
+        }
+        metrics.register("ai_image_preprocessor", self.get_stats)
+        if self.enabled:
+            self._start_executor()
+
+    def _start_executor(self) -> None:
+        if self.workers <= 0 or "fork" not in multiprocessing.get_all_start_methods():
+            return
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.workers, mp_context=multiprocessing.get_context("fork")
+        )
+        # fork 方式在第一次提交任务时启动全部子进程
+        self._executor.submit(os.getpid)
+
+    async def _run(self, *args) -> Tuple[str, str]:
+        """在进程池中处理图片，进程池不可用时在线程池中处理"""
+        loop = asyncio.get_running_loop()
+        executor = self._executor
+        if executor is not None:
+            try:
+                return await loop.run_in_executor(executor, _process_image, *args)
+            except BrokenProcessPool:
+                logger.error("[AI Plugin] Image process pool is broken, falling back to threads")
+                with self._lock:
+                    if self._executor is executor:
+                        self._executor = None
+                executor.shutdown(wait=False, cancel_futures=True)
+        return await loop.run_in_executor(None, _process_image, *args)
+
+    @staticmethod
+    def guess_mime(file_path: str) -> str:
+        """根据文件头判断图片MIME类型"""
+        try:
+            with Image.open(file_path) as img:
+                if img.format in FORMAT_MIME_TYPES:
+                    return FORMAT_MIME_TYPES[img.format]
+        except Exception:
+            pass
+        return mimetypes.guess_type(file_path)[0] or "image/jpeg"
+
+    def _cache_get(self, digest: str) -> Optional[Tuple[str, str]]:
+        with self._lock:
+            result = self._cache.get(digest)
+            if result and os.path.exists(result[0]):
+                self._cache.move_to_end(digest)
+                return result
+            self._cache.pop(digest, None)
+            return None
+
+    def _cache_put(self, digest: str, result: Tuple[str, str]) -> None:
+        with self._lock:
+            self._cache[digest] = result
+            while len(self._cache) > self.CACHE_SIZE:
+                self._cache.popitem(last=False)
+
+    async def prepare(self, file_path: str) -> Tuple[str, str]:
+        """返回适合发送给模型的图片路径和MIME类型，处理失败时返回原图"""
+        if not self.enabled:
+            return file_path, self.guess_mime(file_path)
+
+        # 消息中的图片都在媒体存储内，文件名就是内容哈希
+        digest = media_store.digest_of(file_path)
+        cached = self._cache_get(digest)
+        if cached:
+            self._stats["cache_hits"] += 1
+            return cached
+
+        start_time = time.monotonic()
+        dst_path = media_store.staging_path(".img")
+        try:
+            out_path, mime = await self._run(file_path, dst_path, self.max_side, self.jpeg_quality)
+        except Exception as e:
+            self._stats["failed"] += 1
+            logger.error(f"[AI Plugin] Failed to preprocess image {file_path}: {e}")
+            if os.path.exists(dst_path):
+                os.remove(dst_path)
+            return file_path, self.guess_mime(file_path)
+
+        bytes_in = os.path.getsize(file_path)
+        if out_path == dst_path:
+            ext = ".png" if mime == "image/png" else ".jpg"
+            out_path = await asyncio.to_thread(media_store.put_file, dst_path, ext)
+        bytes_out = os.path.getsize(out_path)
+        elapsed = time.monotonic() - start_time
+
+        self._stats["processed"] += 1
+        self._stats["bytes_in"] += bytes_in
+        self._stats["bytes_out"] += bytes_out
+        self._stats["seconds"] += elapsed
+        logger.info(f"[AI Plugin] Preprocessed image {bytes_in} -> {bytes_out} bytes ({mime}) in {elapsed:.3f}s")
+
+        result = (out_path, mime)
+        self._cache_put(digest, result)
+        return result
+
+    def get_stats(self) -> Dict:
+        """获取预处理统计信息，包括节省的字节数和增加的耗时"""
+        stats = dict(self._stats)
+        stats["bytes_saved"] = stats["bytes_in"] - stats["bytes_out"]
+        stats["avg_seconds_added"] = round(stats["seconds"] / stats["processed"], 4) if stats["processed"] else 0.0
+        return stats
+
+    def shutdown(self) -> None:
+        """关闭进程池"""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor:
+            executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,42 @@
+from collections import deque
+from typing import Deque, Dict, Optional
+
+
+class LatencyTracker:
+    """按模型记录最近若干次调用的耗时，计算分位数"""
+
+    def __init__(self, window: int = 200, min_samples: int = 20):
+        self.window = window
+        self.min_samples = min_samples
+        self._samples: Dict[str, Deque[float]] = {}
+
+    def record(self, model: str, seconds: float) -> None:
+        samples = self._samples.get(model)
+        if samples is None:
+            samples = self._samples[model] = deque(maxlen=self.window)
+        samples.append(seconds)
+
+    @staticmethod
+    def _pick(ordered, percent: float) -> float:
+        index = min(len(ordered) - 1, int(round(percent / 100.0 * (len(ordered) - 1))))
+        return ordered[index]
+
+    def percentile(self, model: str, percent: float) -> Optional[float]:
+        """返回模型耗时的分位数，样本不足 min_samples 时返回None"""
+        samples = self._samples.get(model)
+        if not samples or len(samples) < self.min_samples:
+            return None
+        return self._pick(sorted(samples), percent)
+
+    def get_stats(self) -> Dict:
+        """获取各模型的 p50/p95/p99 耗时"""
+        stats = {}
+        for model, samples in self._samples.items():
+            ordered = sorted(samples)
+            stats[model] = {
+                "samples": len(ordered),
+                "p50_seconds": round(self._pick(ordered, 50), 3),
+                "p95_seconds": round(self._pick(ordered, 95), 3),
+                "p99_seconds": round(self._pick(ordered, 99), 3),
+            }
+        return stats
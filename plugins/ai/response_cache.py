@@ -0,0 +1,128 @@
+import re
+import json
+import hashlib
+import unicodedata
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+from common.log import logger
+from common.redis_manager import redis_manager
+from common.media_store import media_store
+
+
+@dataclass
+class AIResult:
+    """一次模型调用的结果"""
+    content: str
+    model: str
+    usage: Dict = field(default_factory=dict)
+    cached: bool = False
+
+
+class ResponseCache:
+    """AI回答缓存，按模型、规范化后的问题和图片内容哈希存储在Redis中"""
+
+    CACHE_KEY_PREFIX = "ai_cache:"
+    TRAILING_PUNCTUATION = "?？!！。.~～ "
+
+    def __init__(self, config: Dict = None, models_config: Dict = None):
+        config = config or {}
+        self.enabled = config.get("enabled", True)
+        self.default_ttl = config.get("default_ttl", 3600)
+        self.bypass_flag = config.get("bypass_flag", "#nocache")
+        self.models_config = models_config or {}
+        self._stats = {
+            "hits": 0,
+            "misses": 0,
+            "bypassed": 0,
+            "with_history": 0,  # 带有对话历史的请求数，缓存key包含历史的哈希
+            "saved_prompt_tokens": 0,
+            "saved_completion_tokens": 0,
+        }
+
+    @classmethod
+    def normalize_query(cls, query: str) -> str:
+        """规范化问题文本：统一全半角和大小写，合并空白，去掉结尾标点"""
+        text = unicodedata.normalize("NFKC", query).lower()
+        text = re.sub(r'\s+', ' ', text).strip()
+        return text.rstrip(cls.TRAILING_PUNCTUATION)
+
+    def extract_bypass_flag(self, query: str) -> Tuple[str, bool]:
+        """检查并移除消息中的跳过缓存标记"""
+        if self.bypass_flag and self.bypass_flag in query:
+            return query.replace(self.bypass_flag, "").strip(), True
+        return query, False
+
+    def get_ttl(self, model: str) -> int:
+        """模型的缓存时间，配置为0表示该模型不缓存"""
+        return self.models_config.get(model, {}).get("cache_ttl", self.default_ttl)
+
+    def make_key(self, model: str, query: str, files: Optional[List[Dict]] = None,
+                 history: Optional[List[Dict]] = None) -> str:
+        """生成缓存key
+
+        带对话历史的请求在key中加入历史（含摘要）的哈希，只有历史完全相同时才会命中或合并；
+        不带历史的请求在所有会话之间共享。
+        """
+        image_hashes = sorted(
+            media_store.digest_of(file["path"]) for file in (files or []) if file.get("type") == "image"
+        )
+        parts = [self.normalize_query(query)] + image_hashes
+        if history:
+            self._stats["with_history"] += 1
+            history_raw = json.dumps(history, ensure_ascii=False, sort_keys=True)
+            parts.append("history:" + hashlib.sha256(history_raw.encode("utf-8")).hexdigest())
+        raw = "\n".join(parts)
+        digest = hashlib.sha256(raw.encode("utf-8")).hexdigest()
+        return redis_manager.get_prefixed_key(f"{self.CACHE_KEY_PREFIX}{model}:{digest}")
+
+    def key_for_model(self, key: str, model: str) -> str:
+        """同一请求在另一个模型下的缓存key"""
+        digest = key.rsplit(":", 1)[1]
+        return redis_manager.get_prefixed_key(f"{self.CACHE_KEY_PREFIX}{model}:{digest}")
+
+    def is_cacheable(self, model: str) -> bool:
+        return self.enabled and self.get_ttl(model) > 0
+
+    def get(self, key: str, model: str) -> Optional[AIResult]:
+        """读取缓存，未命中返回None"""
+        try:
+            cached = redis_manager.get_client().get(key)
+        except Exception as e:
+            logger.error(f"[AI Plugin] Error reading response cache: {e}")
+            return None
+
+        if not cached:
+            self._stats["misses"] += 1
+            return None
+
+        data = json.loads(cached)
+        usage = data.get("usage") or {}
+        self._stats["hits"] += 1
+        self._stats["saved_prompt_tokens"] += usage.get("prompt_tokens", 0) or 0
+        self._stats["saved_completion_tokens"] += usage.get("completion_tokens", 0) or 0
+        logger.info(f"[AI Plugin] Response cache hit for model {model}")
+        return AIResult(content=data["content"], model=data.get("model", model), usage=usage, cached=True)
+
+    def set(self, key: str, result: AIResult) -> None:
+        """写入缓存"""
+        ttl = self.get_ttl(result.model)
+        if ttl <= 0 or not result.content:
+            return
+        try:
+            redis_manager.get_client().setex(key, ttl, json.dumps({
+                "content": result.content,
+                "model": result.model,
+                "usage": result.usage
+            }, ensure_ascii=False))
+        except Exception as e:
+            logger.error(f"[AI Plugin] Error writing response cache: {e}")
+
+    def record_bypass(self) -> None:
+        self._stats["bypassed"] += 1
+
+    def get_stats(self) -> Dict:
+        """获取缓存统计：命中率和节省的token数"""
+        stats = dict(self._stats)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_ratio"] = round(stats["hits"] / lookups, 4) if lookups else 0.0
+        return stats
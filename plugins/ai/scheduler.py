@@ -0,0 +1,157 @@
+import time
+import heapq
+import asyncio
+import itertools
+from contextlib import asynccontextmanager
+from typing import Dict, List, Optional, Tuple
+from common.log import logger
+
+PRIORITY_HIGH = 0  # 私聊和@机器人的消息
+PRIORITY_NORMAL = 1  # 普通群消息
+
+
+class TokenBucket:
+    """令牌桶，rate为每秒补充的令牌数，rate为0表示不限制"""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def delay(self, amount: float) -> float:
+        """距离有足够令牌还需要等待的秒数"""
+        if not self.rate:
+            return 0.0
+        self._refill()
+        amount = min(amount, self.capacity)  # 超过桶容量的请求只需等桶满
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) / self.rate
+
+    def consume(self, amount: float) -> None:
+        """消耗令牌，允许为负数（按实际用量补扣）"""
+        if not self.rate:
+            return
+        self._refill()
+        self.tokens -= amount
+
+
+class _ModelLane:
+    """单个模型的并发限制、令牌桶和等待队列"""
+
+    def __init__(self, model: str, max_concurrency: int, rpm: float, tpm: float):
+        self.model = model
+        self.max_concurrency = max_concurrency
+        self.requests = TokenBucket(rpm / 60.0, max(rpm, 1))
+        self.tokens = TokenBucket(tpm / 60.0, max(tpm, 1))
+        self.active = 0
+        self.waiters: List[Tuple[int, int, asyncio.Future, int]] = []  # (优先级, 序号, future, 预估token)
+        self.timer: Optional[asyncio.TimerHandle] = None
+        self.wait_count = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+
+class AIScheduler:
+    """AI调用调度器
+
+    每个模型有独立的并发上限、请求数令牌桶（rpm）和token令牌桶（tpm），
+    排队的请求按优先级出队，私聊和@消息优先于普通群消息。
+    """
+
+    def __init__(self, config: Dict = None, models_config: Dict = None):
+        config = config or {}
+        self.default_max_concurrency = config.get("default_max_concurrency", 4)
+        self.default_rpm = config.get("default_rpm", 0)
+        self.default_tpm = config.get("default_tpm", 0)
+        self.models_config = models_config or {}
+        self._lanes: Dict[str, _ModelLane] = {}
+        self._seq = itertools.count()
+
+    def _get_lane(self, model: str) -> _ModelLane:
+        lane = self._lanes.get(model)
+        if lane is None:
+            model_config = self.models_config.get(model, {})
+            lane = _ModelLane(
+                model,
+                model_config.get("max_concurrency", self.default_max_concurrency),
+                model_config.get("rpm", self.default_rpm),
+                model_config.get("tpm", self.default_tpm)
+            )
+            self._lanes[model] = lane
+        return lane
+
+    def _dispatch(self, lane: _ModelLane) -> None:
+        """在并发和令牌允许时按优先级放行等待的请求"""
+        lane.timer = None
+        while lane.waiters and lane.active < lane.max_concurrency:
+            _, _, future, tokens = lane.waiters[0]
+            if future.done():  # 等待者已取消
+                heapq.heappop(lane.waiters)
+                continue
+
+            delay = max(lane.requests.delay(1), lane.tokens.delay(tokens))
+            if delay > 0:
+                lane.timer = asyncio.get_running_loop().call_later(delay, self._dispatch, lane)
+                return
+
+            heapq.heappop(lane.waiters)
+            lane.requests.consume(1)
+            lane.tokens.consume(tokens)
+            lane.active += 1
+            future.set_result(None)
+
+    @asynccontextmanager
+    async def slot(self, model: str, priority: int = PRIORITY_NORMAL, estimated_tokens: int = 0):
+        """获取模型的调用名额，yield一个函数用于上报实际token用量"""
+        lane = self._get_lane(model)
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(lane.waiters, (priority, next(self._seq), future, estimated_tokens))
+        enqueued = time.monotonic()
+        if lane.timer is None:
+            self._dispatch(lane)
+
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # 已经拿到名额但在返回前被取消，归还名额
+                lane.active -= 1
+                self._dispatch(lane)
+            raise
+
+        waited = time.monotonic() - enqueued
+        lane.wait_count += 1
+        lane.wait_total += waited
+        lane.wait_max = max(lane.wait_max, waited)
+        if waited > 1:
+            logger.info(f"[AI Plugin] Request for {model} waited {waited:.2f}s in queue")
+
+        def record_usage(actual_tokens: int) -> None:
+            lane.tokens.consume(actual_tokens - estimated_tokens)
+
+        try:
+            yield record_usage
+        finally:
+            lane.active -= 1
+            if lane.timer is None:
+                self._dispatch(lane)
+
+    def get_stats(self) -> Dict:
+        """获取各模型的排队等待时间和当前并发"""
+        stats = {}
+        for model, lane in self._lanes.items():
+            stats[model] = {
+                "active": lane.active,
+                "queued": sum(1 for waiter in lane.waiters if not waiter[2].done()),
+                "wait_count": lane.wait_count,
+                "avg_wait_seconds": round(lane.wait_total / lane.wait_count, 4) if lane.wait_count else 0.0,
+                "max_wait_seconds": round(lane.wait_max, 4),
+            }
+        return stats
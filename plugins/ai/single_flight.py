@@ -0,0 +1,55 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Tuple
+
+
+class SingleFlight:
+    """合并并发的相同请求
+
+    同一个key在第一个请求完成前再次到来时，不再发起新的调用，
+    而是等待第一个请求的结果，所有等待者得到同一个结果。
+    """
+
+    def __init__(self):
+        self._calls: Dict[str, Tuple[asyncio.AbstractEventLoop, asyncio.Future]] = {}
+        self._stats = {
+            "leaders": 0,
+            "coalesced": 0,  # 被合并而节省的调用次数
+        }
+
+    @staticmethod
+    def _consume_exception(future: asyncio.Future) -> None:
+        # 没有等待者时避免 "exception was never retrieved" 警告
+        if not future.cancelled():
+            future.exception()
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+        """执行或等待key对应的调用，返回 (结果, 是否复用了其他请求的结果)"""
+        loop = asyncio.get_running_loop()
+        existing = self._calls.get(key)
+        if existing is not None and existing[0] is loop:
+            self._stats["coalesced"] += 1
+            return await asyncio.shield(existing[1]), True
+
+        future = loop.create_future()
+        future.add_done_callback(self._consume_exception)
+        self._calls[key] = (loop, future)
+        self._stats["leaders"] += 1
+        try:
+            result = await fn()
+            future.set_result(result)
+            return result, False
+        except asyncio.CancelledError:
+            future.set_exception(Exception("合并的请求已被取消"))
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        finally:
+            if self._calls.get(key, (None, None))[1] is future:
+                del self._calls[key]
+
+    def get_stats(self) -> Dict:
+        """获取合并统计"""
+        stats = dict(self._stats)
+        stats["in_flight"] = len(self._calls)
+        return stats
@@ -0,0 +1,53 @@
+import re
+from typing import List, Optional
+
+# 句子结束符（中英文），之后可以断开发送
+SENTENCE_END = re.compile(r'[。！？!?；;…]+["”’』」)）]*|\.(?=\s)')
+
+
+class StreamSegmenter:
+    """把流式返回的文本切分成适合单独发送的段落
+
+    遇到空行（段落结束）立即切分；遇到句子结束符且已累积到 min_chars 时切分；
+    超过 max_chars 仍没有合适的断点时强制切分。
+    """
+
+    def __init__(self, min_chars: int = 40, max_chars: int = 600):
+        self.min_chars = min_chars
+        self.max_chars = max_chars
+        self._buffer = ""
+
+    def _find_cut(self) -> int:
+        """返回可以切分的位置，没有返回0"""
+        paragraph = self._buffer.find("\n\n")
+        if 0 < paragraph < self.max_chars:
+            return paragraph + 2
+
+        for match in SENTENCE_END.finditer(self._buffer, 0, self.max_chars):
+            if match.end() >= self.min_chars:
+                return match.end()
+
+        if len(self._buffer) >= self.max_chars:
+            newline = self._buffer.rfind("\n", 0, self.max_chars)
+            return newline + 1 if newline > 0 else self.max_chars
+        return 0
+
+    def feed(self, text: str) -> List[str]:
+        """追加文本，返回已经可以发送的段落"""
+        self._buffer += text
+        segments = []
+        while True:
+            cut = self._find_cut()
+            if not cut:
+                break
+            segment = self._buffer[:cut].strip()
+            self._buffer = self._buffer[cut:].lstrip()
+            if segment:
+                segments.append(segment)
+        return segments
+
+    def flush(self) -> Optional[str]:
+        """返回剩余的文本"""
+        segment = self._buffer.strip()
+        self._buffer = ""
+        return segment or None
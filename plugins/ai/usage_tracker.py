@@ -0,0 +1,261 @@
+import time
+import threading
+from datetime import date, datetime
+from typing import Dict, Optional, Tuple
+from sqlalchemy.dialects.mysql import insert
+from common.log import logger
+from common.database_manager import db_manager
+from common.models import AIUsage, WxGroup, WxUser
+from common.redis_manager import redis_manager
+
+USAGE_FIELDS = ("requests", "prompt_tokens", "completion_tokens", "total_tokens")
+UNBOUND_CUSTOMER = "unbound"
+
+
+class UsageTracker:
+    """按客户、模型和日期统计AI用量
+
+    每次调用只更新内存中的计数；后台线程定期把增量用 HINCRBY 管道批量写入Redis，
+    并以更长的间隔批量写入MySQL。配额检查只读内存中的当日计数，不产生额外的网络请求。
+    """
+
+    USAGE_KEY_PREFIX = "ai_usage:"
+    CUSTOMER_CACHE_EXPIRE = 1800  # 会话对应客户ID的缓存时间（秒）
+    NEGATIVE_CACHE_EXPIRE = 60  # 未绑定或查询出错时的缓存时间（秒）
+
+    def __init__(self, config: Dict = None):
+        config = config or {}
+        self.enabled = config.get("enabled", True)
+        self.redis_flush_interval = config.get("redis_flush_interval", 5)
+        self.db_flush_interval = config.get("db_flush_interval", 60)
+        self.redis_expire = config.get("redis_expire_days", 3) * 86400
+        self.daily_token_quota = config.get("daily_token_quota", 0)
+        self.customer_quotas: Dict[str, int] = config.get("customer_quotas", {}) or {}
+
+        self._lock = threading.Lock()
+        self._daily: Dict[Tuple[str, str, str], Dict[str, int]] = {}  # 当日累计，用于配额检查
+        self._pending_redis: Dict[Tuple[str, str, str], Dict[str, int]] = {}
+        self._pending_db: Dict[Tuple[str, str, str], Dict[str, int]] = {}
+        self._customers: Dict[str, Tuple[str, float]] = {}
+        self._stop = threading.Event()
+        self._flusher: Optional[threading.Thread] = None
+        self._last_db_flush = time.monotonic()
+        self._stats = {
+            "recorded": 0,
+            "redis_flushes": 0,
+            "db_flushes": 0,
+            "db_rows_flushed": 0,
+            "flush_errors": 0,
+            "quota_rejections": 0,
+            "customer_lookups": 0,  # 缓存未命中时查询数据库的次数
+            "customer_lookup_errors": 0,
+        }
+
+    def _usage_key(self, day: str, customer_id: str) -> str:
+        return redis_manager.get_prefixed_key(f"{self.USAGE_KEY_PREFIX}{day}:{customer_id}")
+
+    @staticmethod
+    def _today() -> str:
+        return date.today().isoformat()
+
+    def cached_customer(self, is_group: bool, chat_id: str) -> Optional[str]:
+        """内存中缓存的客户ID，没有缓存或已过期时返回None"""
+        cached = self._customers.get(f"{'group' if is_group else 'user'}:{chat_id}")
+        if cached and cached[1] > time.monotonic():
+            return cached[0]
+        return None
+
+    def resolve_customer(self, is_group: bool, chat_id: str) -> str:
+        """查询群组或用户绑定的客户ID，结果在内存中缓存
+
+        未绑定和查询出错的结果也会缓存 NEGATIVE_CACHE_EXPIRE 秒，避免未绑定的会话每条消息都查一次数据库。
+        会访问数据库，在事件循环中应通过 asyncio.to_thread 调用。
+        """
+        cached = self.cached_customer(is_group, chat_id)
+        if cached is not None:
+            return cached
+
+        customer_id = UNBOUND_CUSTOMER
+        expire = self.NEGATIVE_CACHE_EXPIRE
+        session = db_manager.get_session()
+        try:
+            if is_group:
+                record = session.query(WxGroup).filter_by(wx_group_id=chat_id).first()
+            else:
+                record = session.query(WxUser).filter_by(wx_user_id=chat_id).first()
+            if record and record.customer_id:
+                customer_id = record.customer_id
+                expire = self.CUSTOMER_CACHE_EXPIRE
+        except Exception as e:
+            self._stats["customer_lookup_errors"] += 1
+            logger.error(f"[AI Plugin] Error resolving customer for {chat_id}: {e}")
+        finally:
+            db_manager.close_session(session)
+
+        self._stats["customer_lookups"] += 1
+        self._customers[f"{'group' if is_group else 'user'}:{chat_id}"] = (customer_id, time.monotonic() + expire)
+        return customer_id
+
+    def invalidate_customer(self, is_group: bool, chat_id: str) -> None:
+        self._customers.pop(f"{'group' if is_group else 'user'}:{chat_id}", None)
+
+    def record(self, customer_id: str, model: str, usage: Dict) -> None:
+        """记录一次调用的用量"""
+        if not self.enabled:
+            return
+        delta = {
+            "requests": 1,
+            "prompt_tokens": usage.get("prompt_tokens", 0) or 0,
+            "completion_tokens": usage.get("completion_tokens", 0) or 0,
+            "total_tokens": usage.get("total_tokens", 0) or 0,
+        }
+        key = (customer_id, model, self._today())
+        with self._lock:
+            for counters in (self._daily, self._pending_redis, self._pending_db):
+                row = counters.setdefault(key, dict.fromkeys(USAGE_FIELDS, 0))
+                for field, value in delta.items():
+                    row[field] += value
+            self._stats["recorded"] += 1
+
+    def get_daily_tokens(self, customer_id: str) -> int:
+        """客户当天所有模型的token用量"""
+        today = self._today()
+        with self._lock:
+            return sum(
+                row["total_tokens"] for (customer, _, day), row in self._daily.items()
+                if customer == customer_id and day == today
+            )
+
+    def check_quota(self, customer_id: str) -> bool:
+        """检查客户当天的token用量是否还在配额内"""
+        quota = self.customer_quotas.get(customer_id, self.daily_token_quota)
+        if not self.enabled or not quota:
+            return True
+        if self.get_daily_tokens(customer_id) < quota:
+            return True
+        self._stats["quota_rejections"] += 1
+        return False
+
+    def load_today(self) -> None:
+        """启动时从Redis恢复当天的累计用量，重启后配额仍然有效"""
+        today = self._today()
+        try:
+            client = redis_manager.get_client()
+            prefix = self._usage_key(today, "")
+            for key in client.scan_iter(match=f"{prefix}*", count=500):
+                customer_id = key[len(prefix):]
+                with self._lock:
+                    for name, value in client.hgetall(key).items():
+                        model, _, field = name.rpartition(":")
+                        if field not in USAGE_FIELDS:
+                            continue
+                        row = self._daily.setdefault((customer_id, model, today), dict.fromkeys(USAGE_FIELDS, 0))
+                        row[field] += int(value)
+        except Exception as e:
+            logger.error(f"[AI Plugin] Error loading today's usage from Redis: {e}")
+
+    def _take(self, pending: Dict) -> Dict:
+        with self._lock:
+            taken = dict(pending)
+            pending.clear()
+        return taken
+
+    def _restore(self, pending: Dict, taken: Dict) -> None:
+        """写入失败时把增量放回去，下次一起写"""
+        with self._lock:
+            for key, delta in taken.items():
+                row = pending.setdefault(key, dict.fromkeys(USAGE_FIELDS, 0))
+                for field, value in delta.items():
+                    row[field] += value
+
+    def flush_redis(self) -> None:
+        """把增量用一个管道写入Redis"""
+        taken = self._take(self._pending_redis)
+        if not taken:
+            return
+        try:
+            pipe = redis_manager.get_client().pipeline(transaction=False)
+            for (customer_id, model, day), delta in taken.items():
+                key = self._usage_key(day, customer_id)
+                for field, value in delta.items():
+                    if value:
+                        pipe.hincrby(key, f"{model}:{field}", value)
+                pipe.expire(key, self.redis_expire)
+            pipe.execute()
+            self._stats["redis_flushes"] += 1
+        except Exception as e:
+            self._stats["flush_errors"] += 1
+            self._restore(self._pending_redis, taken)
+            logger.error(f"[AI Plugin] Error flushing usage to Redis: {e}")
+
+    def flush_db(self) -> None:
+        """把增量用一条 INSERT ... ON DUPLICATE KEY UPDATE 语句批量写入MySQL"""
+        taken = self._take(self._pending_db)
+        if not taken:
+            return
+        now = datetime.now()
+        rows = [
+            {"customer_id": customer_id, "model": model, "usage_date": date.fromisoformat(day),
+             "update_time": now, **delta}
+            for (customer_id, model, day), delta in taken.items()
+        ]
+        stmt = insert(AIUsage).values(rows)
+        stmt = stmt.on_duplicate_key_update(
+            update_time=stmt.inserted.update_time,
+            **{field: getattr(AIUsage, field) + getattr(stmt.inserted, field) for field in USAGE_FIELDS}
+        )
+        session = db_manager.get_session()
+        try:
+            session.execute(stmt)
+            session.commit()
+            self._stats["db_flushes"] += 1
+            self._stats["db_rows_flushed"] += len(rows)
+        except Exception as e:
+            session.rollback()
+            self._stats["flush_errors"] += 1
+            self._restore(self._pending_db, taken)
+            logger.error(f"[AI Plugin] Error flushing usage to MySQL: {e}")
+        finally:
+            db_manager.close_session(session)
+
+    def _prune_daily(self) -> None:
+        """丢弃前几天的内存计数"""
+        today = self._today()
+        with self._lock:
+            for key in [key for key in self._daily if key[2] != today]:
+                del self._daily[key]
+
+    def _flush_loop(self) -> None:
+        while not self._stop.wait(self.redis_flush_interval):
+            try:
+                self.flush_redis()
+                if time.monotonic() - self._last_db_flush >= self.db_flush_interval:
+                    self._last_db_flush = time.monotonic()
+                    self.flush_db()
+                    self._prune_daily()
+            except Exception as e:
+                logger.error_with_trace(f"[AI Plugin] Usage flush error: {e}")
+
+    def start(self) -> None:
+        """启动后台写入线程"""
+        if not self.enabled or (self._flusher and self._flusher.is_alive()):
+            return
+        self.load_today()
+        self._flusher = threading.Thread(target=self._flush_loop, name="AIUsageFlusher", daemon=True)
+        self._flusher.start()
+
+    def close(self) -> None:
+        """停止后台线程并写入剩余的增量"""
+        self._stop.set()
+        if self._flusher:
+            self._flusher.join(timeout=5)
+        self.flush_redis()
+        self.flush_db()
+
+    def get_stats(self) -> Dict:
+        """获取写入统计和待写入的行数"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["pending_redis_rows"] = len(self._pending_redis)
+            stats["pending_db_rows"] = len(self._pending_db)
+        return stats
@@ -1,7 +1,21 @@
-from typing import Dict, Optional
-from bot.context import Context
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+from bot.context import Context, ContextSnapshot, ContextType
 from bot.message import Message
 
+SCOPE_ALL = "all"
+SCOPE_GROUP = "group"
+SCOPE_PRIVATE = "private"
+
+
+@dataclass(frozen=True)
+class Trigger:
+    """插件的触发条件，机器人据此在调用 process 之前跳过不可能处理该消息的插件"""
+    prefixes: Tuple[str, ...] = ()  # 消息内容以其中之一开头时触发，为空表示不限内容
+    types: Optional[Tuple[ContextType, ...]] = None  # 消息类型，None表示所有类型
+    scope: str = SCOPE_ALL  # all / group / private
+
+
 class Plugin:
     def __init__(self, config: Dict = None):
         self.config = config or {}
@@ -11,10 +25,45 @@ class Plugin:
         """Set robot instance for the plugin"""
         self.robot = robot
     
+    def get_triggers(self) -> Optional[List[Trigger]]:
+        """声明插件的触发条件，满足任意一个时才会调用 process
+
+        返回None表示处理所有消息（默认）。
+        """
+        return None
+
+    async def close(self):
+        """释放插件持有的资源（如长连接），程序退出时调用"""
+        pass
+
     async def process(self, context: Context) -> Optional[Context]:
         """
         处理上下文
         返回None: 终止处理链
         返回Context: 继续处理链
         """
-        raise NotImplementedError
\ No newline at end of file
+        raise NotImplementedError
+
+
+class ObserverPlugin(Plugin):
+    """观察者插件
+
+    只做通知、记录之类的旁路操作，不影响回复。处理链到达观察者插件（按优先级，
+    即前面的过滤插件都放行之后）时，机器人把上下文的只读快照交给 observe 在后台并发执行，
+    然后照常调用 process，观察者的耗时不计入回复路径。
+    需要回复的命令仍然可以在 process 中处理。
+    """
+
+    def should_observe(self, context: Context) -> bool:
+        """是否需要观察这条消息，在处理链中同步调用，返回False时不创建快照和后台任务
+
+        只能做内存中的快速检查，不能访问 Redis、数据库等。
+        """
+        return True
+
+    async def observe(self, snapshot: ContextSnapshot) -> None:
+        """在后台处理消息快照，不能修改上下文"""
+        raise NotImplementedError
+
+    async def process(self, context: Context) -> Optional[Context]:
+        return context
@@ -1,22 +1,23 @@
+import asyncio
 from datetime import datetime
-from typing import Optional
+from typing import Optional, List
 import re
+from sqlalchemy.exc import IntegrityError
 from bot.context import Context, ProcessState
-from plugins.base import Plugin
+from plugins.base import Plugin, Trigger
 from common.log import logger
 from common.database_manager import db_manager
-from common.redis_manager import redis_manager
+from common.event_bus import EventBus
 from common.models import CustomBindKey, WxUser, WxGroup
 from common.cache_manager import CacheManager
-from plugins.user_group_validator.user_group_validator_plugin import UserGroupValidatorPlugin
+from common.bindings import BIND_TYPE_USER, BIND_TYPE_GROUP
 
 class BindPlugin(Plugin):
     """绑定插件"""
     
-    GROUP_CACHE_KEY_PREFIX = "gewe-auth:group:"
-    USER_CACHE_KEY_PREFIX = "gewe-auth:user:"
-    CACHE_EXPIRE = 1800  # 30分钟过期
-    
+    def get_triggers(self) -> Optional[List[Trigger]]:
+        return [Trigger(prefixes=('/bind',))]
+
     async def process(self, context: Context) -> Optional[Context]:
         if not context.content.startswith('/bind'):
             context.process_state = ProcessState.CONTINUE
@@ -28,105 +29,86 @@ class BindPlugin(Plugin):
             context.process_state = ProcessState.FINISHED_WITH_DEFAULT
             return context
 
-        session = db_manager.get_session()
-        redis_client = redis_manager.get_client()
-        
-        try:
-            # 检查是否已经绑定
-            if context.is_group:
-                existing = session.query(WxGroup).filter_by(
-                    wx_group_id=context.msg.room_id
-                ).first()
-                
-                if existing:
-                    group_name = await CacheManager.get_group_name(context.msg.room_id)
-                    display_name = group_name or context.msg.room_id
-                    context.rtn_content = f"群组 {display_name} 已经绑定，无需重复绑定"
-                    context.process_state = ProcessState.FINISHED_WITH_DEFAULT
-                    return context
-            else:
-                existing = session.query(WxUser).filter_by(
-                    wx_user_id=context.msg.sender_id
-                ).first()
-                
-                if existing:
-                    display_name = context.msg.sender_nickname or context.msg.sender_id
-                    context.rtn_content = f"用户 {display_name} 已经绑定，无需重复绑定"
-                    context.process_state = ProcessState.FINISHED_WITH_DEFAULT
-                    return context
-
-            # 验证绑定key
-            bind_key = match.group(1)
-            key_record = session.query(CustomBindKey).filter_by(
-                bind_key=bind_key,
-                status=0
-            ).first()
-
-            if not key_record:
-                context.rtn_content = "无效的绑定key或该key已被使用"
-                context.process_state = ProcessState.FINISHED_WITH_DEFAULT
-                return context
+        bind_key = match.group(1)
+        if context.is_group:
+            bind_type = BIND_TYPE_GROUP
+            bind_id = context.msg.room_id
+            # 群名在事务之外获取，避免持有行锁时等待网络
+            bind_name = await CacheManager.get_group_name(bind_id)
+            display_name = bind_name or bind_id
+        else:
+            bind_type = BIND_TYPE_USER
+            bind_id = context.msg.sender_id
+            bind_name = context.msg.sender_nickname or context.msg.sender_id
+            display_name = bind_name
+        target = "群组" if context.is_group else "用户"
 
-            key_record.status = 1
-            key_record.bind_time = datetime.now()
-
-            if context.is_group:
-                group_name = await CacheManager.get_group_name(context.msg.room_id)
-                logger.info(f"Binding group: id={context.msg.room_id}, name={group_name}")
-                
-                group = WxGroup(
-                    wx_group_id=context.msg.room_id,
-                    wx_group_name=group_name,
-                    customer_id=key_record.customer_id
-                )
-                session.add(group)
-                
-                key_record.bind_type = 2
-                key_record.bind_id = context.msg.room_id
-                
-                # 更新权限缓存
-                cache_key = f"{self.GROUP_CACHE_KEY_PREFIX}{context.msg.room_id}"
-                redis_client.setex(cache_key, self.CACHE_EXPIRE, "1")
-                
-                display_name = group_name or context.msg.room_id
-                context.rtn_content = (
-                    f"群组 {display_name} 绑定成功！\n"
-                    f"客户ID: {key_record.customer_id}\n"
-                    "现在可以开始使用机器人服务了"
-                )
-            else:
-                wx_username = context.msg.sender_nickname or context.msg.sender_id
-                user = WxUser(
-                    wx_user_id=context.msg.sender_id,
-                    wx_username=wx_username,
-                    customer_id=key_record.customer_id
-                )
-                session.add(user)
-                
-                key_record.bind_type = 1
-                key_record.bind_id = context.msg.sender_id
-                
-                # 更新权限缓存
-                cache_key = f"{self.USER_CACHE_KEY_PREFIX}{context.msg.sender_id}"
-                redis_client.setex(cache_key, self.CACHE_EXPIRE, "1")
-                
-                context.rtn_content = (
-                    f"用户 {wx_username} 绑定成功！\n"
-                    f"客户ID: {key_record.customer_id}\n"
-                    "现在可以开始使用机器人服务了"
-                )
-
-            session.commit()
-            logger.info(f"Bind successful for key {bind_key}")
+        try:
+            # 数据库事务在线程池中执行，不阻塞事件循环
+            customer_id = await asyncio.to_thread(self._consume_key, bind_key, bind_type, bind_id, bind_name)
+        except IntegrityError:
+            # 唯一约束冲突：已经绑定过，事务回滚后key保持未使用
+            context.rtn_content = f"{target} {display_name} 已经绑定，无需重复绑定"
             context.process_state = ProcessState.FINISHED_WITH_DEFAULT
             return context
-
         except Exception as e:
-            session.rollback()
             logger.error_with_trace(f"Error in bind process: {str(e)}")
             context.rtn_content = "绑定过程中发生错误，请稍后重试"
             context.process_state = ProcessState.FINISHED_WITH_DEFAULT
             return context
-            
+
+        if customer_id is None:
+            context.rtn_content = "无效的绑定key或该key已被使用"
+            context.process_state = ProcessState.FINISHED_WITH_DEFAULT
+            return context
+
+        logger.info(f"Bind successful for key {bind_key}: {target} {bind_id} -> {customer_id}")
+        # 提交成功后再更新权限缓存等
+        EventBus.publish("binding_created", is_group=context.is_group, chat_id=bind_id, customer_id=customer_id)
+
+        context.rtn_content = (
+            f"{target} {display_name} 绑定成功！\n"
+            f"客户ID: {customer_id}\n"
+            "现在可以开始使用机器人服务了"
+        )
+        context.process_state = ProcessState.FINISHED_WITH_DEFAULT
+        return context
+
+    @staticmethod
+    def _consume_key(bind_key: str, bind_type: int, bind_id: str, bind_name: Optional[str]) -> Optional[str]:
+        """在一个短事务中消费绑定key并写入绑定，返回客户ID，key无效或已被使用时返回None
+
+        key 用一条带 status=0 条件的 UPDATE 占用，并发的请求只有一个能更新成功；
+        是否已经绑定由 wxuser / wxgroup 的唯一约束判断，冲突时抛出 IntegrityError，
+        回滚后key恢复为未使用。
+        """
+        session = db_manager.get_session()
+        try:
+            updated = session.query(CustomBindKey).filter(
+                CustomBindKey.bind_key == bind_key,
+                CustomBindKey.status == 0
+            ).update({
+                CustomBindKey.status: 1,
+                CustomBindKey.bind_time: datetime.now(),
+                CustomBindKey.bind_type: bind_type,
+                CustomBindKey.bind_id: bind_id,
+            }, synchronize_session=False)
+            if not updated:
+                session.rollback()
+                return None
+
+            # 该行已被本事务锁定，读取客户ID
+            customer_id = session.query(CustomBindKey.customer_id).filter(
+                CustomBindKey.bind_key == bind_key
+            ).scalar()
+            if bind_type == BIND_TYPE_GROUP:
+                session.add(WxGroup(wx_group_id=bind_id, wx_group_name=bind_name, customer_id=customer_id))
+            else:
+                session.add(WxUser(wx_user_id=bind_id, wx_username=bind_name, customer_id=customer_id))
+            session.commit()
+            return customer_id
+        except Exception:
+            session.rollback()
+            raise
         finally:
-            db_manager.close_session(session)
\ No newline at end of file
+            db_manager.close_session(session)
@@ -0,0 +1,4 @@
+from .faq_plugin import FAQPlugin
+from .config import DEFAULT_CONFIG
+
+__all__ = ['FAQPlugin', 'DEFAULT_CONFIG']
@@ -0,0 +1,17 @@
+"""
+FAQ Plugin 默认配置
+"""
+
+DEFAULT_CONFIG = {
+    "faq_file": "plugins/faq/faq.yaml",  # FAQ问答文件，相对项目根目录
+    "index_dir": "data/faq_index",  # 向量索引目录，不要放在媒体存储目录（MEDIA_DIR）下
+    "threshold": 0.75,  # 余弦相似度达到该值才直接回答
+    "require_activation": True,  # 只回答带激活词的问题（与AI插件相同）
+    "activation_prefixes": ["ai!", "小福"],
+    "batch_size": 256,  # 重建索引时每批计算的问题数
+    "embedder": {
+        "type": "hashing",  # hashing / tfidf / "模块路径:类名"
+        "dim": 4096,  # hashing 向量维度
+        "ngram_range": [1, 2]  # 字符n-gram范围
+    }
+}
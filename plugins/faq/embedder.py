@@ -0,0 +1,145 @@
+import re
+import math
+import zlib
+import importlib
+import unicodedata
+from collections import Counter
+from typing import Dict, List
+import numpy as np
+
+# 去掉空白和标点，只保留文字和数字
+NON_WORD = re.compile(r'[\W_]+', re.UNICODE)
+
+
+def tokenize(text: str, ngram_range=(1, 2)) -> List[str]:
+    """把文本切成字符n-gram，中文不需要分词也能得到稳定的特征"""
+    text = NON_WORD.sub(" ", unicodedata.normalize("NFKC", text).lower()).strip()
+    grams = []
+    for chunk in text.split():
+        for n in range(ngram_range[0], ngram_range[1] + 1):
+            grams.extend(chunk[i:i + n] for i in range(len(chunk) - n + 1))
+    return grams
+
+
+def _normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+class Embedder:
+    """文本向量化接口，输出L2归一化后的向量，点积即余弦相似度"""
+
+    name = "base"
+
+    def __init__(self, config: Dict = None):
+        self.config = config or {}
+        self.ngram_range = tuple(self.config.get("ngram_range", (1, 2)))
+
+    @property
+    def dim(self) -> int:
+        raise NotImplementedError
+
+    def fit(self, texts: List[str]) -> None:
+        """根据语料训练，无需训练的实现可以忽略"""
+
+    def embed_batch(self, texts: List[str]) -> np.ndarray:
+        raise NotImplementedError
+
+    def embed(self, text: str) -> np.ndarray:
+        return self.embed_batch([text])[0]
+
+    def get_state(self) -> Dict:
+        """训练得到的状态，随索引一起保存"""
+        return {}
+
+    def load_state(self, state: Dict) -> None:
+        pass
+
+
+class HashingEmbedder(Embedder):
+    """特征哈希：n-gram 经 crc32 映射到固定维度，不需要训练"""
+
+    name = "hashing"
+
+    def __init__(self, config: Dict = None):
+        super().__init__(config)
+        self._dim = self.config.get("dim", 4096)
+
+    @property
+    def dim(self) -> int:
+        return self._dim
+
+    def embed_batch(self, texts: List[str]) -> np.ndarray:
+        matrix = np.zeros((len(texts), self._dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for gram, count in Counter(tokenize(text, self.ngram_range)).items():
+                hashed = zlib.crc32(gram.encode("utf-8"))
+                sign = 1.0 if hashed & 0x80000000 else -1.0
+                matrix[row, hashed % self._dim] += sign * (1.0 + math.log(count))
+        return _normalize_rows(matrix)
+
+
+class TfidfEmbedder(Embedder):
+    """TF-IDF：按FAQ问题训练词表和idf，常见的字词权重更低"""
+
+    name = "tfidf"
+
+    def __init__(self, config: Dict = None):
+        super().__init__(config)
+        self.max_features = self.config.get("max_features", 20000)
+        self.vocabulary: Dict[str, int] = {}
+        self.idf = np.zeros(0, dtype=np.float32)
+
+    @property
+    def dim(self) -> int:
+        return len(self.vocabulary)
+
+    def fit(self, texts: List[str]) -> None:
+        doc_freq = Counter()
+        for text in texts:
+            doc_freq.update(set(tokenize(text, self.ngram_range)))
+        grams = [gram for gram, _ in doc_freq.most_common(self.max_features)]
+        self.vocabulary = {gram: index for index, gram in enumerate(grams)}
+        total = len(texts)
+        self.idf = np.array(
+            [math.log((1 + total) / (1 + doc_freq[gram])) + 1.0 for gram in grams], dtype=np.float32
+        )
+
+    def embed_batch(self, texts: List[str]) -> np.ndarray:
+        matrix = np.zeros((len(texts), max(self.dim, 1)), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for gram, count in Counter(tokenize(text, self.ngram_range)).items():
+                index = self.vocabulary.get(gram)
+                if index is not None:
+                    matrix[row, index] = (1.0 + math.log(count)) * self.idf[index]
+        return _normalize_rows(matrix)
+
+    def get_state(self) -> Dict:
+        return {"vocabulary": self.vocabulary, "idf": self.idf.tolist()}
+
+    def load_state(self, state: Dict) -> None:
+        self.vocabulary = state.get("vocabulary", {})
+        self.idf = np.array(state.get("idf", []), dtype=np.float32)
+
+
+EMBEDDERS = {
+    HashingEmbedder.name: HashingEmbedder,
+    TfidfEmbedder.name: TfidfEmbedder,
+}
+
+
+def create_embedder(config: Dict = None) -> Embedder:
+    """按配置创建向量化实现
+
+    type 可以是内置的 hashing / tfidf，也可以是 "模块路径:类名" 形式的自定义实现，
+    例如接入本地的句向量模型。
+    """
+    config = config or {}
+    embedder_type = config.get("type", HashingEmbedder.name)
+    if embedder_type in EMBEDDERS:
+        return EMBEDDERS[embedder_type](config)
+
+    module_name, _, class_name = embedder_type.partition(":")
+    embedder_class = getattr(importlib.import_module(module_name), class_name)
+    return embedder_class(config)
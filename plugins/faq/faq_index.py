@@ -0,0 +1,115 @@
+import os
+import json
+import uuid
+import threading
+from typing import Callable, Dict, List, Optional, Tuple
+import numpy as np
+from common.log import logger
+from plugins.faq.embedder import Embedder
+
+
+class FAQIndex:
+    """FAQ向量索引
+
+    每个问题（包括同一条FAQ的多种问法）占矩阵的一行，向量矩阵保存为 .npy 文件，
+    启动时以内存映射方式打开，不需要重新计算向量。每次重建写入一个新文件名的向量文件，
+    由 meta.json 指向它，不会覆盖仍被映射的旧文件（Windows 上无法替换已映射的文件）。
+    """
+
+    VECTORS_FILE = "vectors.npy"  # 旧版本索引的向量文件名
+    META_FILE = "meta.json"
+
+    def __init__(self, index_dir: str, embedder_factory: Callable[[], Embedder], batch_size: int = 256):
+        self.index_dir = index_dir
+        self.embedder_factory = embedder_factory
+        self.batch_size = batch_size
+        self._build_lock = threading.Lock()
+        # (向量化实现, 向量矩阵, 行对应的FAQ下标, FAQ列表)，重建时整体替换
+        self._state: Optional[Tuple[Embedder, np.ndarray, List[int], List[Dict]]] = None
+
+    @property
+    def size(self) -> int:
+        return len(self._state[2]) if self._state else 0
+
+    def load(self, fingerprint: str) -> bool:
+        """从磁盘加载索引，索引不存在或与FAQ内容不一致时返回False"""
+        meta_path = os.path.join(self.index_dir, self.META_FILE)
+        if not os.path.exists(meta_path):
+            return False
+
+        with open(meta_path, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        vectors_path = os.path.join(self.index_dir, meta.get("vectors_file", self.VECTORS_FILE))
+        if meta.get("fingerprint") != fingerprint or not os.path.exists(vectors_path):
+            return False
+
+        embedder = self.embedder_factory()
+        embedder.load_state(meta.get("embedder_state", {}))
+        try:
+            vectors = np.load(vectors_path, mmap_mode="r")
+        except FileNotFoundError:
+            # 其他进程刚重建索引并删除了旧文件
+            return False
+        self._state = (embedder, vectors, meta["rows"], meta["entries"])
+        logger.info(f"[FAQ Plugin] Loaded index with {len(meta['rows'])} questions from {self.index_dir}")
+        return True
+
+    def build(self, entries: List[Dict], fingerprint: str) -> int:
+        """批量计算所有问题的向量并写入磁盘，返回索引的问题数"""
+        questions = []
+        rows = []
+        for entry_index, entry in enumerate(entries):
+            for question in entry["questions"]:
+                questions.append(question)
+                rows.append(entry_index)
+
+        embedder = self.embedder_factory()
+        embedder.fit(questions)
+        vectors = np.zeros((len(questions), max(embedder.dim, 1)), dtype=np.float32)
+        for start in range(0, len(questions), self.batch_size):
+            batch = questions[start:start + self.batch_size]
+            vectors[start:start + len(batch)] = embedder.embed_batch(batch)
+
+        with self._build_lock:
+            # 向量写入新文件，写完后再替换 meta.json 指向它，已经映射旧文件的进程不受影响
+            os.makedirs(self.index_dir, exist_ok=True)
+            vectors_file = f"vectors-{uuid.uuid4().hex}.npy"
+            vectors_path = os.path.join(self.index_dir, vectors_file)
+            meta_path = os.path.join(self.index_dir, self.META_FILE)
+            with open(f"{vectors_path}.tmp", "wb") as f:
+                np.save(f, vectors)
+            os.replace(f"{vectors_path}.tmp", vectors_path)
+            with open(f"{meta_path}.tmp", "w", encoding="utf-8") as f:
+                json.dump({
+                    "fingerprint": fingerprint,
+                    "vectors_file": vectors_file,
+                    "rows": rows,
+                    "entries": entries,
+                    "embedder_state": embedder.get_state()
+                }, f, ensure_ascii=False)
+            os.replace(f"{meta_path}.tmp", meta_path)
+
+            self._state = (embedder, np.load(vectors_path, mmap_mode="r"), rows, entries)
+            self._remove_stale(vectors_file)
+        logger.info(f"[FAQ Plugin] Built index with {len(questions)} questions for {len(entries)} entries")
+        return len(questions)
+
+    def _remove_stale(self, current: str) -> None:
+        """删除旧的向量文件，仍被映射而无法删除的（Windows）留到下次重建时再删"""
+        for name in os.listdir(self.index_dir):
+            if name == current or not (name.startswith("vectors") and name.endswith(".npy")):
+                continue
+            try:
+                os.remove(os.path.join(self.index_dir, name))
+            except OSError as e:
+                logger.debug(f"[FAQ Plugin] Could not remove old index file {name}: {e}")
+
+    def search(self, text: str) -> Optional[Tuple[float, Dict]]:
+        """返回与问题最相似的FAQ及其余弦相似度"""
+        state = self._state
+        if not state or not state[2]:
+            return None
+        embedder, vectors, rows, entries = state
+        scores = vectors @ embedder.embed(text)
+        best = int(np.argmax(scores))
+        return float(scores[best]), entries[rows[best]]
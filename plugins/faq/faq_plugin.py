@@ -0,0 +1,137 @@
+import os
+import json
+import time
+import hashlib
+from typing import Dict, List, Optional
+import yaml
+from bot.context import Context, ContextType, ProcessState
+from plugins.base import Plugin, Trigger
+from common.log import logger
+from common.event_bus import EventBus
+from common.metrics import metrics
+from plugins.faq.embedder import create_embedder
+from plugins.faq.faq_index import FAQIndex
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class FAQPlugin(Plugin):
+    """FAQ插件 - 在调用AI之前用本地向量索引回答常见问题"""
+
+    def __init__(self, config: Dict = None):
+        super().__init__(config)
+        self.faq_file = self._resolve_path(self.config.get("faq_file", "plugins/faq/faq.yaml"))
+        self.index = FAQIndex(
+            self._resolve_path(self.config.get("index_dir", "data/faq_index")),
+            lambda: create_embedder(self.config.get("embedder", {})),
+            self.config.get("batch_size", 256)
+        )
+        self._stats = {
+            "lookups": 0,
+            "hits": 0,
+            "search_seconds_total": 0.0,
+            "reindexed": 0,
+        }
+
+        try:
+            entries = self._load_entries()
+            if not self.index.load(self._fingerprint(entries)):
+                self._build(entries)
+        except Exception as e:
+            logger.error(f"[FAQ Plugin] Error loading FAQ index: {e}")
+
+        EventBus.subscribe("faq_reindex", self.reindex)
+        metrics.register("faq", self.get_stats)
+
+    def get_triggers(self) -> Optional[List[Trigger]]:
+        """要求激活词时只处理以激活词开头的文本消息"""
+        if self.config.get("require_activation", True):
+            return [Trigger(
+                prefixes=tuple(self.config.get("activation_prefixes", ["ai!", "小福"])),
+                types=(ContextType.TEXT,)
+            )]
+        return [Trigger(types=(ContextType.TEXT,))]
+
+    @staticmethod
+    def _resolve_path(path: str) -> str:
+        return path if os.path.isabs(path) else os.path.join(PROJECT_ROOT, path)
+
+    def _load_entries(self) -> List[Dict]:
+        """读取FAQ文件，每条包含 questions（一个或多个问法）和 answer"""
+        if not os.path.exists(self.faq_file):
+            logger.warning(f"[FAQ Plugin] FAQ file not found: {self.faq_file}")
+            return []
+        with open(self.faq_file, "r", encoding="utf-8") as f:
+            raw_entries = yaml.safe_load(f) or []
+
+        entries = []
+        for raw in raw_entries:
+            questions = raw.get("questions") or [raw.get("question")]
+            questions = [q for q in questions if q]
+            if questions and raw.get("answer"):
+                entries.append({"questions": questions, "answer": raw["answer"]})
+        return entries
+
+    def _fingerprint(self, entries: List[Dict]) -> str:
+        """FAQ内容和向量化配置的指纹，变化后需要重建索引"""
+        raw = json.dumps([entries, self.config.get("embedder", {})], ensure_ascii=False, sort_keys=True)
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def _build(self, entries: List[Dict]) -> int:
+        count = self.index.build(entries, self._fingerprint(entries))
+        self._stats["reindexed"] += 1
+        return count
+
+    def reindex(self) -> int:
+        """重新读取FAQ文件并重建索引，返回索引的问题数"""
+        return self._build(self._load_entries())
+
+    def _extract_query(self, content: str) -> Optional[str]:
+        """提取问题文本，要求激活词时没有激活词返回None"""
+        if not self.config.get("require_activation", True):
+            return content.strip()
+        for prefix in self.config.get("activation_prefixes", ["ai!", "小福"]):
+            if content.startswith(prefix):
+                return content[len(prefix):].strip()
+        return None
+
+    async def process(self, context: Context) -> Optional[Context]:
+        """处理上下文"""
+        if context.type != ContextType.TEXT or not isinstance(context.content, str):
+            return context
+
+        query = self._extract_query(context.content)
+        # 指定了模型的问题交给AI插件
+        if not query or query.startswith("model:"):
+            return context
+
+        start_time = time.perf_counter()
+        match = self.index.search(query)
+        self._stats["lookups"] += 1
+        self._stats["search_seconds_total"] += time.perf_counter() - start_time
+        if not match:
+            return context
+
+        score, entry = match
+        if score < self.config.get("threshold", 0.75):
+            logger.debug(f"[FAQ Plugin] Best match score {score:.3f} below threshold")
+            return context
+
+        self._stats["hits"] += 1
+        logger.info(f"[FAQ Plugin] Answered from FAQ (score {score:.3f}): {entry['questions'][0]}")
+        context.data["faq_score"] = score
+        context.rtn_content = entry["answer"]
+        context.process_state = ProcessState.FINISHED_WITH_DEFAULT
+        return context
+
+    def get_stats(self) -> Dict:
+        """获取FAQ命中率和平均检索耗时"""
+        lookups = self._stats["lookups"]
+        return {
+            "questions": self.index.size,
+            "lookups": lookups,
+            "hits": self._stats["hits"],
+            "hit_ratio": round(self._stats["hits"] / lookups, 4) if lookups else 0.0,
+            "avg_search_ms": round(self._stats["search_seconds_total"] / lookups * 1000, 3) if lookups else 0.0,
+            "reindexed": self._stats["reindexed"],
+        }
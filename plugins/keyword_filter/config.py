@@ -1,4 +1,7 @@
 DEFAULT_CONFIG = {
-    "keywords": ["你好", "帮助"],
-    "reply_template": "检测到关键词「{keyword}」"  # 可以自定义回复模板
-}
\ No newline at end of file
+    "keywords": ["你好", "帮助"],  # 字符串，或包含 keyword/reply/priority/regex/whole_word 的字典
+    "reply_template": "检测到关键词「{keyword}」",  # 可以自定义回复模板
+    "ignore_case": False,  # 是否忽略大小写
+    "database_rules": True,  # 是否启用数据库中按群组/客户配置的规则集
+    "rule_refresh_interval": 60  # 规则集刷新间隔（秒），收到更新事件时立即刷新
+}
@@ -1,27 +1,99 @@
-from typing import Optional
+import time
+from typing import Dict, Optional
 from bot.context import Context, ProcessState
 from plugins.base import Plugin
 from common.log import logger
+from common.event_bus import EventBus
+from common.metrics import metrics
+from plugins.keyword_filter.matcher import KeywordMatcher
+from plugins.keyword_filter.rule_sets import RuleSetStore
 
 class KeywordFilterPlugin(Plugin):
     """关键词过滤插件"""
-    
+
+    def __init__(self, config: Dict = None):
+        super().__init__(config)
+        self._stats = {
+            "messages": 0,
+            "matched": 0,
+            "match_seconds_total": 0.0,
+        }
+        self.matcher = self._compile()
+        metrics.register("keyword_filter", self.get_stats)
+
+        # 数据库中按群组/客户配置的规则集
+        self.rule_sets: Optional[RuleSetStore] = None
+        if self.config.get("database_rules", True):
+            self.rule_sets = RuleSetStore(
+                self.config.get("ignore_case", False),
+                self.config.get("rule_refresh_interval", 60)
+            )
+            EventBus.subscribe("keyword_rules_updated", self.rule_sets.request_refresh)
+            # 新绑定的群组/用户需要刷新所属客户
+            EventBus.subscribe("binding_created", self.rule_sets.request_refresh)
+            EventBus.subscribe("bindings_imported", self.rule_sets.request_refresh)
+            metrics.register("keyword_rule_sets", self.rule_sets.get_stats)
+
+    def set_robot(self, robot):
+        super().set_robot(robot)
+        # 此时数据库已经初始化，开始加载规则集
+        if self.rule_sets:
+            self.rule_sets.start()
+
+    def _compile(self) -> KeywordMatcher:
+        """加载配置时把关键词编译成匹配器"""
+        start_time = time.perf_counter()
+        matcher = KeywordMatcher.from_config(
+            self.config.get("keywords", []),
+            self.config.get("ignore_case", False)
+        )
+        self._stats["build_seconds"] = round(time.perf_counter() - start_time, 4)
+        logger.info(f"[KeywordFilter] Compiled {matcher.rule_count} keyword rules")
+        return matcher
+
+    def _get_matcher(self, context: Context) -> KeywordMatcher:
+        """群组或客户有自己的规则集时使用规则集，否则使用配置文件中的关键词"""
+        if self.rule_sets:
+            matcher = self.rule_sets.get_matcher(context.is_group, context.receiver, context.sender)
+            if matcher is not None:
+                return matcher
+        return self.matcher
+
     async def process(self, context: Context) -> Optional[Context]:
-        keywords = self.config.get("keywords", [])
-        if not keywords:
+        matcher = self._get_matcher(context)
+        if not matcher.rule_count or not isinstance(context.content, str):
             return context
-            
-        for keyword in keywords:
-            if keyword in context.content:
-                context.data["matched_keyword"] = keyword
-                # 设置回复消息
-                reply_template = self.config.get("reply_template", "检测到关键词: {keyword}")
-                context.rtn_content = reply_template.format(keyword=keyword)
-                logger.info(f"Keyword matched: {keyword}")
-                # 终止处理链但执行默认回复
-                context.process_state = ProcessState.FINISHED_WITH_DEFAULT
-                return context
-                
+
+        start_time = time.perf_counter()
+        matches = matcher.find_all(context.content)
+        self._stats["messages"] += 1
+        self._stats["match_seconds_total"] += time.perf_counter() - start_time
+
+        if matches:
+            best = matches[0]
+            self._stats["matched"] += 1
+            context.data["matched_keyword"] = best.rule.keyword
+            context.data["matched_keywords"] = [match.rule.keyword for match in matches]
+            # 设置回复消息，规则自带回复时优先使用
+            reply_template = best.rule.reply or self.config.get("reply_template", "检测到关键词: {keyword}")
+            # 只替换 {keyword}，模板中的其他花括号原样保留
+            context.rtn_content = reply_template.replace("{keyword}", best.text)
+            logger.info(f"Keyword matched: {best.rule.keyword}")
+            # 终止处理链但执行默认回复
+            context.process_state = ProcessState.FINISHED_WITH_DEFAULT
+            return context
+
         logger.debug("No keyword matched, continuing processing chain")
         context.process_state = ProcessState.CONTINUE
         return context
+
+    def get_stats(self) -> Dict:
+        """获取关键词数量、编译耗时和平均匹配耗时"""
+        messages = self._stats["messages"]
+        return {
+            "rules": self.matcher.rule_count,
+            "build_seconds": self._stats["build_seconds"],
+            "messages": messages,
+            "matched": self._stats["matched"],
+            "avg_match_us": round(self._stats["match_seconds_total"] / messages * 1e6, 2) if messages else 0.0,
+        }
@@ -0,0 +1,171 @@
+import re
+from collections import deque
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Dict, Iterator, List, Optional, Tuple, Union
+
+
+@dataclass
+class MatchRule:
+    """一条关键词规则"""
+    keyword: str
+    reply: Optional[str] = None  # 为空时使用插件的 reply_template
+    priority: int = 100  # 数字越小优先级越高，相同时按配置顺序
+    regex: bool = False
+    whole_word: bool = False
+    order: int = 0
+
+    @classmethod
+    def from_config(cls, item: Union[str, Dict], order: int) -> "MatchRule":
+        """关键词配置可以是字符串，也可以是包含 keyword/reply/priority/regex/whole_word 的字典"""
+        if isinstance(item, str):
+            return cls(keyword=item, order=order)
+        return cls(
+            keyword=item["keyword"],
+            reply=item.get("reply"),
+            priority=item.get("priority", 100),
+            regex=item.get("regex", False),
+            whole_word=item.get("whole_word", False),
+            order=order
+        )
+
+
+@dataclass
+class KeywordMatch:
+    """一次命中"""
+    rule: MatchRule
+    start: int
+    end: int
+    text: str
+
+
+class AhoCorasick:
+    """Aho-Corasick 自动机，一次扫描找出文本中出现的所有关键词"""
+
+    def __init__(self, keywords: List[str]):
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._output: List[List[int]] = [[]]  # 在该状态结束的关键词下标（包含失败链上的）
+        self._lengths = [len(keyword) for keyword in keywords]
+
+        for index, keyword in enumerate(keywords):
+            node = 0
+            for char in keyword:
+                next_node = self._goto[node].get(char)
+                if next_node is None:
+                    next_node = len(self._goto)
+                    self._goto[node][char] = next_node
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._output.append([])
+                node = next_node
+            self._output[node].append(index)
+
+        # 按层次遍历计算失败指针，并把失败状态的输出合并进来
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for char, child in self._goto[node].items():
+                fail = self._fail[node]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[child] = self._goto[fail].get(char, 0)
+                if self._output[self._fail[child]]:
+                    self._output[child] = self._output[child] + self._output[self._fail[child]]
+                queue.append(child)
+
+    @property
+    def states(self) -> int:
+        return len(self._goto)
+
+    def iter_matches(self, text: str) -> Iterator[Tuple[int, int]]:
+        """依次返回 (关键词下标, 起始位置)"""
+        goto = self._goto
+        fail = self._fail
+        output = self._output
+        node = 0
+        for position, char in enumerate(text):
+            while node and char not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(char, 0)
+            for index in output[node]:
+                yield index, position - self._lengths[index] + 1
+
+
+@lru_cache(maxsize=4096)
+def _fold_char(char: str) -> str:
+    """单个字符的大小写折叠，结果不是一个字符时（如 ß -> ss）保持原样，保证折叠前后位置一致"""
+    folded = char.casefold()
+    if len(folded) == 1:
+        return folded
+    lowered = char.lower()
+    return lowered if len(lowered) == 1 else char
+
+
+def fold_case(text: str) -> str:
+    """忽略大小写匹配用的折叠，长度与原文相同，命中位置可以直接用于原文"""
+    if text.isascii():
+        return text.lower()
+    return "".join(map(_fold_char, text))
+
+
+def _is_word_char(char: str) -> bool:
+    # 只把ASCII字母数字当作单词字符，中文前后总是视为边界
+    return char.isascii() and (char.isalnum() or char == "_")
+
+
+class KeywordMatcher:
+    """把关键词规则编译成一个匹配器
+
+    普通关键词全部放进同一个 Aho-Corasick 自动机，耗时与关键词数量无关；
+    正则规则单独编译后逐条匹配。
+    """
+
+    def __init__(self, rules: List[MatchRule], ignore_case: bool = False):
+        self.ignore_case = ignore_case
+        self._literal_rules = [rule for rule in rules if not rule.regex and rule.keyword]
+        self._regex_rules = [
+            (rule, re.compile(rule.keyword, re.IGNORECASE if ignore_case else 0))
+            for rule in rules if rule.regex
+        ]
+        keywords = [self._fold(rule.keyword) for rule in self._literal_rules]
+        self._automaton = AhoCorasick(keywords) if keywords else None
+
+    @classmethod
+    def from_config(cls, keywords: List[Union[str, Dict]], ignore_case: bool = False) -> "KeywordMatcher":
+        return cls([MatchRule.from_config(item, order) for order, item in enumerate(keywords)], ignore_case)
+
+    @property
+    def rule_count(self) -> int:
+        return len(self._literal_rules) + len(self._regex_rules)
+
+    def _fold(self, text: str) -> str:
+        return fold_case(text) if self.ignore_case else text
+
+    def find_all(self, text: str) -> List[KeywordMatch]:
+        """返回所有命中，按优先级、配置顺序和出现位置排序"""
+        matches = []
+        if self._automaton:
+            folded = self._fold(text)
+            for index, start in self._automaton.iter_matches(folded):
+                rule = self._literal_rules[index]
+                end = start + len(rule.keyword)
+                if rule.whole_word and (
+                    (start > 0 and _is_word_char(text[start - 1]))
+                    or (end < len(text) and _is_word_char(text[end]))
+                ):
+                    continue
+                matches.append(KeywordMatch(rule, start, end, text[start:end]))
+
+        for rule, pattern in self._regex_rules:
+            found = pattern.search(text)
+            if found:
+                matches.append(KeywordMatch(rule, found.start(), found.end(), found.group(0)))
+
+        matches.sort(key=lambda match: (match.rule.priority, match.rule.order, match.start))
+        return matches
+
+    def first(self, text: str) -> Optional[KeywordMatch]:
+        """返回优先级最高的命中"""
+        matches = self.find_all(text)
+        return matches[0] if matches else None
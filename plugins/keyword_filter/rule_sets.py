@@ -0,0 +1,166 @@
+import threading
+from typing import Dict, List, Optional, Tuple
+from common.log import logger
+from common.database_manager import db_manager
+from common.models import KeywordRule, KeywordRuleSet, WxGroup, WxUser
+from plugins.keyword_filter.matcher import KeywordMatcher, MatchRule
+
+SCOPE_GROUP = 1
+SCOPE_CUSTOMER = 2
+
+
+class RuleSetStore:
+    """数据库中的关键词规则集
+
+    规则集按群组或客户ID生效，编译好的匹配器按 (规则集ID, 版本号) 缓存，
+    版本号不变的规则集刷新时不会重新编译。每次刷新生成一份新的快照整体替换，
+    消息处理时只做字典查找。某个规则集编译失败（如正则有误）时只跳过该规则集，
+    继续使用它上一次编译成功的匹配器。
+    """
+
+    def __init__(self, ignore_case: bool = False, refresh_interval: int = 60):
+        self.ignore_case = ignore_case
+        self.refresh_interval = refresh_interval
+        # (规则集ID, 版本号) -> 匹配器，编译失败且没有可用的旧版本时为None
+        self._compiled: Dict[Tuple[int, int], Optional[KeywordMatcher]] = {}
+        self._last_good: Dict[int, KeywordMatcher] = {}  # 规则集ID -> 最近一次编译成功的匹配器
+        # (群组ID -> 匹配器, 客户ID -> 匹配器, 群组ID -> 客户ID, 用户ID -> 客户ID)
+        self._snapshot: Tuple[Dict, Dict, Dict, Dict] = ({}, {}, {}, {})
+        self._refresh_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._worker: Optional[threading.Thread] = None
+        self._stats = {
+            "refreshes": 0,
+            "compiled": 0,  # 因版本变化重新编译的规则集数
+            "compile_errors": 0,
+            "refresh_errors": 0,
+        }
+
+    def get_matcher(self, is_group: bool, chat_id: str, sender: Optional[str] = None) -> Optional[KeywordMatcher]:
+        """查找会话适用的匹配器：群组规则集优先，其次是客户规则集"""
+        group_matchers, customer_matchers, group_customers, user_customers = self._snapshot
+        if is_group:
+            matcher = group_matchers.get(chat_id)
+            if matcher is not None:
+                return matcher
+            customer_id = group_customers.get(chat_id)
+        else:
+            customer_id = user_customers.get(sender or chat_id)
+        return customer_matchers.get(customer_id) if customer_id else None
+
+    def _compile(self, rules: List[KeywordRule]) -> KeywordMatcher:
+        return KeywordMatcher([
+            MatchRule(
+                keyword=rule.keyword,
+                reply=rule.reply,
+                priority=rule.priority if rule.priority is not None else 100,
+                regex=bool(rule.is_regex),
+                whole_word=bool(rule.whole_word),
+                order=order
+            )
+            for order, rule in enumerate(rules)
+        ], self.ignore_case)
+
+    def _compile_rule_set(self, rule_set: KeywordRuleSet, rules: List[KeywordRule]) -> Optional[KeywordMatcher]:
+        """编译一个规则集，失败时记录日志并返回该规则集上一次编译成功的匹配器
+
+        失败的结果同样按 (规则集ID, 版本号) 缓存，版本号变化前不再重试。
+        """
+        try:
+            matcher = self._compile(rules)
+        except Exception as e:
+            self._stats["compile_errors"] += 1
+            logger.error(
+                f"[KeywordFilter] Error compiling keyword rule set {rule_set.id} version {rule_set.version}, "
+                f"keeping previous version: {e}"
+            )
+            return self._last_good.get(rule_set.id)
+        self._last_good[rule_set.id] = matcher
+        self._stats["compiled"] += 1
+        return matcher
+
+    def refresh(self) -> None:
+        """从数据库重新加载规则集，只编译版本号变化的规则集"""
+        with self._refresh_lock:
+            session = db_manager.get_session()
+            try:
+                rule_sets = session.query(KeywordRuleSet).filter_by(status=1).all()
+                changed_ids = {
+                    rule_set.id for rule_set in rule_sets
+                    if (rule_set.id, rule_set.version) not in self._compiled
+                }
+
+                compiled = {
+                    (rule_set.id, rule_set.version): self._compiled[(rule_set.id, rule_set.version)]
+                    for rule_set in rule_sets if rule_set.id not in changed_ids
+                }
+                if changed_ids:
+                    rules_by_set: Dict[int, List[KeywordRule]] = {rule_set_id: [] for rule_set_id in changed_ids}
+                    rules = session.query(KeywordRule).filter(
+                        KeywordRule.rule_set_id.in_(list(changed_ids)), KeywordRule.status == 1
+                    ).order_by(KeywordRule.rule_set_id, KeywordRule.id).all()
+                    for rule in rules:
+                        rules_by_set[rule.rule_set_id].append(rule)
+                    for rule_set in rule_sets:
+                        if rule_set.id in rules_by_set:
+                            compiled[(rule_set.id, rule_set.version)] = self._compile_rule_set(
+                                rule_set, rules_by_set[rule_set.id]
+                            )
+
+                group_matchers = {}
+                customer_matchers = {}
+                for rule_set in rule_sets:
+                    matcher = compiled[(rule_set.id, rule_set.version)]
+                    if matcher is None:
+                        continue
+                    if rule_set.scope_type == SCOPE_GROUP:
+                        group_matchers[rule_set.scope_id] = matcher
+                    elif rule_set.scope_type == SCOPE_CUSTOMER:
+                        customer_matchers[rule_set.scope_id] = matcher
+
+                group_customers = dict(
+                    session.query(WxGroup.wx_group_id, WxGroup.customer_id).filter(WxGroup.customer_id.isnot(None)).all()
+                )
+                user_customers = dict(
+                    session.query(WxUser.wx_user_id, WxUser.customer_id).filter(WxUser.customer_id.isnot(None)).all()
+                )
+
+                # 整体替换，处理中的消息要么用旧快照要么用新快照
+                self._compiled = compiled
+                self._last_good = {
+                    rule_set_id: matcher for rule_set_id, matcher in self._last_good.items()
+                    if rule_set_id in {rule_set.id for rule_set in rule_sets}
+                }
+                self._snapshot = (group_matchers, customer_matchers, group_customers, user_customers)
+                self._stats["refreshes"] += 1
+                if changed_ids:
+                    logger.info(f"[KeywordFilter] Compiled {len(changed_ids)} keyword rule sets from database")
+            except Exception as e:
+                self._stats["refresh_errors"] += 1
+                logger.error(f"[KeywordFilter] Error loading keyword rule sets: {e}")
+            finally:
+                db_manager.close_session(session)
+
+    def request_refresh(self, *args, **kwargs) -> None:
+        """通知后台线程立即刷新，用作更新事件的回调"""
+        self._wakeup.set()
+
+    def _refresh_loop(self) -> None:
+        while True:
+            self.refresh()
+            self._wakeup.wait(self.refresh_interval)
+            self._wakeup.clear()
+
+    def start(self) -> None:
+        """启动后台刷新线程"""
+        if self._worker and self._worker.is_alive():
+            return
+        self._worker = threading.Thread(target=self._refresh_loop, name="KeywordRuleRefresher", daemon=True)
+        self._worker.start()
+
+    def get_stats(self) -> Dict:
+        group_matchers, customer_matchers, _, _ = self._snapshot
+        stats = dict(self._stats)
+        stats["group_rule_sets"] = len(group_matchers)
+        stats["customer_rule_sets"] = len(customer_matchers)
+        return stats
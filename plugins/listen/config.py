@@ -2,11 +2,13 @@ DEFAULT_CONFIG = {
     "listen_command": "/listen",
     "stop_listen_command": "/stop_listen",
     "listen_expire": 7200,  # 2小时过期
+    "notify_window": 60,  # 通知窗口（秒），每个监听用户每个群组在窗口内最多收到一条通知，0表示每条消息都通知
     "messages": {
         "start_success": "已开启群组监听模式，在群内发言时会收到群组信息。使用 /stop_listen 命令关闭监听模式。",
         "stop_success": "已关闭群组监听模式",
         "not_in_private": "请在私聊中使用此命令",
         "not_listening": "监听模式未开启",
-        "notification_template": "您在群组「{group_name}」中发言\n群组ID: {group_id}"
+        "notification_template": "您在群组「{group_name}」中发言\n群组ID: {group_id}",
+        "summary_template": "您在群组「{group_name}」中又发言了 {count} 条\n群组ID: {group_id}"
     }
 }
\ No newline at end of file
@@ -1,19 +1,44 @@
-from typing import Optional
-from bot.context import Context, ProcessState, ContextType
-from plugins.base import Plugin
+import asyncio
+from typing import Dict, Optional, List, Tuple
+from bot.context import Context, ContextSnapshot, ProcessState, ContextType
+from plugins.base import ObserverPlugin, Trigger, SCOPE_GROUP
 from common.log import logger
-from common.redis_manager import redis_manager
 from common.cache_manager import CacheManager
+from common.metrics import metrics
+from plugins.listen.registry import ListenRegistry, LISTEN_MODE_KEY_PREFIX
 
-class ListenPlugin(Plugin):
-    """群组监听插件"""
-    
-    LISTEN_MODE_KEY_PREFIX = "gewe-auth:listen_mode:"
+class ListenPlugin(ObserverPlugin):
+    """群组监听插件
+
+    开启/关闭监听的命令在处理链中回复；群消息的监听通知作为观察者在后台发送，不阻塞回复。
+    """
     
+    LISTEN_MODE_KEY_PREFIX = LISTEN_MODE_KEY_PREFIX
+
     def __init__(self, config=None, plugin_manager=None):
         super().__init__(config)
         self.plugin_manager = plugin_manager
-        
+        self.registry = ListenRegistry()
+        # (监听用户, 群组ID) -> 当前通知窗口内未通知的消息数
+        self._windows: Dict[Tuple[str, str], int] = {}
+        self._stats = {
+            "notified": 0,
+            "suppressed": 0,
+        }
+        metrics.register("listen", self.get_stats)
+
+    def set_robot(self, robot):
+        super().set_robot(robot)
+        # 此时Redis已经初始化，加载监听中的用户
+        self.registry.start()
+
+    def get_triggers(self) -> Optional[List[Trigger]]:
+        """监听命令，以及所有群消息（检查发言人是否开启了监听）"""
+        return [
+            Trigger(prefixes=(self.config["listen_command"], self.config["stop_listen_command"])),
+            Trigger(scope=SCOPE_GROUP),
+        ]
+
     async def process(self, context: Context) -> Optional[Context]:
         # 处理开启监听命令
         if context.content == self.config["listen_command"]:
@@ -22,11 +47,7 @@ class ListenPlugin(Plugin):
         # 处理关闭监听命令
         if context.content == self.config["stop_listen_command"]:
             return await self._handle_stop_listen_command(context)
-            
-        # 处理监听模式下的消息
-        if context.is_group:
-            return await self._handle_group_message(context)
-            
+
         context.process_state = ProcessState.CONTINUE
         return context
     
@@ -36,11 +57,8 @@ class ListenPlugin(Plugin):
             context.process_state = ProcessState.FINISHED_WITH_DEFAULT
             return context
         
-        redis_client = redis_manager.get_client()
-        listen_key = redis_manager.get_prefixed_key(f"{self.LISTEN_MODE_KEY_PREFIX}{context.msg.sender_id}")
-        
         # 设置监听模式
-        redis_client.setex(listen_key, self.config["listen_expire"], "1")
+        await asyncio.to_thread(self.registry.enable, context.msg.sender_id, self.config["listen_expire"])
         logger.info(f"User {context.msg.sender_id} enabled listen mode")
         
         context.rtn_content = self.config["messages"]["start_success"]
@@ -53,56 +71,88 @@ class ListenPlugin(Plugin):
             context.process_state = ProcessState.FINISHED_WITH_DEFAULT
             return context
             
-        redis_client = redis_manager.get_client()
-        listen_key = redis_manager.get_prefixed_key(f"{self.LISTEN_MODE_KEY_PREFIX}{context.msg.sender_id}")
-        # listen_key = f"{self.LISTEN_MODE_KEY_PREFIX}{context.msg.sender_id}"
-        
-        # 检查是否在监听模式
-        if not redis_client.exists(listen_key):
+        # 删除监听模式，未开启时提示
+        if not await asyncio.to_thread(self.registry.disable, context.msg.sender_id):
             context.rtn_content = self.config["messages"]["not_listening"]
             context.process_state = ProcessState.FINISHED_WITH_DEFAULT
             return context
-            
-        # 删除监听模式
-        redis_client.delete(listen_key)
+
         logger.info(f"User {context.msg.sender_id} disabled listen mode")
         
         context.rtn_content = self.config["messages"]["stop_success"]
         context.process_state = ProcessState.FINISHED_WITH_DEFAULT
         return context
     
-    async def _handle_group_message(self, context: Context) -> Context:
-        redis_client = redis_manager.get_client()
-        listen_key = redis_manager.get_prefixed_key(f"{self.LISTEN_MODE_KEY_PREFIX}{context.sender}")
-        # listen_key = f"{self.LISTEN_MODE_KEY_PREFIX}{context.sender}"
-        
-        # 检查用户是否开启了监听模式
-        if not redis_client.exists(listen_key):
-            context.process_state = ProcessState.CONTINUE
-            return context
-            
+    def should_observe(self, context: Context) -> bool:
+        """只有发言人开启了监听的群消息才需要观察（内存查找）"""
+        return context.is_group and context.msg is not None and self.registry.is_listening(context.sender)
+
+    async def observe(self, snapshot: ContextSnapshot) -> None:
+        """处理监听模式下的群消息"""
+        # 检查用户是否开启了监听模式（内存查找）
+        if not snapshot.is_group or not snapshot.msg or not self.registry.is_listening(snapshot.sender):
+            return
+
+        key = (snapshot.sender, snapshot.msg.room_id)
+        window = self.config.get("notify_window", 60)
+        if window > 0 and key in self._windows:
+            # 通知窗口内只计数，窗口结束时汇总发送一条
+            self._windows[key] += 1
+            self._stats["suppressed"] += 1
+            return
+
+        # 先开启窗口再发送，发送期间到达的消息计入窗口而不是各自再发一条通知
+        if window > 0:
+            self._windows[key] = 0
+            asyncio.get_running_loop().call_later(window, self._close_window, key, snapshot.msg)
+        await self._notify(snapshot.sender, snapshot.msg, 1, self.config["messages"]["notification_template"])
+
+    def _close_window(self, key: Tuple[str, str], msg) -> None:
+        count = self._windows.get(key, 0)
+        if not count or not self.registry.is_listening(key[0]):
+            self._windows.pop(key, None)
+            return
+        # 窗口内还有消息：发送汇总，并开启下一个窗口
+        self._windows[key] = 0
+        task = asyncio.get_running_loop().create_task(self._notify(key[0], msg, count, self.config["messages"]["summary_template"]))
+        task.add_done_callback(self._on_summary_sent)
+        asyncio.get_running_loop().call_later(self.config.get("notify_window", 60), self._close_window, key, msg)
+
+    @staticmethod
+    def _on_summary_sent(task: asyncio.Task) -> None:
+        if not task.cancelled() and task.exception():
+            logger.error(f"[Listen Plugin] Error sending summary notification: {task.exception()}")
+
+    async def _notify(self, user_id: str, msg, count: int, template: str) -> None:
         # 获取群组名称
-        group_name = await CacheManager.get_group_name(context.msg.room_id)
-        display_name = group_name or context.msg.room_id
-        
+        group_name = await CacheManager.get_group_name(msg.room_id)
+        display_name = group_name or msg.room_id
+
         # 发送群组信息给用户
-        notification = self.config["messages"]["notification_template"].format(
+        notification = template.format(
             group_name=display_name,
-            group_id=context.msg.room_id
+            group_id=msg.room_id,
+            count=count
         )
-        
+
         if self.robot:
+            self._stats["notified"] += 1
             await self.robot.send_message(Context(
                 type=ContextType.TEXT,  # 添加了type参数
                 content=notification,
-                receiver=context.sender,
+                receiver=user_id,
                 is_group=False,
                 rtn_content=notification,
                 process_state=ProcessState.FINISHED_WITH_DEFAULT,
-                msg=context.msg
+                msg=msg
             ))
         else:
             logger.warning("Robot instance not available")
-        
-        context.process_state = ProcessState.CONTINUE
-        return context
\ No newline at end of file
+
+    def get_stats(self) -> Dict:
+        """获取监听人数和通知/合并的消息数"""
+        return {
+            **self.registry.get_stats(),
+            "open_windows": len(self._windows),
+            **self._stats,
+        }
\ No newline at end of file
@@ -0,0 +1,99 @@
+import time
+from typing import Dict
+from common.log import logger
+from common.redis_manager import redis_manager
+from common.redis_pubsub import redis_pubsub
+from common.cache_manager import CACHE_CLEARED_CHANNEL
+
+LISTEN_MODE_KEY_PREFIX = "gewe-auth:listen_mode:"
+LISTEN_CHANNEL = "listen_mode"
+
+
+class ListenRegistry:
+    """开启了监听模式的用户
+
+    Redis 中的 listen_mode 键仍然是唯一的数据源，本进程在内存中保存一份
+    用户ID -> 过期时间，启动时全量加载，之后通过 pub/sub 同步其他进程的开启/关闭，
+    每条群消息只做一次字典查找，不再访问 Redis。/clear_cache 删除 Redis 中的键后
+    各进程收到 cache_cleared 广播并重新加载。
+    """
+
+    def __init__(self):
+        self._listeners: Dict[str, float] = {}
+        self._stats = {
+            "loads": 0,
+            "updates": 0,
+        }
+
+    def _key(self, user_id: str) -> str:
+        return redis_manager.get_prefixed_key(f"{LISTEN_MODE_KEY_PREFIX}{user_id}")
+
+    def start(self) -> None:
+        redis_pubsub.subscribe(LISTEN_CHANNEL, self._on_message, on_reconnect=self.load)
+        redis_pubsub.subscribe(CACHE_CLEARED_CHANNEL, self._on_cache_cleared)
+        self.load()
+
+    def load(self) -> None:
+        """从 Redis 全量加载监听中的用户及剩余时间"""
+        try:
+            redis_client = redis_manager.get_client()
+            prefix = self._key("")
+            keys = list(redis_client.scan_iter(match=f"{prefix}*", count=500))
+            listeners = {}
+            if keys:
+                pipe = redis_client.pipeline(transaction=False)
+                for key in keys:
+                    pipe.ttl(key)
+                now = time.time()
+                for key, ttl in zip(keys, pipe.execute()):
+                    if ttl is not None and ttl > 0:
+                        listeners[key[len(prefix):]] = now + ttl
+            self._listeners = listeners
+            self._stats["loads"] += 1
+            logger.info(f"[Listen Plugin] Loaded {len(listeners)} active listeners")
+        except Exception as e:
+            logger.error(f"[Listen Plugin] Error loading listeners: {e}")
+
+    def _on_message(self, message: Dict) -> None:
+        user_id = message.get("user_id")
+        if not user_id:
+            return
+        self._stats["updates"] += 1
+        if message.get("expire_at"):
+            self._listeners[user_id] = message["expire_at"]
+        else:
+            self._listeners.pop(user_id, None)
+
+    def _on_cache_cleared(self, message: Dict) -> None:
+        """Redis 中的监听键可能已被清除，重新全量加载"""
+        self.load()
+
+    def is_listening(self, user_id: str) -> bool:
+        expire_at = self._listeners.get(user_id)
+        if expire_at is None:
+            return False
+        if expire_at <= time.time():
+            self._listeners.pop(user_id, None)
+            return False
+        return True
+
+    def enable(self, user_id: str, expire: int) -> None:
+        """开启监听模式并通知其他进程"""
+        redis_manager.get_client().setex(self._key(user_id), expire, "1")
+        expire_at = time.time() + expire
+        self._listeners[user_id] = expire_at
+        redis_pubsub.publish(LISTEN_CHANNEL, {"user_id": user_id, "expire_at": expire_at})
+
+    def disable(self, user_id: str) -> bool:
+        """关闭监听模式，未开启时返回False"""
+        deleted = redis_manager.get_client().delete(self._key(user_id))
+        self._listeners.pop(user_id, None)
+        if deleted:
+            redis_pubsub.publish(LISTEN_CHANNEL, {"user_id": user_id, "expire_at": None})
+        return bool(deleted)
+
+    def get_stats(self) -> Dict:
+        return {
+            "listeners": len(self._listeners),
+            **self._stats,
+        }
@@ -0,0 +1,4 @@
+from .rate_limit_plugin import RateLimitPlugin
+from .config import DEFAULT_CONFIG
+
+__all__ = ['RateLimitPlugin', 'DEFAULT_CONFIG']
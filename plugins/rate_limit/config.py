@@ -0,0 +1,19 @@
+"""
+Rate Limit Plugin 默认配置
+"""
+
+DEFAULT_CONFIG = {
+    # 令牌桶：capacity 为允许的突发消息数，rate 为每秒补充的令牌数，为0表示不限制
+    "limits": {
+        "sender": {"capacity": 10, "rate": 0.5},  # 每个发送人
+        "room": {"capacity": 30, "rate": 2},  # 每个群组
+        "ai_sender": {"capacity": 3, "rate": 0.05},  # 每个发送人的AI消息
+        "ai_room": {"capacity": 10, "rate": 0.2}  # 每个群组的AI消息
+    },
+    "ai_prefixes": ["ai!", "小福"],  # 以这些激活词开头的消息同时计入AI额度
+    "command_prefixes": ["/"],  # 以这些前缀开头的群消息视为命令，计入限流
+    "exempt_users": [],  # 不限流的用户ID
+    "notice_message": "消息太频繁，请稍后再试",  # AI消息开始限流时回复一次，为空则直接丢弃
+    "local_blocklist_size": 10000,  # 本地拒绝名单的最大记录数
+    "fail_closed": False  # 为 true 时本插件超时、异常或熔断会丢弃消息（Redis 错误仍然放行）
+}
@@ -0,0 +1,118 @@
+import asyncio
+from typing import Dict, List, Optional
+from bot.context import Context, ContextType, ProcessState
+from plugins.base import Plugin
+from common.log import logger
+from common.metrics import metrics
+from plugins.rate_limit.token_bucket import Bucket, LocalBlocklist, RedisTokenBuckets
+
+
+class RateLimitPlugin(Plugin):
+    """限流插件 - 按发送人和群组限制发给机器人的消息频率，AI消息另有更严格的额度
+
+    群聊中的普通聊天不计入限流，也不会被丢弃；只有命令、AI消息和@机器人的消息计入。
+    """
+
+    def __init__(self, config: Dict = None):
+        super().__init__(config)
+        self.buckets = RedisTokenBuckets()
+        self.blocklist = LocalBlocklist(self.config.get("local_blocklist_size", 10000))
+        self.exempt_users = set(self.config.get("exempt_users", []))
+        self._stats = {
+            "allowed": 0,
+            "throttled": 0,  # Redis判定超限，回复了提示
+            "dropped": 0,  # 超限后直接丢弃
+            "local_rejects": 0,  # 本地拒绝名单命中，未访问Redis
+            "uncounted": 0,  # 不是发给机器人的群消息，不计入限流
+            "redis_errors": 0,
+            "by_bucket": {},
+        }
+        metrics.register("rate_limit", self.get_stats)
+
+    def _is_ai_message(self, context: Context) -> bool:
+        """以AI激活词开头的消息"""
+        return (
+            context.type in (ContextType.TEXT, ContextType.IMAGE)
+            and isinstance(context.content, str)
+            and context.content.startswith(tuple(self.config.get("ai_prefixes", ["ai!", "小福"])))
+        )
+
+    def _is_directed(self, context: Context) -> bool:
+        """是否是发给机器人的消息：私聊、@机器人、命令或AI消息"""
+        if not context.is_group or (context.msg and context.msg.is_at):
+            return True
+        if isinstance(context.content, str) and context.content.startswith(
+                tuple(self.config.get("command_prefixes", ["/"]))):
+            return True
+        return self._is_ai_message(context)
+
+    def _get_buckets(self, context: Context) -> List[Bucket]:
+        limits = self.config.get("limits", {})
+        room_id = context.msg.room_id if context.is_group and context.msg else None
+        candidates = [("sender", context.sender), ("room", room_id)]
+        if self._is_ai_message(context):
+            candidates += [("ai_sender", context.sender), ("ai_room", room_id)]
+
+        buckets = []
+        for name, chat_id in candidates:
+            limit = limits.get(name) or {}
+            # 未配置或容量/速率为0的桶不限制
+            if not chat_id or limit.get("capacity", 0) <= 0 or limit.get("rate", 0) <= 0:
+                continue
+            buckets.append(Bucket(name, f"{name}:{chat_id}", limit["capacity"], limit["rate"]))
+        return buckets
+
+    def _reject(self, context: Context, bucket: Bucket, notify: bool) -> Context:
+        by_bucket = self._stats["by_bucket"]
+        by_bucket[bucket.name] = by_bucket.get(bucket.name, 0) + 1
+        notice = self.config.get("notice_message")
+        if notify and notice and self._is_ai_message(context):
+            # 只对AI消息提示，每次进入限流只提示一次，之后由本地拒绝名单直接丢弃
+            self._stats["throttled"] += 1
+            context.rtn_content = notice
+            context.process_state = ProcessState.FINISHED_WITH_DEFAULT
+        else:
+            self._stats["dropped"] += 1
+            context.process_state = ProcessState.FINISHED
+        return context
+
+    async def process(self, context: Context) -> Optional[Context]:
+        if not context.sender or context.sender in self.exempt_users:
+            return context
+        if not self._is_directed(context):
+            self._stats["uncounted"] += 1
+            return context
+
+        buckets = self._get_buckets(context)
+        if not buckets:
+            return context
+
+        # 本地快速路径：刚被限流的桶在等待时间内直接拒绝
+        for bucket in buckets:
+            if self.blocklist.blocked(bucket.key):
+                self._stats["local_rejects"] += 1
+                return self._reject(context, bucket, notify=False)
+
+        try:
+            allowed, wait_seconds, index = await asyncio.to_thread(self.buckets.acquire, buckets)
+        except Exception as e:
+            # Redis不可用时放行，不影响正常服务
+            self._stats["redis_errors"] += 1
+            logger.error(f"[RateLimit] Error checking rate limit: {e}")
+            return context
+
+        if allowed:
+            self._stats["allowed"] += 1
+            return context
+
+        bucket = buckets[index]
+        self.blocklist.block(bucket.key, wait_seconds)
+        logger.info(f"[RateLimit] {bucket.name} limit exceeded for {bucket.key}, retry after {wait_seconds:.1f}s")
+        return self._reject(context, bucket, notify=True)
+
+    def get_stats(self) -> Dict:
+        """获取放行、限流、丢弃的消息数"""
+        stats = dict(self._stats)
+        stats["by_bucket"] = dict(self._stats["by_bucket"])
+        stats["blocked_keys"] = len(self.blocklist)
+        return stats
@@ -0,0 +1,107 @@
+import time
+from typing import Dict, List, NamedTuple, Tuple
+from common.redis_manager import redis_manager
+
+# 原子地检查并扣减多个令牌桶：所有桶都够才一起扣减，否则都不扣减
+# KEYS: 各个桶的key
+# ARGV: 当前毫秒时间, 本次消耗的令牌数, 之后每个桶依次为 容量, 每秒补充的令牌数
+# 返回: {是否放行, 需要等待的毫秒数, 令牌不足的桶序号(从1开始)}
+TOKEN_BUCKET_LUA = """
+local now = tonumber(ARGV[1])
+local cost = tonumber(ARGV[2])
+local tokens = {}
+local wait = 0
+local blocked = 0
+for i = 1, #KEYS do
+    local capacity = tonumber(ARGV[1 + i * 2])
+    local rate = tonumber(ARGV[2 + i * 2])
+    local state = redis.call('HMGET', KEYS[i], 'tokens', 'ts')
+    local current = tonumber(state[1])
+    local ts = tonumber(state[2])
+    if current == nil or ts == nil then
+        current = capacity
+        ts = now
+    end
+    current = math.min(capacity, current + math.max(0, now - ts) * rate / 1000)
+    tokens[i] = current
+    if current < cost then
+        local need = (cost - current) * 1000 / rate
+        if need > wait then
+            wait = need
+            blocked = i
+        end
+    end
+end
+if blocked > 0 then
+    return {0, math.ceil(wait), blocked}
+end
+for i = 1, #KEYS do
+    local capacity = tonumber(ARGV[1 + i * 2])
+    local rate = tonumber(ARGV[2 + i * 2])
+    redis.call('HSET', KEYS[i], 'tokens', tokens[i] - cost, 'ts', now)
+    redis.call('PEXPIRE', KEYS[i], math.ceil(capacity * 1000 / rate) + 1000)
+end
+return {1, 0, 0}
+"""
+
+
+class Bucket(NamedTuple):
+    name: str  # sender / room / ai_sender / ai_room
+    key: str  # 不带前缀的Redis key
+    capacity: float  # 桶容量，即允许的突发消息数
+    rate: float  # 每秒补充的令牌数
+
+
+class RedisTokenBuckets:
+    """Redis 令牌桶，一条消息涉及的所有桶由一次 Lua 脚本调用原子地检查和扣减"""
+
+    KEY_PREFIX = "gewe-auth:rate:"
+
+    def __init__(self):
+        self._script = None
+
+    def acquire(self, buckets: List[Bucket], cost: float = 1) -> Tuple[bool, float, int]:
+        """尝试从所有桶中各取 cost 个令牌
+
+        返回 (是否放行, 需要等待的秒数, 令牌不足的桶在 buckets 中的下标)，放行时下标为-1。
+        """
+        if self._script is None:
+            self._script = redis_manager.get_client().register_script(TOKEN_BUCKET_LUA)
+        keys = [redis_manager.get_prefixed_key(f"{self.KEY_PREFIX}{bucket.key}") for bucket in buckets]
+        args = [int(time.time() * 1000), cost]
+        for bucket in buckets:
+            args.extend((bucket.capacity, bucket.rate))
+        allowed, wait_ms, blocked = self._script(keys=keys, args=args)
+        return bool(allowed), int(wait_ms) / 1000, int(blocked) - 1
+
+
+class LocalBlocklist:
+    """进程内的拒绝名单
+
+    Redis 判定某个桶令牌不足时记下需要等待的时间，在此之前同一个桶的消息直接在本地拒绝，
+    不再访问 Redis。只保存被限流的桶，数量超过 max_size 时清理已过期的记录。
+    """
+
+    def __init__(self, max_size: int = 10000):
+        self.max_size = max_size
+        self._until: Dict[str, float] = {}
+
+    def blocked(self, key: str) -> bool:
+        until = self._until.get(key)
+        if until is None:
+            return False
+        if until <= time.monotonic():
+            self._until.pop(key, None)
+            return False
+        return True
+
+    def block(self, key: str, seconds: float) -> None:
+        now = time.monotonic()
+        if len(self._until) >= self.max_size:
+            self._until = {k: until for k, until in self._until.items() if until > now}
+            if len(self._until) >= self.max_size:
+                return
+        self._until[key] = now + seconds
+
+    def __len__(self) -> int:
+        return len(self._until)
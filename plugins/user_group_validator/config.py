@@ -3,5 +3,6 @@ DEFAULT_CONFIG = {
     "unauthorized_message": "未授权的访问",
     "return_unauthorized_message": False,
     "allowed_groups": [],
-    "allowed_users": []
+    "allowed_users": [],
+    "fail_closed": True  # 校验超时、异常或熔断时丢弃消息，不放行给后面的插件
 }
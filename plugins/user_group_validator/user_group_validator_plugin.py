@@ -1,12 +1,13 @@
+import asyncio
 from typing import Optional, Dict
 from bot.context import Context, ProcessState
-from bot.robot import robot_instance
 from plugins.base import Plugin
 from common.log import logger
 from common.database_manager import db_manager
 from common.models import WxUser, WxGroup
 from common.redis_manager import redis_manager
 from common.cache_manager import CacheManager
+from common.event_bus import EventBus
 
 
 class UserGroupValidatorPlugin(Plugin):
@@ -22,6 +23,8 @@ class UserGroupValidatorPlugin(Plugin):
         
         if self.config.get("clear_cache_on_startup", False):
             self.clear_auth_cache()
+
+        EventBus.subscribe("binding_created", self._on_binding_created)
     
     # Remove set_robot method as it's now in the base class
 
@@ -30,53 +33,46 @@ class UserGroupValidatorPlugin(Plugin):
         CacheManager.clear_all_cache()
         logger.info("[UserGroupValidator] Cleared auth cache")
 
-    async def check_group_auth(self, room_id: str, redis_client) -> bool:
-        """检查群组权限，先查Redis，没有则查MySQL并缓存结果"""
-        cache_key = redis_manager.get_prefixed_key(f"{self.GROUP_CACHE_KEY_PREFIX}{room_id}")
+    def _on_binding_created(self, is_group: bool, chat_id: str, **kwargs) -> None:
+        """绑定提交后把权限缓存更新为已授权，覆盖之前缓存的未授权结果"""
+        prefix = self.GROUP_CACHE_KEY_PREFIX if is_group else self.USER_CACHE_KEY_PREFIX
+        cache_key = redis_manager.get_prefixed_key(f"{prefix}{chat_id}")
+        redis_manager.get_client().setex(cache_key, self.CACHE_EXPIRE, "1")
+
+    def _check_auth(self, model, id_field: str, prefix: str, chat_id: str, redis_client) -> bool:
+        """先查Redis，没有则查MySQL并缓存结果（同步调用，在线程池中执行）"""
+        cache_key = redis_manager.get_prefixed_key(f"{prefix}{chat_id}")
         cached_result = redis_client.get(cache_key)
-        
+
         if cached_result is not None:
             return cached_result == "1"
 
         # 查询MySQL并缓存结果
         session = db_manager.get_session()
         try:
-            group = session.query(WxGroup).filter_by(wx_group_id=room_id).first()
-            is_authorized = group is not None
-            
+            is_authorized = session.query(model).filter_by(**{id_field: chat_id}).first() is not None
+
             redis_client.setex(
                 cache_key,
                 self.CACHE_EXPIRE,
                 "1" if is_authorized else "0"
             )
-            
+
             return is_authorized
         finally:
             db_manager.close_session(session)
 
+    async def check_group_auth(self, room_id: str, redis_client) -> bool:
+        """检查群组权限，先查Redis，没有则查MySQL并缓存结果"""
+        return await asyncio.to_thread(
+            self._check_auth, WxGroup, "wx_group_id", self.GROUP_CACHE_KEY_PREFIX, room_id, redis_client
+        )
+
     async def check_user_auth(self, user_id: str, redis_client) -> bool:
         """检查用户权限，先查Redis，没有则查MySQL并缓存结果"""
-        cache_key = redis_manager.get_prefixed_key(f"{self.USER_CACHE_KEY_PREFIX}{user_id}")
-        cached_result = redis_client.get(cache_key)
-        
-        if cached_result is not None:
-            return cached_result == "1"
-
-        # 查询MySQL并缓存结果
-        session = db_manager.get_session()
-        try:
-            user = session.query(WxUser).filter_by(wx_user_id=user_id).first()
-            is_authorized = user is not None
-            
-            redis_client.setex(
-                cache_key,
-                self.CACHE_EXPIRE,
-                "1" if is_authorized else "0"
-            )
-            
-            return is_authorized
-        finally:
-            db_manager.close_session(session)
+        return await asyncio.to_thread(
+            self._check_auth, WxUser, "wx_user_id", self.USER_CACHE_KEY_PREFIX, user_id, redis_client
+        )
 
     async def process(self, context: Context) -> Optional[Context]:
         try:
@@ -49,6 +49,48 @@ CREATE TABLE IF NOT EXISTS `admin_users` (
   UNIQUE KEY `wx_user_id` (`wx_user_id`)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COMMENT='管理员用户表';
 
+-- 创建AI用量统计表
+CREATE TABLE IF NOT EXISTS `ai_usage` (
+  `id` int(11) NOT NULL AUTO_INCREMENT,
+  `customer_id` varchar(50) NOT NULL COMMENT '客户ID',
+  `model` varchar(50) NOT NULL COMMENT '模型名称',
+  `usage_date` date NOT NULL COMMENT '日期',
+  `requests` int(11) DEFAULT 0 COMMENT '请求次数',
+  `prompt_tokens` bigint(20) DEFAULT 0 COMMENT '输入token数',
+  `completion_tokens` bigint(20) DEFAULT 0 COMMENT '输出token数',
+  `total_tokens` bigint(20) DEFAULT 0 COMMENT '总token数',
+  `update_time` datetime DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP COMMENT '更新时间',
+  PRIMARY KEY (`id`),
+  UNIQUE KEY `uk_customer_model_date` (`customer_id`, `model`, `usage_date`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COMMENT='AI用量统计表';
+
+-- 创建关键词规则集表
+CREATE TABLE IF NOT EXISTS `keyword_rule_set` (
+  `id` int(11) NOT NULL AUTO_INCREMENT,
+  `name` varchar(100) DEFAULT NULL COMMENT '规则集名称',
+  `scope_type` tinyint(1) NOT NULL COMMENT '作用范围 1:群组 2:客户',
+  `scope_id` varchar(50) NOT NULL COMMENT 'wx_group_id或customer_id',
+  `version` int(11) DEFAULT 1 COMMENT '版本号，修改规则后加1',
+  `status` tinyint(1) DEFAULT 1 COMMENT '状态 0:停用 1:启用',
+  `update_time` datetime DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP COMMENT '更新时间',
+  PRIMARY KEY (`id`),
+  KEY `idx_scope` (`scope_type`, `scope_id`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COMMENT='关键词规则集表';
+
+-- 创建关键词规则表
+CREATE TABLE IF NOT EXISTS `keyword_rule` (
+  `id` int(11) NOT NULL AUTO_INCREMENT,
+  `rule_set_id` int(11) NOT NULL COMMENT '规则集ID',
+  `keyword` varchar(255) NOT NULL COMMENT '关键词或正则',
+  `reply` varchar(2000) DEFAULT NULL COMMENT '回复模板，为空时使用插件默认模板',
+  `priority` int(11) DEFAULT 100 COMMENT '优先级，数字越小越优先',
+  `is_regex` tinyint(1) DEFAULT 0 COMMENT '是否正则',
+  `whole_word` tinyint(1) DEFAULT 0 COMMENT '是否整词匹配',
+  `status` tinyint(1) DEFAULT 1 COMMENT '状态 0:停用 1:启用',
+  PRIMARY KEY (`id`),
+  KEY `idx_rule_set_id` (`rule_set_id`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COMMENT='关键词规则表';
+
 -- 插入初始管理员数据（可选）
 -- INSERT INTO `admin_users` (`wx_user_id`, `wx_username`, `is_super_admin`, `comment`)
 -- VALUES ('wxid_7br2m2wm63th22', '管理员', 1, '初始超级管理员');
@@ -0,0 +1,20 @@
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import scoped_session, sessionmaker
+
+from common.database_manager import db_manager
+from common.db_base import Base
+
+
+@pytest.fixture
+def sqlite_db(tmp_path):
+    """把全局 db_manager 指向临时 SQLite 文件，每个线程使用自己的会话"""
+    engine = create_engine(f"sqlite:///{tmp_path / 'test.db'}", connect_args={"timeout": 30})
+    Base.metadata.create_all(engine)
+    saved = db_manager._engine, db_manager._session_factory
+    db_manager._engine = engine
+    db_manager._session_factory = scoped_session(sessionmaker(bind=engine))
+    yield db_manager
+    db_manager._session_factory.remove()
+    db_manager._engine, db_manager._session_factory = saved
+    engine.dispose()
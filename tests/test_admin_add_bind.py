@@ -0,0 +1,44 @@
+import asyncio
+
+from bot.context import Context, ContextType
+from common.models import CustomBindKey
+from plugins.admin.admin_plugin import AdminPlugin
+from plugins.admin.config import DEFAULT_CONFIG
+
+
+def add_bind(args):
+    plugin = AdminPlugin(dict(DEFAULT_CONFIG))
+    context = Context(ContextType.TEXT, f"/add_bind {args}", sender="admin")
+    return asyncio.run(plugin._handle_add_bind(context, args))
+
+
+def stored_keys(db):
+    session = db.get_session()
+    try:
+        return [(row.customer_id, row.customer) for row in session.query(CustomBindKey).all()]
+    finally:
+        db.close_session(session)
+
+
+def test_numeric_customer_id_is_not_a_count(sqlite_db):
+    context = add_bind("12345 测试客户")
+    assert context.rtn_content.startswith("新的绑定密钥")
+    assert stored_keys(sqlite_db) == [("12345", "测试客户")]
+
+
+def test_count_flag(sqlite_db):
+    context = add_bind("-n 3 12345")
+    assert context.rtn_content.startswith("已生成 3 个绑定密钥")
+    assert stored_keys(sqlite_db) == [("12345", None)] * 3
+
+
+def test_count_flag_without_number_shows_help(sqlite_db):
+    context = add_bind("-n customer123")
+    assert context.rtn_content == DEFAULT_CONFIG["admin_commands"]["add_bind"]["help_message"]
+    assert stored_keys(sqlite_db) == []
+
+
+def test_count_over_limit_is_rejected(sqlite_db):
+    context = add_bind("-n 1000 customer123")
+    assert "1 到 200" in context.rtn_content
+    assert stored_keys(sqlite_db) == []
@@ -0,0 +1,92 @@
+import asyncio
+
+import fakeredis
+import pytest
+
+from bot.context import Context, ContextType
+from bot.message import Message
+from common.redis_manager import redis_manager
+from plugins.ai.ai_plugin import AIPlugin
+from plugins.ai.config import DEFAULT_CONFIG
+from plugins.ai.response_cache import AIResult
+
+MODEL = "gpt-4o-mini"
+ROOM = "room@chatroom"
+
+
+@pytest.fixture
+def redis_client():
+    saved = redis_manager._redis_client, redis_manager._key_prefix
+    client = fakeredis.FakeRedis(decode_responses=True)
+    redis_manager._redis_client = client
+    redis_manager._key_prefix = ""
+    yield client
+    redis_manager._redis_client, redis_manager._key_prefix = saved
+
+
+@pytest.fixture
+def plugin(redis_client, sqlite_db, monkeypatch):
+    monkeypatch.setenv("OPENAI_DEFAULT_MODEL", MODEL)
+    config = dict(DEFAULT_CONFIG)
+    config["hedge"] = {"enabled": False}
+    plugin = AIPlugin(config)
+    plugin.upstream_calls = []
+
+    async def post_completion(headers, data, on_segment=None, segmenter=None):
+        plugin.upstream_calls.append(data["messages"])
+        await asyncio.sleep(0.02)
+        return AIResult(content=f"answer {len(plugin.upstream_calls)}", model=data["model"],
+                        usage={"total_tokens": 10})
+
+    plugin._post_completion = post_completion
+    return plugin
+
+
+def group_context(sender, content="ai! 怎么绑定群组"):
+    msg = Message(type="1", content=content, sender_id=ROOM, room_id=ROOM, is_group=True, actual_user_id=sender)
+    return Context(type=ContextType.TEXT, content=content, msg=msg, is_group=True, receiver=ROOM, sender=sender)
+
+
+def private_context(sender, content="ai! 怎么绑定群组"):
+    msg = Message(type="1", content=content, sender_id=sender)
+    return Context(type=ContextType.TEXT, content=content, msg=msg, is_group=False, receiver=sender, sender=sender)
+
+
+def ask(plugin, *contexts):
+    async def run():
+        return await asyncio.gather(*(plugin.process(context) for context in contexts))
+
+    return [context.rtn_content for context in asyncio.run(run())]
+
+
+def test_group_chats_share_cache_without_memory(plugin):
+    assert ask(plugin, group_context("wxid_a")) == ["answer 1"]
+    # 群聊默认不保存历史，同一个人再问和其他人问都命中缓存
+    assert ask(plugin, group_context("wxid_a"), group_context("wxid_b")) == ["answer 1", "answer 1"]
+    assert len(plugin.upstream_calls) == 1
+    assert plugin.response_cache.get_stats()["with_history"] == 0
+
+
+def test_concurrent_group_questions_are_coalesced(plugin):
+    answers = ask(plugin, *(group_context(f"wxid_{i}") for i in range(5)))
+    assert answers == ["answer 1"] * 5
+    assert len(plugin.upstream_calls) == 1
+
+
+def test_history_is_part_of_the_cache_key(plugin):
+    assert ask(plugin, private_context("wxid_a")) == ["answer 1"]
+    # 私聊保存了历史，再问同样的问题时带上历史，不能命中无历史的缓存
+    assert ask(plugin, private_context("wxid_a")) == ["answer 2"]
+    assert [message["content"] for message in plugin.upstream_calls[1][:2]] == ["怎么绑定群组", "answer 1"]
+    assert plugin.response_cache.get_stats()["with_history"] == 1
+    # 没有历史的新会话仍然命中第一次的回答
+    assert ask(plugin, private_context("wxid_b")) == ["answer 1"]
+    assert len(plugin.upstream_calls) == 2
+
+
+def test_memory_can_be_enabled_per_group(plugin, redis_client):
+    plugin.memory.groups = {ROOM}
+    ask(plugin, group_context("wxid_a"))
+    assert plugin.memory.load(f"{ROOM}:wxid_a", MODEL)
+    assert ask(plugin, group_context("wxid_a")) == ["answer 2"]
+    assert len(plugin.upstream_calls) == 2
@@ -0,0 +1,80 @@
+import asyncio
+import json
+
+import fakeredis
+
+from bot.context import Context, ContextType
+from bot.message import Message
+from common.redis_manager import redis_manager
+from plugins.ai.ai_plugin import AIPlugin
+from plugins.ai.config import DEFAULT_CONFIG
+from plugins.ai.response_cache import AIResult
+
+LATENCY = {"slow": 0.5, "fast": 0.02}
+
+
+def make_plugin():
+    config = dict(DEFAULT_CONFIG)
+    config["models"] = {"slow": {"max_tokens": 100, "fallback": "fast"}, "fast": {"max_tokens": 100}}
+    config["hedge"] = {"enabled": True, "percentile": 95, "min_delay": 0.01, "min_samples": 5}
+    plugin = AIPlugin(config)
+
+    async def post_completion(headers, data, on_segment=None, segmenter=None):
+        await asyncio.sleep(LATENCY[data["model"]])
+        return AIResult(content=data["model"], model=data["model"], usage={"total_tokens": 7})
+
+    plugin._post_completion = post_completion
+    for _ in range(5):
+        plugin.latency_tracker.record("slow", 0.05)
+    return plugin
+
+
+def test_cancelled_primary_is_recorded_as_latency_and_usage():
+    plugin = make_plugin()
+    extra_usage = []
+
+    async def run():
+        result = await plugin._call_with_hedge(
+            "hi", "slow", [], on_extra_usage=lambda model, usage: extra_usage.append((model, usage)))
+        # 让被取消的主请求处理完取消
+        await asyncio.sleep(0)
+        return result
+
+    result = asyncio.run(run())
+    assert result.model == "fast"
+    assert plugin._hedge_stats["fallback_wins"] == 1
+    assert plugin._hedge_stats["cancelled_samples"] == 1
+    slow_samples = plugin.latency_tracker._samples["slow"]
+    assert len(slow_samples) == 6 and slow_samples[-1] >= 0.05
+    assert [model for model, _ in extra_usage] == ["slow"]
+    assert extra_usage[0][1]["total_tokens"] > 0
+
+
+def test_summary_usage_is_recorded_for_customer():
+    plugin = make_plugin()
+    recorded = []
+    plugin.usage_tracker.record = lambda customer_id, model, usage: recorded.append((customer_id, model, usage))
+    plugin.config["memory"] = {"summary_model": "fast"}
+
+    summary = asyncio.run(plugin._summarize("用户：你好", customer_id="c1"))
+    assert summary == "fast"
+    assert recorded == [("c1", "fast", {"total_tokens": 7})]
+
+
+def test_fallback_answer_is_cached_under_fallback_model(sqlite_db, monkeypatch):
+    client = fakeredis.FakeRedis(decode_responses=True)
+    monkeypatch.setattr(redis_manager, "_redis_client", client)
+    monkeypatch.setattr(redis_manager, "_key_prefix", "")
+    monkeypatch.setenv("OPENAI_DEFAULT_MODEL", "slow")
+    plugin = make_plugin()
+    plugin.config["models"]["slow"]["cache_ttl"] = 600
+    plugin.config["models"]["fast"]["cache_ttl"] = 60
+    msg = Message(type="1", content="ai! hi", sender_id="wxid_a")
+    context = Context(type=ContextType.TEXT, content="ai! hi", msg=msg, receiver="wxid_a", sender="wxid_a")
+
+    assert asyncio.run(plugin.process(context)).rtn_content == "fast"
+    slow_key = plugin.response_cache.make_key("slow", "hi")
+    fast_key = plugin.response_cache.key_for_model(slow_key, "fast")
+    assert client.get(slow_key) is None
+    assert json.loads(client.get(fast_key))["model"] == "fast"
+    assert 0 < client.ttl(fast_key) <= 60
@@ -0,0 +1,72 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from sqlalchemy.exc import IntegrityError
+
+from common.bindings import BIND_TYPE_GROUP, BIND_TYPE_USER
+from common.database_manager import db_manager
+from common.models import CustomBindKey, WxGroup, WxUser
+from plugins.bind.bind_plugin import BindPlugin
+
+THREADS = 16
+
+
+def add_key(db, bind_key, customer_id="c1"):
+    session = db.get_session()
+    session.add(CustomBindKey(bind_key=bind_key, customer_id=customer_id, status=0))
+    session.commit()
+    db.close_session(session)
+
+
+def consume_concurrently(calls):
+    """所有线程就绪后同时消费，返回每次调用的结果或异常"""
+    barrier = threading.Barrier(len(calls))
+
+    def run(args):
+        barrier.wait()
+        try:
+            return BindPlugin._consume_key(*args)
+        except Exception as e:
+            return e
+        finally:
+            db_manager._session_factory.remove()
+
+    with ThreadPoolExecutor(len(calls)) as pool:
+        return list(pool.map(run, calls))
+
+
+def test_same_key_is_consumed_exactly_once(sqlite_db):
+    add_key(sqlite_db, "key-1")
+
+    results = consume_concurrently([
+        ("key-1", BIND_TYPE_GROUP, f"room-{i}@chatroom", f"room {i}") for i in range(THREADS)
+    ])
+
+    assert not [r for r in results if isinstance(r, Exception)]
+    winners = [r for r in results if r is not None]
+    assert winners == ["c1"]
+    session = sqlite_db.get_session()
+    assert session.query(WxGroup).count() == 1
+    key = session.query(CustomBindKey).filter_by(bind_key="key-1").one()
+    assert key.status == 1
+    assert key.bind_id == session.query(WxGroup.wx_group_id).scalar()
+    sqlite_db.close_session(session)
+
+
+def test_already_bound_chat_keeps_key_unused(sqlite_db):
+    add_key(sqlite_db, "key-1")
+    add_key(sqlite_db, "key-2")
+    assert BindPlugin._consume_key("key-1", BIND_TYPE_USER, "wxid_a", "A") == "c1"
+
+    with pytest.raises(IntegrityError):
+        BindPlugin._consume_key("key-2", BIND_TYPE_USER, "wxid_a", "A")
+
+    session = sqlite_db.get_session()
+    assert session.query(WxUser).count() == 1
+    assert session.query(CustomBindKey.status).filter_by(bind_key="key-2").scalar() == 0
+    sqlite_db.close_session(session)
+
+
+def test_unknown_key_returns_none(sqlite_db):
+    assert BindPlugin._consume_key("missing", BIND_TYPE_USER, "wxid_a", "A") is None
@@ -0,0 +1,137 @@
+import asyncio
+import json
+
+import fakeredis
+import pytest
+
+from common.redis_manager import redis_manager
+from plugins.ai.conversation_memory import ConversationMemory
+
+MODEL = "gpt-4o"
+CHAT = "room@chatroom:wxid_a"
+
+
+@pytest.fixture
+def redis_client():
+    saved = redis_manager._redis_client, redis_manager._key_prefix
+    client = fakeredis.FakeRedis(decode_responses=True)
+    redis_manager._redis_client = client
+    redis_manager._key_prefix = ""
+    yield client
+    redis_manager._redis_client, redis_manager._key_prefix = saved
+
+
+@pytest.fixture
+def memory(redis_client):
+    return ConversationMemory({"max_messages": 12, "summarize_after": 8, "keep_recent": 2})
+
+
+def fill(memory, rounds, start=0):
+    for i in range(start, start + rounds):
+        count = memory.append(CHAT, MODEL, f"q{i}", f"a{i}")
+    return count
+
+
+def contents(redis_client, memory):
+    return [json.loads(raw)["content"] for raw in redis_client.lrange(memory._memory_key(CHAT), 0, -1)]
+
+
+def compact(memory, summarize):
+    asyncio.run(memory._compact(CHAT, MODEL, summarize))
+
+
+def test_compact_replaces_old_messages_with_summary(redis_client, memory):
+    fill(memory, 5)
+
+    async def summarize(text):
+        assert "q0" in text and "a3" in text and "q4" not in text
+        return "摘要"
+
+    compact(memory, summarize)
+
+    assert contents(redis_client, memory) == ["q4", "a4"]
+    assert json.loads(redis_client.get(memory._summary_key(CHAT)))["content"] == "摘要"
+    history = memory.load(CHAT, MODEL)
+    assert [message["content"] for message in history] == ["之前对话的摘要：摘要", "q4", "a4"]
+
+
+def test_compact_keeps_messages_appended_while_summarizing(redis_client, memory):
+    fill(memory, 5)
+
+    async def summarize(text):
+        # 压缩期间新增的消息超过 max_messages，列表头部被截掉了4条
+        fill(memory, 4, start=5)
+        return "摘要"
+
+    compact(memory, summarize)
+
+    assert contents(redis_client, memory) == [
+        "q4", "a4", "q5", "a5", "q6", "a6", "q7", "a7", "q8", "a8"
+    ]
+    assert memory.get_stats()["summaries"] == 1
+
+
+def test_reset_during_compaction_discards_summary(redis_client, memory):
+    fill(memory, 5)
+
+    async def summarize(text):
+        memory.clear(CHAT)
+        memory.append(CHAT, MODEL, "new", "answer")
+        return "过期的摘要"
+
+    compact(memory, summarize)
+
+    assert redis_client.get(memory._summary_key(CHAT)) is None
+    assert contents(redis_client, memory) == ["new", "answer"]
+    assert memory.get_stats()["summary_conflicts"] == 1
+
+
+def test_append_trims_to_max_messages(redis_client, memory):
+    count = fill(memory, 10)
+    assert count == 12
+    assert contents(redis_client, memory)[:2] == ["q4", "a4"]
+
+
+def test_load_trims_oldest_messages_to_token_budget(redis_client):
+    memory = ConversationMemory({"history_tokens": 5})
+    for i in range(3):
+        memory.append(CHAT, MODEL, f"问题{i}", f"回答{i}")
+    history = memory.load(CHAT, MODEL)
+    # 每条消息3个token，预算只够最近一条
+    assert [message["content"] for message in history] == ["回答2"]
+    assert memory.get_stats()["trimmed_messages"] == 5
+
+
+def test_maybe_compact_runs_once_past_threshold(redis_client, memory):
+    calls = []
+
+    async def summarize(text):
+        calls.append(text)
+        await asyncio.sleep(0.01)
+        return "摘要"
+
+    async def run():
+        count = fill(memory, 5)
+        memory.maybe_compact(CHAT, MODEL, count, summarize)
+        # 压缩进行中不会重复启动
+        memory.maybe_compact(CHAT, MODEL, count, summarize)
+        await asyncio.sleep(0.05)
+
+    asyncio.run(run())
+    assert len(calls) == 1
+    assert contents(redis_client, memory) == ["q4", "a4"]
+
+
+def test_summary_updated_elsewhere_discards_compaction(redis_client, memory):
+    fill(memory, 5)
+
+    async def summarize(text):
+        # 另一个进程先写入了摘要
+        redis_client.set(memory._summary_key(CHAT), json.dumps({"content": "其他进程的摘要", "tokens": 3}))
+        return "摘要"
+
+    compact(memory, summarize)
+
+    assert json.loads(redis_client.get(memory._summary_key(CHAT)))["content"] == "其他进程的摘要"
+    assert len(contents(redis_client, memory)) == 10
+    assert memory.get_stats()["summary_conflicts"] == 1
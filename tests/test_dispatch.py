@@ -0,0 +1,98 @@
+import asyncio
+from typing import List, Optional
+
+import pytest
+
+from bot.chain_metrics import ChainMetrics
+from bot.context import Context, ContextType, ProcessState
+from bot.dispatch import DispatchIndex
+from bot.message import Message
+from bot.robot import WeRobot
+from plugins.base import Plugin, Trigger, SCOPE_GROUP, SCOPE_PRIVATE
+
+
+class DeclaredPlugin(Plugin):
+    """按给定触发条件声明的插件，记录被调用的消息"""
+
+    def __init__(self, name: str, triggers: Optional[List[Trigger]]):
+        super().__init__()
+        self.name = name
+        self.triggers = triggers
+        self.seen = []
+
+    def get_triggers(self):
+        return self.triggers
+
+    async def process(self, context):
+        self.seen.append(context.content)
+        return context
+
+
+def make_plugins():
+    return [
+        DeclaredPlugin("admin", [Trigger(prefixes=("/reload_admins", "/clear_cache"), scope=SCOPE_PRIVATE)]),
+        DeclaredPlugin("bind", [Trigger(prefixes=("/bind",))]),
+        DeclaredPlugin("ai", [Trigger(prefixes=("ai!", "小福"), types=(ContextType.TEXT, ContextType.IMAGE))]),
+        DeclaredPlugin("listen", [Trigger(prefixes=("/listen",)), Trigger(scope=SCOPE_GROUP)]),
+        DeclaredPlugin("image_only", [Trigger(types=(ContextType.IMAGE,), scope=SCOPE_PRIVATE)]),
+        DeclaredPlugin("all", None),
+    ]
+
+
+def expected_names(plugins, is_group, context_type, content):
+    """不经过索引，逐个检查触发条件"""
+    names = []
+    for plugin in plugins:
+        for trigger in plugin.get_triggers() or [Trigger()]:
+            if trigger.scope == SCOPE_GROUP and not is_group:
+                continue
+            if trigger.scope == SCOPE_PRIVATE and is_group:
+                continue
+            if trigger.types is not None and context_type not in trigger.types:
+                continue
+            if trigger.prefixes and not content.lstrip().startswith(trigger.prefixes):
+                continue
+            names.append(plugin.name)
+            break
+    return names
+
+
+CONTENTS = ["/reload_admins", "  /reload_admins", "/bind abc", "ai! hi", "\n小福 在吗", "/listen", "hello", ""]
+
+
+@pytest.mark.parametrize("is_group", [False, True])
+@pytest.mark.parametrize("context_type", list(ContextType))
+def test_index_matches_triggers(is_group, context_type):
+    plugins = make_plugins()
+    index = DispatchIndex(plugins)
+    for content in CONTENTS:
+        context = Context(type=context_type, content=content, is_group=is_group)
+        assert [plugin.name for plugin in index.get_plugins(context)] == \
+            expected_names(plugins, is_group, context_type, content), content
+
+
+def test_non_text_content_uses_unconditional_plugins_only():
+    index = DispatchIndex(make_plugins())
+    context = Context(type=ContextType.IMAGE, content=b"\x89PNG", is_group=False)
+    assert [plugin.name for plugin in index.get_plugins(context)] == ["image_only", "all"]
+
+
+def test_command_with_leading_whitespace_reaches_plugin():
+    plugins = make_plugins()
+    robot = WeRobot.__new__(WeRobot)
+    robot.plugins = plugins
+    robot._dispatch_index = None
+    robot.chain_metrics = ChainMetrics(3000, 10)
+    robot._breakers = {}
+
+    async def send_message(context):
+        pass
+
+    robot.send_message = send_message
+    msg = Message(type="1", content=" /reload_admins", sender_id="wxid_admin", msg_id="1")
+    asyncio.run(robot.process_message(msg))
+
+    seen = {plugin.name: plugin.seen for plugin in plugins}
+    assert seen["admin"] == [" /reload_admins"]
+    assert seen["all"] == [" /reload_admins"]
+    assert seen["bind"] == seen["ai"] == seen["listen"] == seen["image_only"] == []
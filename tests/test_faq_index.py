@@ -0,0 +1,92 @@
+import asyncio
+import os
+
+from bot.context import Context, ContextType
+from plugins.admin.admin_plugin import AdminPlugin
+from plugins.admin.config import DEFAULT_CONFIG as ADMIN_CONFIG
+from plugins.faq.config import DEFAULT_CONFIG as FAQ_CONFIG
+from plugins.faq.embedder import create_embedder
+from plugins.faq.faq_index import FAQIndex
+from plugins.faq.faq_plugin import FAQPlugin
+
+ENTRIES = [
+    {"questions": ["怎么绑定群组", "群怎么绑定"], "answer": "bind"},
+    {"questions": ["怎么切换模型"], "answer": "model"},
+]
+
+
+def make_index(index_dir):
+    return FAQIndex(str(index_dir), lambda: create_embedder({"type": "hashing", "dim": 64}))
+
+
+def vector_files(index_dir):
+    return sorted(name for name in os.listdir(index_dir) if name.endswith(".npy"))
+
+
+def test_rebuild_writes_new_file_and_keeps_old_mapping_valid(tmp_path):
+    index = make_index(tmp_path)
+    index.build(ENTRIES, "v1")
+    reader = make_index(tmp_path)
+    assert reader.load("v1")
+    old_files = vector_files(tmp_path)
+
+    index.build(ENTRIES[:1], "v2")
+
+    new_files = vector_files(tmp_path)
+    assert len(new_files) == 1 and new_files != old_files
+    # 已经映射旧文件的读取方仍然可以检索
+    assert reader.search("群怎么绑定")[1]["answer"] == "bind"
+    fresh = make_index(tmp_path)
+    assert not fresh.load("v1")
+    assert fresh.load("v2") and fresh.size == 2
+
+
+def test_files_that_cannot_be_removed_are_cleaned_up_later(tmp_path, monkeypatch):
+    index = make_index(tmp_path)
+    index.build(ENTRIES, "v1")
+    first = vector_files(tmp_path)[0]
+
+    real_remove = os.remove
+
+    def remove(path):
+        # 模拟 Windows：仍被映射的文件无法删除
+        if os.path.basename(path) == first:
+            raise PermissionError(path)
+        real_remove(path)
+
+    monkeypatch.setattr(os, "remove", remove)
+    index.build(ENTRIES, "v2")
+    assert first in vector_files(tmp_path) and len(vector_files(tmp_path)) == 2
+
+    monkeypatch.setattr(os, "remove", real_remove)
+    index.build(ENTRIES, "v3")
+    assert len(vector_files(tmp_path)) == 1
+    assert make_index(tmp_path).load("v3")
+
+
+class FakePluginManager:
+    def __init__(self, plugins):
+        self.plugins = plugins
+
+    def get_plugins(self):
+        return self.plugins
+
+
+def faq_reindex(plugins):
+    admin = AdminPlugin(dict(ADMIN_CONFIG), FakePluginManager(plugins))
+    context = Context(ContextType.TEXT, "/faq_reindex", sender="admin")
+    return asyncio.run(admin._handle_faq_reindex(context, "")).rtn_content
+
+
+def test_faq_reindex_replies_with_count(tmp_path):
+    faq_file = tmp_path / "faq.yaml"
+    faq_file.write_text('- questions: ["a", "b"]\n  answer: "x"\n', encoding="utf-8")
+    faq = FAQPlugin({**FAQ_CONFIG, "faq_file": str(faq_file), "index_dir": str(tmp_path / "index")})
+    assert faq_reindex([faq]) == "FAQ索引已重建，共 2 个问题"
+
+    faq_file.write_text("- questions: [", encoding="utf-8")
+    assert faq_reindex([faq]).startswith("重建FAQ索引时出错")
+
+
+def test_faq_reindex_without_faq_plugin():
+    assert faq_reindex([]) == "FAQ插件未启用"
@@ -0,0 +1,73 @@
+from common.models import KeywordRule, KeywordRuleSet
+from plugins.keyword_filter.rule_sets import SCOPE_GROUP, RuleSetStore
+
+ROOM_A = "a@chatroom"
+ROOM_B = "b@chatroom"
+
+
+def add_rule_set(db, scope_id, keywords, regex=False):
+    session = db.get_session()
+    rule_set = KeywordRuleSet(scope_type=SCOPE_GROUP, scope_id=scope_id, version=1, status=1)
+    session.add(rule_set)
+    session.flush()
+    for keyword in keywords:
+        session.add(KeywordRule(rule_set_id=rule_set.id, keyword=keyword, is_regex=regex, status=1))
+    session.commit()
+    rule_set_id = rule_set.id
+    db.close_session(session)
+    return rule_set_id
+
+
+def replace_rules(db, rule_set_id, keywords, regex=False):
+    """替换规则集的规则并把版本号加1"""
+    session = db.get_session()
+    session.query(KeywordRule).filter_by(rule_set_id=rule_set_id).delete()
+    for keyword in keywords:
+        session.add(KeywordRule(rule_set_id=rule_set_id, keyword=keyword, is_regex=regex, status=1))
+    rule_set = session.get(KeywordRuleSet, rule_set_id)
+    rule_set.version += 1
+    session.commit()
+    db.close_session(session)
+
+
+def matched(store, room_id, text):
+    matcher = store.get_matcher(True, room_id)
+    match = matcher.first(text) if matcher else None
+    return match.rule.keyword if match else None
+
+
+def test_bad_rule_set_keeps_last_good_matcher(sqlite_db):
+    set_a = add_rule_set(sqlite_db, ROOM_A, ["价格"])
+    add_rule_set(sqlite_db, ROOM_B, ["帮助"])
+    store = RuleSetStore()
+    store.refresh()
+    assert matched(store, ROOM_A, "多少价格") == "价格"
+
+    replace_rules(sqlite_db, set_a, ["(unclosed"], regex=True)
+    store.refresh()
+
+    # 编译失败的规则集继续使用旧版本，其他规则集不受影响
+    assert matched(store, ROOM_A, "多少价格") == "价格"
+    assert matched(store, ROOM_B, "求帮助") == "帮助"
+    stats = store.get_stats()
+    assert stats["compile_errors"] == 1
+    assert stats["refresh_errors"] == 0
+
+    # 版本号不变时不重试
+    store.refresh()
+    assert store.get_stats()["compile_errors"] == 1
+
+    replace_rules(sqlite_db, set_a, ["优惠"])
+    store.refresh()
+    assert matched(store, ROOM_A, "有优惠吗") == "优惠"
+    assert matched(store, ROOM_A, "多少价格") is None
+
+
+def test_bad_new_rule_set_is_skipped(sqlite_db):
+    add_rule_set(sqlite_db, ROOM_A, ["(unclosed"], regex=True)
+    add_rule_set(sqlite_db, ROOM_B, ["帮助"])
+    store = RuleSetStore()
+    store.refresh()
+
+    assert store.get_matcher(True, ROOM_A) is None
+    assert matched(store, ROOM_B, "求帮助") == "帮助"
@@ -0,0 +1,93 @@
+import asyncio
+
+import fakeredis
+import pytest
+
+from bot.context import Context, ContextSnapshot, ContextType
+from bot.message import Message
+from common import cache_manager
+from common.cache_manager import CACHE_CLEARED_CHANNEL, CacheManager
+from common.redis_manager import redis_manager
+from plugins.listen import registry as registry_module
+from plugins.listen.config import DEFAULT_CONFIG
+from plugins.listen.listen_plugin import ListenPlugin
+
+ROOM = "room@chatroom"
+
+
+@pytest.fixture
+def redis_client():
+    saved = redis_manager._redis_client, redis_manager._key_prefix
+    client = fakeredis.FakeRedis(decode_responses=True)
+    redis_manager._redis_client = client
+    redis_manager._key_prefix = ""
+    yield client
+    redis_manager._redis_client, redis_manager._key_prefix = saved
+
+
+@pytest.fixture
+def published(monkeypatch):
+    messages = []
+    publish = lambda channel, message: messages.append((channel, message))
+    monkeypatch.setattr(cache_manager.redis_pubsub, "publish", publish)
+    monkeypatch.setattr(registry_module.redis_pubsub, "publish", publish)
+    return messages
+
+
+def snapshot(sender="wxid_a"):
+    msg = Message(type="text", content="hi", sender_id=ROOM, room_id=ROOM, is_group=True)
+    return ContextSnapshot(type=ContextType.TEXT, content="hi", msg=msg, is_group=True, receiver=ROOM, sender=sender)
+
+
+def test_messages_during_slow_notify_are_debounced(redis_client, published):
+    plugin = ListenPlugin(dict(DEFAULT_CONFIG))
+    plugin.registry.enable("wxid_a", 60)
+    sent = []
+
+    async def slow_notify(user_id, msg, count, template):
+        await asyncio.sleep(0.05)
+        sent.append((user_id, count))
+
+    plugin._notify = slow_notify
+
+    async def run():
+        await asyncio.gather(*(plugin.observe(snapshot()) for _ in range(3)))
+
+    asyncio.run(run())
+    assert sent == [("wxid_a", 1)]
+    assert plugin._stats["suppressed"] == 2
+    assert plugin._windows[("wxid_a", ROOM)] == 2
+
+
+def test_clear_all_cache_reloads_listeners(redis_client, published):
+    plugin = ListenPlugin(dict(DEFAULT_CONFIG))
+    plugin.registry.enable("wxid_a", 60)
+    assert plugin.registry.is_listening("wxid_a")
+
+    CacheManager.clear_all_cache()
+    assert (CACHE_CLEARED_CHANNEL, {"cleared": True}) in published
+    # pub/sub 线程收到广播后调用的回调
+    plugin.registry._on_cache_cleared({"cleared": True})
+    assert not plugin.registry.is_listening("wxid_a")
+
+
+def private_command(content, sender="wxid_a"):
+    msg = Message(type="text", content=content, sender_id=sender)
+    return Context(type=ContextType.TEXT, content=content, msg=msg, is_group=False, receiver=sender, sender=sender)
+
+
+def test_listen_commands_update_registry(redis_client, published):
+    plugin = ListenPlugin(dict(DEFAULT_CONFIG))
+    messages = DEFAULT_CONFIG["messages"]
+
+    context = asyncio.run(plugin.process(private_command("/listen")))
+    assert context.rtn_content == messages["start_success"]
+    assert plugin.registry.is_listening("wxid_a")
+    assert redis_client.ttl(plugin.registry._key("wxid_a")) > 0
+
+    context = asyncio.run(plugin.process(private_command("/stop_listen")))
+    assert context.rtn_content == messages["stop_success"]
+    assert not plugin.registry.is_listening("wxid_a")
+
+    context = asyncio.run(plugin.process(private_command("/stop_listen")))
+    assert context.rtn_content == messages["not_listening"]
@@ -0,0 +1,150 @@
+import asyncio
+import os
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from common.media_downloader import MediaDownloader
+
+PAYLOAD = os.urandom(300 * 1024)
+
+
+class Handler(BaseHTTPRequestHandler):
+    """本地下载服务：按路径模拟正常、5xx、超时、过大等情况"""
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_body(self, body: bytes, content_length: bool = True):
+        self.send_response(200)
+        if content_length:
+            self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        hits = self.server.hits
+        hits[self.path] += 1
+        if self.path == "/file":
+            self._send_body(PAYLOAD)
+        elif self.path.startswith("/flaky/"):
+            # /flaky/<n>: 前n次返回503
+            if hits[self.path] <= int(self.path.rsplit("/", 1)[1]):
+                self.send_error(503)
+            else:
+                self._send_body(PAYLOAD)
+        elif self.path == "/slow":
+            time.sleep(1)
+            self._send_body(PAYLOAD)
+        elif self.path == "/big":
+            self._send_body(PAYLOAD)
+        elif self.path == "/big-unknown-length":
+            self.close_connection = True
+            self._send_body(PAYLOAD, content_length=False)
+        else:
+            self.send_error(404)
+
+
+@pytest.fixture
+def server():
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    httpd.hits = Counter()
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield httpd
+    httpd.shutdown()
+    httpd.server_close()
+
+
+@pytest.fixture
+def downloader():
+    downloader = MediaDownloader()
+    downloader.read_timeout = 0.3
+    downloader.retries = 2
+    downloader.RETRY_BACKOFF = 0.01
+    downloader.max_bytes = len(PAYLOAD) * 2
+    yield downloader
+    downloader.close()
+
+
+def url(server, path):
+    return f"http://127.0.0.1:{server.server_address[1]}{path}"
+
+
+def test_download_success(server, downloader, tmp_path):
+    target = str(tmp_path / "media" / "file.bin")
+    progress = []
+
+    future = downloader.submit(url(server, "/file"), target, lambda done, total: progress.append((done, total)))
+
+    assert future.result(10) == target
+    with open(target, "rb") as f:
+        assert f.read() == PAYLOAD
+    assert not os.path.exists(f"{target}.part")
+    assert progress[-1] == (len(PAYLOAD), len(PAYLOAD))
+    stats = downloader.get_stats()
+    assert stats["completed"] == 1
+    assert stats["bytes"] == len(PAYLOAD)
+    assert stats["in_flight"] == 0
+
+
+def test_download_from_event_loop(server, downloader, tmp_path):
+    target = str(tmp_path / "file.bin")
+
+    assert asyncio.run(downloader.download(url(server, "/file"), target)) == target
+    assert os.path.getsize(target) == len(PAYLOAD)
+
+
+def test_server_errors_are_retried(server, downloader, tmp_path):
+    target = str(tmp_path / "file.bin")
+
+    assert downloader.download_sync(url(server, "/flaky/2"), target, timeout=10) == target
+    assert server.hits["/flaky/2"] == 3
+    assert downloader.get_stats()["retries"] == 2
+
+
+def test_gives_up_after_retries(server, downloader, tmp_path):
+    target = str(tmp_path / "file.bin")
+
+    assert downloader.download_sync(url(server, "/flaky/5"), target, timeout=10) is None
+    assert server.hits["/flaky/5"] == downloader.retries + 1
+    assert not os.path.exists(target)
+    assert downloader.get_stats()["failed"] == 1
+
+
+def test_client_errors_are_not_retried(server, downloader, tmp_path):
+    target = str(tmp_path / "file.bin")
+
+    assert downloader.download_sync(url(server, "/missing"), target, timeout=10) is None
+    assert server.hits["/missing"] == 1
+
+
+def test_read_timeout_is_retried_then_fails(server, downloader, tmp_path):
+    target = str(tmp_path / "file.bin")
+
+    assert downloader.download_sync(url(server, "/slow"), target, timeout=10) is None
+    assert server.hits["/slow"] == downloader.retries + 1
+    assert not os.path.exists(f"{target}.part")
+
+
+def test_size_limit_from_content_length(server, downloader, tmp_path):
+    target = str(tmp_path / "file.bin")
+    downloader.max_bytes = len(PAYLOAD) - 1
+
+    assert downloader.download_sync(url(server, "/big"), target, timeout=10) is None
+    # 超过大小上限不重试
+    assert server.hits["/big"] == 1
+    assert not os.path.exists(target)
+
+
+def test_size_limit_without_content_length(server, downloader, tmp_path):
+    target = str(tmp_path / "file.bin")
+    downloader.max_bytes = len(PAYLOAD) // 2
+
+    assert downloader.download_sync(url(server, "/big-unknown-length"), target, timeout=10) is None
+    assert server.hits["/big-unknown-length"] == 1
+    assert not os.path.exists(target)
+    assert not os.path.exists(f"{target}.part")
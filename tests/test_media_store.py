@@ -0,0 +1,48 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from config.config_manager import config
+from common.media_store import MediaStore
+
+CONTENT = os.urandom(64 * 1024)
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    monkeypatch.setitem(config.get("media"), "dir", str(tmp_path))
+    return MediaStore()
+
+
+def stage(store, data=CONTENT):
+    path = store.staging_path(".bin")
+    with open(path, "wb") as f:
+        f.write(data)
+    return path
+
+
+def test_concurrent_puts_of_same_content_are_counted_once(store):
+    sources = [stage(store) for _ in range(16)]
+    barrier = threading.Barrier(len(sources))
+
+    def put(src):
+        barrier.wait()
+        return store.put_file(src, ".bin")
+
+    with ThreadPoolExecutor(len(sources)) as pool:
+        paths = set(pool.map(put, sources))
+
+    assert len(paths) == 1
+    assert store.get_stats()["bytes"] == len(CONTENT)
+    assert not os.listdir(os.path.join(store.base_dir, store.STAGING_DIR))
+
+
+def test_put_after_external_delete_replaces_entry(store):
+    path = store.put_file(stage(store), ".bin")
+    os.remove(path)
+
+    assert store.put_file(stage(store), ".bin") == path
+    assert os.path.exists(path)
+    assert store.get_stats()["bytes"] == len(CONTENT)
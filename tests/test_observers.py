@@ -0,0 +1,189 @@
+import asyncio
+import dataclasses
+import time
+
+import pytest
+
+from bot.chain_metrics import ChainMetrics
+from bot.context import Context, ContextType, ProcessState
+from bot.message import Message
+from bot.observers import ObserverRunner
+from bot.robot import WeRobot
+from plugins.base import ObserverPlugin, Plugin
+
+ROOM = "room@chatroom"
+
+
+class SlowObserver(ObserverPlugin):
+    """模拟推送通知很慢的监听插件"""
+
+    def __init__(self, config=None, delay=0.3, error=None):
+        super().__init__(config)
+        self.delay = delay
+        self.error = error
+        self.snapshots = []
+
+    async def observe(self, snapshot):
+        await asyncio.sleep(self.delay)
+        if self.error:
+            raise self.error
+        self.snapshots.append(snapshot)
+
+
+class Tagger(Plugin):
+    """在观察者之后修改上下文"""
+
+    async def process(self, context):
+        context.data["tag"] = "after"
+        context.content = "changed"
+        return context
+
+
+class Recorder(Plugin):
+    def __init__(self, config=None):
+        super().__init__(config)
+        self.seen = []
+
+    async def process(self, context):
+        self.seen.append(context.content)
+        context.rtn_content = "answer"
+        context.process_state = ProcessState.FINISHED_WITH_DEFAULT
+        return context
+
+
+class Blocker(Plugin):
+    async def process(self, context):
+        context.process_state = ProcessState.FINISHED
+        return context
+
+
+def make_robot(plugins):
+    robot = WeRobot.__new__(WeRobot)
+    robot.plugins = list(plugins)
+    robot._dispatch_index = None
+    robot.chain_metrics = ChainMetrics(3000, 10)
+    robot._breakers = {}
+    robot.observers = ObserverRunner(max_concurrency=2, max_pending=10)
+    robot.sent = []
+
+    async def send_message(context):
+        robot.sent.append(context.rtn_content)
+
+    robot.send_message = send_message
+    return robot
+
+
+def group_message(content="ai! hi"):
+    return Message(type="1", content=content, sender_id=ROOM, room_id=ROOM, is_group=True,
+                   actual_user_id="wxid_a", msg_id="1")
+
+
+def run_chain(robot, *messages):
+    """处理消息后等待后台观察任务结束，返回处理消息本身的耗时"""
+
+    async def run():
+        start = time.perf_counter()
+        for msg in messages:
+            await robot.process_message(msg)
+        elapsed = time.perf_counter() - start
+        await robot.observers.close()
+        return elapsed
+
+    return asyncio.run(run())
+
+
+def test_slow_observer_does_not_delay_reply():
+    observer = SlowObserver(delay=0.3)
+    ai = Recorder()
+    robot = make_robot([observer, ai])
+
+    elapsed = run_chain(robot, group_message())
+
+    assert elapsed < 0.1
+    assert ai.seen == ["ai! hi"] and robot.sent == ["answer"]
+    assert len(observer.snapshots) == 1
+    assert robot.observers.get_stats()["plugins"]["SlowObserver"]["submitted"] == 1
+
+
+@pytest.mark.parametrize("error", [RuntimeError("push failed"), None])
+def test_failing_or_timed_out_observer_does_not_break_chain(error):
+    # 没有异常时靠插件超时（0.05秒）打断观察
+    observer = SlowObserver({"timeout": 0.05}, delay=0.01 if error else 0.3, error=error)
+    ai = Recorder()
+    robot = make_robot([observer, ai])
+
+    run_chain(robot, group_message())
+
+    assert ai.seen == ["ai! hi"] and len(robot.sent) == 1
+    stats = robot.observers.get_stats()["plugins"]["SlowObserver"]
+    assert (stats["failed"], stats["timeouts"]) == ((1, 0) if error else (0, 1))
+    assert observer.snapshots == []
+    assert robot._breakers["SlowObserver"].get_stats()["state"] == "closed"
+
+
+def test_snapshot_is_isolated_from_later_plugins():
+    observer = SlowObserver(delay=0.01)
+    robot = make_robot([observer, Tagger(), Recorder()])
+
+    run_chain(robot, group_message())
+
+    snapshot = observer.snapshots[0]
+    assert snapshot.content == "ai! hi"
+    assert snapshot.get("tag") is None
+    with pytest.raises(dataclasses.FrozenInstanceError):
+        snapshot.content = "x"
+    with pytest.raises(TypeError):
+        snapshot.data["tag"] = "x"
+
+
+def test_observer_after_finished_plugin_is_not_submitted():
+    observer = SlowObserver(delay=0.01)
+    robot = make_robot([Blocker(), observer])
+
+    run_chain(robot, group_message())
+
+    assert observer.snapshots == []
+    assert robot.observers.get_stats()["plugins"] == {}
+
+
+def test_should_observe_false_skips_background_task():
+    observer = SlowObserver(delay=0.01)
+    observer.should_observe = lambda context: False
+    robot = make_robot([observer, Recorder()])
+
+    run_chain(robot, group_message())
+
+    assert observer.snapshots == []
+    assert len(robot.sent) == 1
+
+
+def test_runner_drops_observations_beyond_max_pending():
+    runner = ObserverRunner(max_concurrency=1, max_pending=2)
+    observer = SlowObserver(delay=0.05)
+    snapshot = Context(type=ContextType.TEXT, content="hi").snapshot()
+
+    async def run():
+        accepted = [runner.submit(observer, snapshot) for _ in range(3)]
+        await runner.close()
+        return accepted
+
+    assert asyncio.run(run()) == [True, True, False]
+    stats = runner.get_stats()
+    assert stats["plugins"]["SlowObserver"]["dropped"] == 1
+    assert stats["running"] == 0 and stats["pending"] == 0
+    assert len(observer.snapshots) == 2
+
+
+def test_close_cancels_observations_after_timeout():
+    runner = ObserverRunner()
+    observer = SlowObserver(delay=10)
+    snapshot = Context(type=ContextType.TEXT, content="hi").snapshot()
+
+    async def run():
+        runner.submit(observer, snapshot)
+        start = time.perf_counter()
+        await runner.close(timeout=0.05)
+        return time.perf_counter() - start
+
+    assert asyncio.run(run()) < 1
+    assert observer.snapshots == []
@@ -0,0 +1,98 @@
+import asyncio
+
+import pytest
+
+from bot.chain_metrics import ChainMetrics
+from bot.context import ProcessState
+from bot.message import Message
+from bot.robot import WeRobot
+from plugins.base import Plugin
+
+ROOM = "room@chatroom"
+
+
+class StallingValidator(Plugin):
+    """模拟卡在数据库上的权限校验插件"""
+
+    async def process(self, context):
+        await asyncio.sleep(10)
+        return context
+
+
+class FailingValidator(Plugin):
+    async def process(self, context):
+        raise RuntimeError("mysql down")
+
+
+class Recorder(Plugin):
+    """记录收到的消息，代表付费的AI插件"""
+
+    def __init__(self, config=None):
+        super().__init__(config)
+        self.seen = []
+
+    async def process(self, context):
+        self.seen.append(context.content)
+        context.rtn_content = "answer"
+        context.process_state = ProcessState.FINISHED_WITH_DEFAULT
+        return context
+
+
+def make_robot(plugins):
+    robot = WeRobot.__new__(WeRobot)
+    robot.plugins = list(plugins)
+    robot._dispatch_index = None
+    robot.chain_metrics = ChainMetrics(3000, 10)
+    robot._breakers = {}
+    robot.sent = []
+
+    async def send_message(context):
+        robot.sent.append(context.rtn_content)
+
+    robot.send_message = send_message
+    return robot
+
+
+def group_message(content="ai! hi"):
+    return Message(type="1", content=content, sender_id=ROOM, room_id=ROOM, is_group=True,
+                   actual_user_id="wxid_a", msg_id="1")
+
+
+@pytest.mark.parametrize("fail_closed", [True, False])
+def test_timed_out_validator(fail_closed):
+    validator = StallingValidator({"timeout": 0.05, "fail_closed": fail_closed})
+    ai = Recorder()
+    robot = make_robot([validator, ai])
+
+    asyncio.run(robot.process_message(group_message()))
+
+    if fail_closed:
+        assert ai.seen == [] and robot.sent == []
+    else:
+        assert ai.seen == ["ai! hi"] and robot.sent == ["answer"]
+
+
+def test_failing_validator_drops_message():
+    ai = Recorder()
+    robot = make_robot([FailingValidator({"fail_closed": True}), ai])
+    asyncio.run(robot.process_message(group_message()))
+    assert ai.seen == [] and robot.sent == []
+
+
+@pytest.mark.parametrize("fail_closed", [True, False])
+def test_validator_with_open_breaker(fail_closed):
+    validator = FailingValidator({"fail_closed": fail_closed, "breaker_failures": 1, "breaker_recovery": 60})
+    ai = Recorder()
+    robot = make_robot([validator, ai])
+
+    async def run():
+        await robot.process_message(group_message("ai! first"))
+        assert robot._breakers["FailingValidator"].state == "open"
+        await robot.process_message(group_message("ai! second"))
+
+    asyncio.run(run())
+    assert robot.get_breaker_stats()["FailingValidator"]["skipped"] == 1
+    if fail_closed:
+        assert ai.seen == []
+    else:
+        assert ai.seen == ["ai! first", "ai! second"]
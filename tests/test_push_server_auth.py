@@ -0,0 +1,31 @@
+import json
+
+import pytest
+import web
+
+from bot.push_server import AdminHandler, MetricsHandler
+
+app = web.application(('/metrics', 'MetricsHandler'), {"MetricsHandler": MetricsHandler})
+
+
+@pytest.fixture
+def admin_token(monkeypatch):
+    monkeypatch.setattr(AdminHandler, "admin_token", "secret")
+    return "secret"
+
+
+def test_metrics_requires_token(admin_token):
+    assert app.request("/metrics").status.startswith("403")
+    response = app.request("/metrics", headers={"X-Admin-Token": admin_token})
+    assert response.status.startswith("200")
+    assert isinstance(json.loads(response.data), dict)
+
+
+def test_non_ascii_token_is_rejected(admin_token):
+    response = app.request("/metrics", env={"HTTP_X_ADMIN_TOKEN": "密钥"})
+    assert response.status.startswith("403")
+
+
+def test_metrics_disabled_without_token(monkeypatch):
+    monkeypatch.setattr(AdminHandler, "admin_token", None)
+    assert app.request("/metrics").status.startswith("403")
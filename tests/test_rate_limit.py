@@ -0,0 +1,73 @@
+import asyncio
+
+import fakeredis
+import pytest
+
+from bot.context import Context, ContextType, ProcessState
+from bot.message import Message
+from common.redis_manager import redis_manager
+from plugins.rate_limit.config import DEFAULT_CONFIG
+from plugins.rate_limit.rate_limit_plugin import RateLimitPlugin
+
+ROOM = "room@chatroom"
+
+
+@pytest.fixture
+def redis_client():
+    saved = redis_manager._redis_client, redis_manager._key_prefix
+    client = fakeredis.FakeRedis(decode_responses=True)
+    redis_manager._redis_client = client
+    redis_manager._key_prefix = ""
+    yield client
+    redis_manager._redis_client, redis_manager._key_prefix = saved
+
+
+@pytest.fixture
+def plugin(redis_client):
+    config = dict(DEFAULT_CONFIG)
+    config["limits"] = {
+        "sender": {"capacity": 2, "rate": 0.001},
+        "room": {"capacity": 100, "rate": 1},
+    }
+    return RateLimitPlugin(config)
+
+
+def group_message(content, sender="wxid_a", is_at=False):
+    msg = Message(type="text", content=content, sender_id=ROOM, room_id=ROOM, is_group=True, is_at=is_at)
+    return Context(type=ContextType.TEXT, content=content, msg=msg, is_group=True, receiver=ROOM, sender=sender)
+
+
+def run(plugin, context):
+    return asyncio.run(plugin.process(context))
+
+
+def test_group_chatter_is_not_counted(plugin):
+    for i in range(10):
+        assert run(plugin, group_message(f"hello {i}")).process_state == ProcessState.CONTINUE
+    assert plugin.get_stats()["uncounted"] == 10
+    # 普通聊天没有消耗额度
+    assert run(plugin, group_message("ai! 你好")).process_state == ProcessState.CONTINUE
+
+
+def test_ai_message_gets_notice_once(plugin):
+    for _ in range(2):
+        assert run(plugin, group_message("ai! 你好")).process_state == ProcessState.CONTINUE
+
+    throttled = run(plugin, group_message("ai! 你好"))
+    assert throttled.process_state == ProcessState.FINISHED_WITH_DEFAULT
+    assert throttled.rtn_content == DEFAULT_CONFIG["notice_message"]
+
+    dropped = run(plugin, group_message("ai! 你好"))
+    assert dropped.process_state == ProcessState.FINISHED
+    assert dropped.rtn_content is None
+
+
+def test_commands_and_mentions_are_dropped_silently(plugin):
+    assert run(plugin, group_message("/bind key")).process_state == ProcessState.CONTINUE
+    assert run(plugin, group_message("在吗", is_at=True)).process_state == ProcessState.CONTINUE
+
+    throttled = run(plugin, group_message("/bind key"))
+    assert throttled.process_state == ProcessState.FINISHED
+    assert throttled.rtn_content is None
+    # 其他人不受影响
+    assert run(plugin, group_message("/bind key", sender="wxid_b")).process_state == ProcessState.CONTINUE
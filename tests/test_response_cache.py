@@ -0,0 +1,114 @@
+import time
+
+import fakeredis
+import pytest
+
+from common.redis_manager import redis_manager
+from plugins.ai.response_cache import AIResult, ResponseCache
+
+MODELS = {"gpt-4o": {"cache_ttl": 600}, "short": {"cache_ttl": 1}, "live": {"cache_ttl": 0}}
+
+
+@pytest.fixture
+def redis_client():
+    saved = redis_manager._redis_client, redis_manager._key_prefix
+    client = fakeredis.FakeRedis(decode_responses=True)
+    redis_manager._redis_client = client
+    redis_manager._key_prefix = ""
+    yield client
+    redis_manager._redis_client, redis_manager._key_prefix = saved
+
+
+def make_cache(**config):
+    return ResponseCache({"default_ttl": 3600, **config}, MODELS)
+
+
+def result(model="gpt-4o", content="请联系管理员"):
+    return AIResult(content=content, model=model, usage={"prompt_tokens": 30, "completion_tokens": 12})
+
+
+def test_miss_then_hit(redis_client):
+    cache = make_cache()
+    key = cache.make_key("gpt-4o", "怎么绑定群组")
+    assert cache.get(key, "gpt-4o") is None
+
+    cache.set(key, result())
+    cached = cache.get(key, "gpt-4o")
+    assert cached.content == "请联系管理员" and cached.model == "gpt-4o" and cached.cached
+
+    stats = cache.get_stats()
+    assert (stats["hits"], stats["misses"], stats["hit_ratio"]) == (1, 1, 0.5)
+    assert (stats["saved_prompt_tokens"], stats["saved_completion_tokens"]) == (30, 12)
+
+
+def test_key_normalizes_query_and_separates_models(redis_client):
+    cache = make_cache()
+    key = cache.make_key("gpt-4o", "怎么绑定群组")
+    assert cache.make_key("gpt-4o", "  怎么绑定群组？ ") == key
+    assert cache.make_key("gpt-4o", "How  To Bind!") == cache.make_key("gpt-4o", "ｈｏｗ to bind")
+    assert cache.make_key("short", "怎么绑定群组") != key
+    assert cache.make_key("gpt-4o", "怎么解绑群组") != key
+    assert cache.key_for_model(key, "short") == cache.make_key("short", "怎么绑定群组")
+
+
+def test_history_changes_key(redis_client):
+    cache = make_cache()
+    history = [{"role": "user", "content": "你好"}, {"role": "assistant", "content": "你好！"}]
+    key = cache.make_key("gpt-4o", "怎么绑定群组", history=history)
+    assert key != cache.make_key("gpt-4o", "怎么绑定群组")
+    assert key == cache.make_key("gpt-4o", "怎么绑定群组", history=list(history))
+    assert cache.get_stats()["with_history"] == 2
+
+
+def test_ttl_follows_model_config(redis_client):
+    cache = make_cache()
+    key = cache.make_key("gpt-4o", "q")
+    cache.set(key, result())
+    assert 590 < redis_client.ttl(key) <= 600
+
+    default_key = cache.make_key("unknown", "q")
+    cache.set(default_key, result(model="unknown"))
+    assert 3590 < redis_client.ttl(default_key) <= 3600
+
+
+def test_entry_expires_after_ttl(redis_client):
+    cache = make_cache()
+    key = cache.make_key("short", "q")
+    cache.set(key, result(model="short"))
+    assert cache.get(key, "short") is not None
+    time.sleep(1.1)
+    assert cache.get(key, "short") is None
+
+
+def test_zero_ttl_and_disabled_cache_are_not_cacheable(redis_client):
+    cache = make_cache()
+    assert not cache.is_cacheable("live")
+    key = cache.make_key("live", "q")
+    cache.set(key, result(model="live"))
+    assert redis_client.get(key) is None
+
+    assert not make_cache(enabled=False).is_cacheable("gpt-4o")
+
+
+def test_empty_answer_is_not_cached(redis_client):
+    cache = make_cache()
+    key = cache.make_key("gpt-4o", "q")
+    cache.set(key, result(content=""))
+    assert redis_client.get(key) is None
+
+
+def test_bypass_flag_is_removed():
+    cache = make_cache()
+    assert cache.extract_bypass_flag("#nocache 今天的新闻") == ("今天的新闻", True)
+    assert cache.extract_bypass_flag("今天的新闻") == ("今天的新闻", False)
+
+
+def test_redis_error_is_a_miss(redis_client, monkeypatch):
+    cache = make_cache()
+    key = cache.make_key("gpt-4o", "q")
+
+    def broken_get(key):
+        raise ConnectionError("redis down")
+
+    monkeypatch.setattr(redis_client, "get", broken_get)
+    assert cache.get(key, "gpt-4o") is None
@@ -0,0 +1,124 @@
+import asyncio
+import time
+
+import pytest
+
+from plugins.ai.scheduler import AIScheduler, PRIORITY_HIGH, PRIORITY_NORMAL
+
+
+def test_queued_requests_leave_by_priority():
+    scheduler = AIScheduler({"default_max_concurrency": 1})
+    order = []
+
+    async def request(name, priority):
+        async with scheduler.slot("m", priority):
+            order.append(name)
+
+    async def run():
+        async with scheduler.slot("m"):
+            tasks = []
+            for name, priority in [("group 1", PRIORITY_NORMAL), ("group 2", PRIORITY_NORMAL),
+                                   ("private", PRIORITY_HIGH), ("group 3", PRIORITY_NORMAL)]:
+                tasks.append(asyncio.create_task(request(name, priority)))
+                await asyncio.sleep(0)
+            assert scheduler.get_stats()["m"]["queued"] == 4
+        await asyncio.gather(*tasks)
+
+    asyncio.run(run())
+    assert order == ["private", "group 1", "group 2", "group 3"]
+
+
+def test_concurrency_limit_per_model():
+    scheduler = AIScheduler({"default_max_concurrency": 2}, {"fast": {"max_concurrency": 4}})
+    active = {"slow": 0, "fast": 0}
+    peak = {"slow": 0, "fast": 0}
+
+    async def request(model):
+        async with scheduler.slot(model):
+            active[model] += 1
+            peak[model] = max(peak[model], active[model])
+            await asyncio.sleep(0.01)
+            active[model] -= 1
+
+    async def run():
+        await asyncio.gather(*(request(model) for model in ("slow", "fast") for _ in range(8)))
+
+    asyncio.run(run())
+    assert peak == {"slow": 2, "fast": 4}
+    assert scheduler.get_stats()["slow"]["active"] == 0
+
+
+def timed_requests(scheduler, count, estimated_tokens=0):
+    """返回每个请求拿到名额时距开始的秒数"""
+
+    async def run():
+        start = time.monotonic()
+        granted = []
+
+        async def request():
+            async with scheduler.slot("m", estimated_tokens=estimated_tokens):
+                granted.append(time.monotonic() - start)
+
+        await asyncio.gather(*(request() for _ in range(count)))
+        return granted
+
+    return asyncio.run(run())
+
+
+def test_rpm_throttles_requests():
+    # 600 rpm 即每秒补充10个请求令牌，清空桶后每个请求间隔0.1秒
+    scheduler = AIScheduler({"default_rpm": 600})
+    scheduler._get_lane("m").requests.tokens = 0
+    granted = timed_requests(scheduler, 3)
+    assert granted[0] == pytest.approx(0.1, abs=0.05)
+    assert granted[-1] == pytest.approx(0.3, abs=0.08)
+
+
+def test_rpm_allows_burst_up_to_capacity():
+    scheduler = AIScheduler({"default_rpm": 600, "default_max_concurrency": 100})
+    assert max(timed_requests(scheduler, 50)) < 0.05
+
+
+def test_tpm_throttles_by_estimated_tokens():
+    # 6000 tpm 即每秒补充100个token，清空桶后预估50个token的请求需要等0.5秒
+    scheduler = AIScheduler({"default_tpm": 6000})
+    scheduler._get_lane("m").tokens.tokens = 0
+    granted = timed_requests(scheduler, 1, estimated_tokens=50)
+    assert granted[0] == pytest.approx(0.5, abs=0.1)
+
+
+def test_actual_usage_above_estimate_delays_next_request():
+    scheduler = AIScheduler({"default_tpm": 6000})
+
+    async def run():
+        async with scheduler.slot("m", estimated_tokens=10) as record_usage:
+            # 桶容量6000，实际用了6030个token，补扣后剩-30个，下一个预估10个token的请求要等0.4秒
+            record_usage(6030)
+        start = time.monotonic()
+        async with scheduler.slot("m", estimated_tokens=10):
+            return time.monotonic() - start
+
+    assert asyncio.run(run()) == pytest.approx(0.4, abs=0.08)
+
+
+def test_cancelled_waiter_does_not_block_queue():
+    scheduler = AIScheduler({"default_max_concurrency": 1})
+    order = []
+
+    async def request(name):
+        async with scheduler.slot("m"):
+            order.append(name)
+
+    async def run():
+        async with scheduler.slot("m"):
+            cancelled = asyncio.create_task(request("cancelled"))
+            waiting = asyncio.create_task(request("waiting"))
+            await asyncio.sleep(0)
+            cancelled.cancel()
+            await asyncio.sleep(0)
+        await waiting
+
+    asyncio.run(run())
+    assert order == ["waiting"]
+    stats = scheduler.get_stats()["m"]
+    assert stats["active"] == 0 and stats["queued"] == 0
@@ -0,0 +1,121 @@
+import asyncio
+
+import pytest
+
+from plugins.ai.single_flight import SingleFlight
+
+
+def test_concurrent_calls_share_one_result():
+    flight = SingleFlight()
+    calls = []
+
+    async def fetch():
+        calls.append(1)
+        await asyncio.sleep(0.02)
+        return "answer"
+
+    async def run():
+        return await asyncio.gather(*(flight.do("q", fetch) for _ in range(5)))
+
+    results = asyncio.run(run())
+    assert calls == [1]
+    assert results[0] == ("answer", False)
+    assert results[1:] == [("answer", True)] * 4
+    assert flight.get_stats() == {"leaders": 1, "coalesced": 4, "in_flight": 0}
+
+
+def test_different_keys_are_not_coalesced():
+    flight = SingleFlight()
+
+    async def run():
+        return await asyncio.gather(flight.do("a", lambda: asyncio.sleep(0.01, "a")),
+                                    flight.do("b", lambda: asyncio.sleep(0.01, "b")))
+
+    assert asyncio.run(run()) == [("a", False), ("b", False)]
+    assert flight.get_stats()["coalesced"] == 0
+
+
+def test_finished_call_is_not_reused():
+    flight = SingleFlight()
+    answers = iter(["first", "second"])
+
+    async def fetch():
+        return next(answers)
+
+    async def run():
+        return [await flight.do("q", fetch), await flight.do("q", fetch)]
+
+    assert asyncio.run(run()) == [("first", False), ("second", False)]
+
+
+def test_error_is_propagated_to_all_waiters():
+    flight = SingleFlight()
+
+    async def fetch():
+        await asyncio.sleep(0.02)
+        raise RuntimeError("upstream 500")
+
+    async def run():
+        return await asyncio.gather(*(flight.do("q", fetch) for _ in range(3)), return_exceptions=True)
+
+    results = asyncio.run(run())
+    assert all(isinstance(r, RuntimeError) and str(r) == "upstream 500" for r in results)
+    assert flight.get_stats()["in_flight"] == 0
+
+
+def test_next_call_retries_after_error():
+    flight = SingleFlight()
+    attempts = []
+
+    async def fetch():
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise RuntimeError("upstream 500")
+        return "answer"
+
+    async def run():
+        with pytest.raises(RuntimeError):
+            await flight.do("q", fetch)
+        return await flight.do("q", fetch)
+
+    assert asyncio.run(run()) == ("answer", False)
+    assert len(attempts) == 2
+
+
+def test_cancelled_leader_fails_waiters_without_cancelling_them():
+    flight = SingleFlight()
+
+    async def fetch():
+        await asyncio.sleep(10)
+
+    async def run():
+        leader = asyncio.create_task(flight.do("q", fetch))
+        await asyncio.sleep(0)
+        waiter = asyncio.create_task(flight.do("q", fetch))
+        await asyncio.sleep(0)
+        leader.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        with pytest.raises(Exception, match="合并的请求已被取消"):
+            await waiter
+
+    asyncio.run(run())
+    assert flight.get_stats()["in_flight"] == 0
+
+
+def test_cancelled_waiter_does_not_cancel_leader():
+    flight = SingleFlight()
+
+    async def fetch():
+        await asyncio.sleep(0.02)
+        return "answer"
+
+    async def run():
+        leader = asyncio.create_task(flight.do("q", fetch))
+        await asyncio.sleep(0)
+        waiter = asyncio.create_task(flight.do("q", fetch))
+        await asyncio.sleep(0)
+        waiter.cancel()
+        return await leader
+
+    assert asyncio.run(run()) == ("answer", False)
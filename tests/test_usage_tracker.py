@@ -0,0 +1,41 @@
+from common.models import WxGroup
+from plugins.ai.usage_tracker import UNBOUND_CUSTOMER, UsageTracker
+
+
+def add_group(db, group_id, customer_id):
+    session = db.get_session()
+    session.add(WxGroup(wx_group_id=group_id, customer_id=customer_id))
+    session.commit()
+    db.close_session(session)
+
+
+def test_bound_and_unbound_customers_are_cached(sqlite_db):
+    add_group(sqlite_db, "room1", "c1")
+    tracker = UsageTracker()
+
+    assert tracker.resolve_customer(True, "room1") == "c1"
+    assert tracker.resolve_customer(True, "room2") == UNBOUND_CUSTOMER
+    assert tracker.resolve_customer(True, "room1") == "c1"
+    assert tracker.resolve_customer(True, "room2") == UNBOUND_CUSTOMER
+    assert tracker.get_stats()["customer_lookups"] == 2
+    assert tracker.cached_customer(True, "room2") == UNBOUND_CUSTOMER
+    assert tracker.cached_customer(False, "room2") is None
+
+
+def test_lookup_errors_are_cached_briefly(sqlite_db):
+    tracker = UsageTracker()
+    WxGroup.__table__.drop(sqlite_db._engine)
+    assert tracker.resolve_customer(True, "room1") == UNBOUND_CUSTOMER
+    assert tracker.resolve_customer(True, "room1") == UNBOUND_CUSTOMER
+    stats = tracker.get_stats()
+    assert stats["customer_lookup_errors"] == 1 and stats["customer_lookups"] == 1
+
+
+def test_unbound_cache_expires_sooner_than_bound(sqlite_db):
+    add_group(sqlite_db, "room1", "c1")
+    tracker = UsageTracker()
+    tracker.resolve_customer(True, "room1")
+    tracker.resolve_customer(True, "room2")
+    bound_until = tracker._customers["group:room1"][1]
+    unbound_until = tracker._customers["group:room2"][1]
+    assert bound_until - unbound_until > UsageTracker.CUSTOMER_CACHE_EXPIRE - UsageTracker.NEGATIVE_CACHE_EXPIRE - 1